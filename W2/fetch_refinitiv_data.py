@@ -7,9 +7,15 @@
 
 # Imports
 from datetime import datetime
-import eikon as ek
-import pandas as pd
+from algo.provider import market_data
 import os
+import sys
+from algo.corporate_actions import (
+    DIV_COLUMNS, aggregate_divs, clean_prices, clean_splits, merge_history
+)
+from algo.fetcher import FetchScheduler, history_field_groups
+from algo.incremental import update_price_history
+from algo.pricestore import write_price_store
 
 ###### Before running this script:
 # 1) Create an app key within Refinitiv
@@ -18,8 +24,22 @@ import os
 ######
 
 # 3) Use your app key in this Python session w the following line:
-# ek.set_app_key(os.getenv('EIKON_API'))
-ek.set_app_key('977aeb771744454e8803c10c8704c8e1ef2f4c27')
+#    (market_data() sets it once and keeps one connection for the whole
+#    script; it uses the offline stand-in when REFINITIV_OFFLINE is set, see
+#    algo/provider.py)
+# ek = market_data(os.getenv('EIKON_API'))
+ek = market_data('977aeb771744454e8803c10c8704c8e1ef2f4c27')
+
+# Already built the history once? Run this script with --incremental to only
+# fetch the bars, dividends & splits that are new since the last run and
+# append them to unadjusted_price_history.cols/.csv (see algo/incremental.py)
+if '--incremental' in sys.argv:
+    update_price_history(
+        ek.get_data,
+        'unadjusted_price_history.cols',
+        'unadjusted_price_history.csv'
+    )
+    sys.exit()
 
 # 4) Use get_timeseries() to get historical prices for 2 stocks and an ETF
 #    --> if this command fails... don't forget to check and make sure you have
@@ -29,7 +49,9 @@ get_timeseries_output = ek.get_timeseries(
     start_date="2017-01-01",
     end_date=datetime.now().strftime("%Y-%m-%d")
 )
-get_timeseries_output.to_csv('get_timeseries_output.csv', index=False)
+# (keeping the Date index, so algo/timeseries_dump.py can stream it back in
+# the long Instrument / Date format)
+get_timeseries_output.to_csv('get_timeseries_output.csv')
 
 ### Open your get_timeseries_output.csv and take a look at it. Note that the
 ###   prices are ADJUSTED. That's not ideal for algorithmic trading because:
@@ -53,51 +75,24 @@ get_timeseries_output.to_csv('get_timeseries_output.csv', index=False)
 # And let's throw in a few other assets because why not:
 assets = ['AAPL.O', 'IVV', 'GLD', 'SHY.O', "MSFT.O", "TSLA.O"]
 
-# 5) use get_data() to fetch historical UNADJUSTED prices for those assets
-# There are many other data varaiables you can fetch like this. The call to
-# get_data() below was created using the Rocket Ship icon in Refinitiv CODEBK.
-prices, prc_err = ek.get_data(
-    instruments = assets,
-    fields = [
-        'TR.OPENPRICE(Adjusted=0)',
-        'TR.HIGHPRICE(Adjusted=0)',
-        'TR.LOWPRICE(Adjusted=0)',
-        'TR.CLOSEPRICE(Adjusted=0)',
-        'TR.PriceCloseDate'
-    ],
-    parameters = {
-        'SDate': '2017-01-01',
-        'EDate': datetime.now().strftime("%Y-%m-%d"),
-        'Frq': 'D'
-    }
-)
-
-# 6) Same, but for dividends:
-divs, div_err = ek.get_data(
-    instruments = assets,
-    fields = [
-        'TR.DivExDate',
-        'TR.DivUnadjustedGross',
-        'TR.DivType',
-        'TR.DivPaymentType'
-    ],
-    parameters = {
-        'SDate': '2017-01-01',
-        'EDate': datetime.now().strftime("%Y-%m-%d"),
-        'Frq': 'D'
-    }
+# 5) use get_data() to fetch historical UNADJUSTED prices for those assets,
+# 6) same, but for dividends, and
+# 7) same, but for splits.
+# There are many other data varaiables you can fetch like this. The calls to
+# get_data() were created using the Rocket Ship icon in Refinitiv CODEBK; the
+# field lists live in algo/fetcher.py. The scheduler splits the assets into
+# chunks and runs the three queries in parallel, retrying (and backing off
+# when Refinitiv says we're sending too many requests).
+scheduler = FetchScheduler(ek.get_data)
+fetched, fetch_errors = scheduler.fetch(
+    assets,
+    history_field_groups('2017-01-01', datetime.now().strftime("%Y-%m-%d"))
 )
-
-# 7) Same, but for splits:
-splits, splits_err = ek.get_data(
-    instruments = assets,
-    fields = ['TR.CAEffectiveDate', 'TR.CAAdjustmentFactor'],
-    parameters = {
-        "CAEventType": "SSP",
-        'SDate': '2017-01-01',
-        'EDate': datetime.now().strftime("%Y-%m-%d"),
-        'Frq': 'D'
-    }
+prices, divs, splits = fetched['prices'], fetched['divs'], fetched['splits']
+print(
+    'fetched {rows} rows in {seconds:.1f}s ({rows_per_sec:.0f} rows/sec)'.format(
+        **scheduler.last_stats
+    )
 )
 
 # 8) Do a little bit of data cleaning.
@@ -106,39 +101,17 @@ splits, splits_err = ek.get_data(
 #      - cast date columns as pandas datetime objects
 
 ##### prices
-prices.rename(
-    columns = {
-        'Open Price':'open',
-        'High Price':'high',
-        'Low Price':'low',
-        'Close Price':'close'
-    },
-    inplace = True
-)
-prices.dropna(inplace=True)
-prices['Date'] = pd.to_datetime(prices['Date']).dt.date
+# (the renames & cleaning rules live in algo/corporate_actions.py, shared
+#   with the apps and the daily top-up in algo/incremental.py)
+prices = clean_prices(prices)
 # save as csv so you can open in Excel if you want
 prices.to_csv('prices.csv', index=False)
 
 ##### divs
-divs.rename(
-    columns = {
-        'Dividend Ex Date':'Date',
-        'Gross Dividend Amount':'div_amt',
-        'Dividend Type': 'div_type',
-        'Dividend Payment Type': 'pay_type'
-    },
-    inplace = True
-)
-divs.dropna(inplace=True)
-divs['Date'] = pd.to_datetime(divs['Date']).dt.date
 #on 16 Dec 2019, IVV issued TWO dividends: 
-#an interim and a special. This can happen sometimes.
-divs = divs.groupby(['Instrument', 'Date'], as_index = False).agg({
-    'div_amt': 'sum',
-    'div_type': lambda x: ", ".join(x),
-    'pay_type': lambda x: ", ".join(x)
-    })
+#an interim and a special. This can happen sometimes. aggregate_divs() sums
+#them and joins their types ("Interim, Special"):
+divs = aggregate_divs(divs.rename(columns=DIV_COLUMNS).dropna())
 
 # At this point, I'm saving the divs df as a csv called 'dirty_divs.csv' because
 #   I want you to open it and see something.
@@ -155,46 +128,28 @@ divs.to_csv('dirty_divs.csv', index=False)
 #   calculations like adjusted price.
 # We're going to solve this by applying our data requirements. To be useful to
 #   us, a div must have an Ex Date and an amount greater than zero:
-divs = divs[(divs.Date.notnull()) & (divs.div_amt > 0)]
+divs = divs[divs.div_amt > 0]
 # save as csv so you can open in Excel if you want
 divs.to_csv('divs.csv', index=False)
 
 ##### splits
-splits.rename(
-    columns = {
-        'Capital Change Effective Date':'Date',
-        'Adjustment Factor':'split_rto'
-    },
-    inplace = True
-)
-splits.dropna(inplace=True)
-splits['Date'] = pd.to_datetime(splits['Date']).dt.date
+splits = clean_splits(splits)
 # save as csv so you can open in Excel if you want
 splits.to_csv('splits.csv', index=False)
 
-# 9) Merge prices & divs dfs together by date, and fill the missing values in
-#      the merged dividends dataframe with "0".
-unadjusted_price_history = pd.merge(
-    prices, divs[['Instrument', 'Date', 'div_amt']],
-    how='outer',
-    on=['Date', 'Instrument']
-)
-unadjusted_price_history['div_amt'].fillna(0, inplace=True)
-
+# 9) Put the divs on the price rows by instrument & date, with "0" where there
+#      was no dividend.
 # 10) Same thing for splits, but use "1" for the fill value.
-unadjusted_price_history = pd.merge(
-    unadjusted_price_history, splits,
-    how='outer',
-    on=['Date', 'Instrument']
-)
-unadjusted_price_history['split_rto'].fillna(1, inplace=True)
-
-# 11) We shouldn't have any missing data in our dataframe now. Verify that:
-if unadjusted_price_history.isnull().values.any():
-    raise Exception('missing values detected!')
-
-#looks like sometimes Refinitiv will include a duplicate of the last (most recent) row when querying price data.
-unadjusted_price_history.drop_duplicates(inplace=True)
+# 11) We shouldn't have any missing data in our dataframe now. merge_history()
+#      verifies that in the same pass: a div or split with no price bar, or a
+#      missing value, raises CorporateActionError.
+#looks like sometimes Refinitiv will include a duplicate of the last (most
+#  recent) row when querying price data: exact duplicates are dropped too.
+unadjusted_price_history = merge_history(prices, divs, splits)
 
 # 12) Save raw data as csv:
-unadjusted_price_history.to_csv('unadjusted_price_history.csv', index=False)
\ No newline at end of file
+unadjusted_price_history.to_csv('unadjusted_price_history.csv', index=False)
+
+# 13) And as a binary column store, which the apps can memory-map instead of
+#       parsing the csv on every start-up:
+write_price_store(unadjusted_price_history, 'unadjusted_price_history.cols')
@@ -1,17 +1,45 @@
 from dash import Dash, html, dcc, dash_table, Input, Output, State
-import eikon as ek
+from algo.provider import market_data
 import pandas as pd
 import numpy as np
 from datetime import datetime, date
-import plotly.express as px
-import os
-
-ek.set_app_key(os.getenv('AppKey'))
-
-#not used yet, only small amount of data in this file
-dt_prc_div_splt = pd.read_csv('unadjusted_price_history.csv')
+import importlib
+from algo.alphabeta import AlphaBeta
+from algo.cache import PriceCache
+from algo.corporate_actions import (
+    clean_divs, clean_prices, clean_splits, merge_history
+)
+from algo.profiling import add_diagnostics, profiled, stage
+from algo.returns import returns_frame
+from algo.warmup import Warmup
+
+# one long-lived Refinitiv connection per worker process, with the app key
+# from AppKey (or the offline stand-in when REFINITIV_OFFLINE is set; see
+# algo/provider.py and algo/offline.py)
+provider = market_data()
+
+# serve already-downloaded dates from disk, fetch only what's missing
+price_cache = PriceCache(provider.get_data)
+
+# slow setup (the Refinitiv login, plotly.express) runs on a background
+# thread, or on first use, so the server answers /_health at once
+# and /_ready once it is done (see algo/warmup.py)
+warmup = Warmup()
+warmup.task('refinitiv', provider.connect)
+warmup.task('plotly', lambda: importlib.import_module('plotly.express'),
+            shared=True)
 
 app = Dash(__name__)
+warmup.add_routes(app.server)
+warmup.start()
+
+# per-callback & per-stage timings; with PROFILE_DIAGNOSTICS=1, as JSON at
+# /_diagnostics and in a panel at the bottom of the page (see
+# algo/profiling.py)
+diagnostics = add_diagnostics(
+    app, provider=provider.stats, price_cache=price_cache.stats
+)
+
 app.layout = html.Div([
     html.Div([
         html.Label('benchmark:  '),
@@ -55,7 +83,8 @@ app.layout = html.Div([
     ]),
     html.Button('Plot', id = 'abPlot', n_clicks = 0),
     dcc.Graph(id="ab-plot"),
-    html.P(id='summary-text', children="")
+    html.P(id='summary-text', children=""),
+    diagnostics
 ])
 
 @app.callback(
@@ -81,147 +110,89 @@ def update_plot_date_range(start_date, end_date):
     ],
     prevent_initial_call=True
 )
+@profiled
 def query_refinitiv(n_clicks, benchmark_id, asset_id, start_date, end_date):
     assets = [benchmark_id, asset_id]
-    prices, prc_err = ek.get_data(
-        instruments=assets,
-        fields=[
-            'TR.OPENPRICE(Adjusted=0)',
-            'TR.HIGHPRICE(Adjusted=0)',
-            'TR.LOWPRICE(Adjusted=0)',
-            'TR.CLOSEPRICE(Adjusted=0)',
-            'TR.PriceCloseDate'
-        ],
-        parameters={
-            'SDate': start_date,
-            'EDate': end_date,
-            'Frq': 'D'
-        }
-    )
-
-    divs, div_err = ek.get_data(
-        instruments=assets,
-        fields=[
-            'TR.DivExDate',
-            'TR.DivUnadjustedGross',
-            'TR.DivType',
-            'TR.DivPaymentType'
-        ],
-        parameters={
-            'SDate': start_date,
-            'EDate': end_date,
-            'Frq': 'D'
-        }
-    )
-
-    splits, splits_err = ek.get_data(
-        instruments=assets,
-        fields=['TR.CAEffectiveDate', 'TR.CAAdjustmentFactor'],
-        parameters={
-            "CAEventType": "SSP",
-            'SDate': start_date,
-            'EDate': end_date,
-            'Frq': 'D'
-        }
-    )
-
-    prices.rename(
-        columns={
-            'Open Price': 'open',
-            'High Price': 'high',
-            'Low Price': 'low',
-            'Close Price': 'close'
-        },
-        inplace=True
-    )
-    prices.dropna(inplace=True)
-    prices['Date'] = pd.to_datetime(prices['Date']).dt.date
-
-    divs.rename(
-        columns={
-            'Dividend Ex Date': 'Date',
-            'Gross Dividend Amount': 'div_amt',
-            'Dividend Type': 'div_type',
-            'Dividend Payment Type': 'pay_type'
-        },
-        inplace=True
-    )
-    divs.dropna(inplace=True)
-    divs['Date'] = pd.to_datetime(divs['Date']).dt.date
-    divs = divs[(divs.Date.notnull()) & (divs.div_amt > 0)]
-    divs = divs.groupby(['Instrument', 'Date'], as_index = False).agg({
-    'div_amt': 'sum',
-    'div_type': lambda x: ", ".join(x),
-    'pay_type': lambda x: ", ".join(x)
-    })
-
-    splits.rename(
-        columns={
-            'Capital Change Effective Date': 'Date',
-            'Adjustment Factor': 'split_rto'
-        },
-        inplace=True
-    )
-    splits.dropna(inplace=True)
-    splits['Date'] = pd.to_datetime(splits['Date']).dt.date
-
-    unadjusted_price_history = pd.merge(
-        prices, divs[['Instrument', 'Date', 'div_amt']],
-        how='outer',
-        on=['Date', 'Instrument']
-    )
-    unadjusted_price_history['div_amt'].fillna(0, inplace=True)
-
-    unadjusted_price_history = pd.merge(
-        unadjusted_price_history, splits,
-        how='outer',
-        on=['Date', 'Instrument']
-    )
-    unadjusted_price_history['split_rto'].fillna(1, inplace=True)
-
-    if unadjusted_price_history.isnull().values.any():
-        raise Exception('missing values detected!')
-
-    unadjusted_price_history.drop_duplicates(inplace=True)
-
-    return(unadjusted_price_history.to_dict('records'))
+    with stage('get_data') as s:
+        prices, prc_err = price_cache.get_data(
+            instruments=assets,
+            fields=[
+                'TR.OPENPRICE(Adjusted=0)',
+                'TR.HIGHPRICE(Adjusted=0)',
+                'TR.LOWPRICE(Adjusted=0)',
+                'TR.CLOSEPRICE(Adjusted=0)',
+                'TR.PriceCloseDate'
+            ],
+            parameters={
+                'SDate': start_date,
+                'EDate': end_date,
+                'Frq': 'D'
+            }
+        )
+
+        divs, div_err = price_cache.get_data(
+            instruments=assets,
+            fields=[
+                'TR.DivExDate',
+                'TR.DivUnadjustedGross',
+                'TR.DivType',
+                'TR.DivPaymentType'
+            ],
+            parameters={
+                'SDate': start_date,
+                'EDate': end_date,
+                'Frq': 'D'
+            }
+        )
+
+        splits, splits_err = price_cache.get_data(
+            instruments=assets,
+            fields=['TR.CAEffectiveDate', 'TR.CAAdjustmentFactor'],
+            parameters={
+                "CAEventType": "SSP",
+                'SDate': start_date,
+                'EDate': end_date,
+                'Frq': 'D'
+            }
+        )
+        s.rows = prices.shape[0] + divs.shape[0] + splits.shape[0]
+
+    with stage('frame'):
+        # cleaning, dividend & split alignment and the missing-value /
+        # duplicate checks in one vectorized pass (see
+        # algo/corporate_actions.py)
+        unadjusted_price_history = merge_history(
+            clean_prices(prices), clean_divs(divs), clean_splits(splits)
+        )
+        unadjusted_price_history['Date'] = (
+            unadjusted_price_history['Date'].dt.date
+        )
+
+    with stage('records') as s:
+        records = unadjusted_price_history.to_dict('records')
+        s.rows = len(records)
+    return(records)
 
 @app.callback(
     Output("returns-tbl", "data"),
     Input("history-tbl", "data"),
     prevent_initial_call = True
 )
+@profiled
 def calculate_returns(history_tbl):
 
-    dt_prc_div_splt = pd.DataFrame(history_tbl)
-
-    # Define what columns contain the Identifier, date, price, div, & split info
-    ins_col = 'Instrument'
-    dte_col = 'Date'
-    prc_col = 'close'
-    div_col = 'div_amt'
-    spt_col = 'split_rto'
-
-    dt_prc_div_splt[dte_col] = pd.to_datetime(dt_prc_div_splt[dte_col])
-    dt_prc_div_splt = dt_prc_div_splt.sort_values([ins_col, dte_col])[
-        [ins_col, dte_col, prc_col, div_col, spt_col]].groupby(ins_col)
-    numerator = dt_prc_div_splt[[dte_col, ins_col, prc_col, div_col]].tail(-1)
-    denominator = dt_prc_div_splt[[prc_col, spt_col]].head(-1)
-    res = pd.DataFrame({
-        'Date': numerator[dte_col].reset_index(drop=True),
-        'Instrument': numerator[ins_col].reset_index(drop=True),
-        'rtn': np.log(
-            (numerator[prc_col] + numerator[div_col]).reset_index(drop=True) / (
-                    denominator[prc_col] * denominator[spt_col]
-            ).reset_index(drop=True)
-        )}).pivot_table(
-            values='rtn', index='Date', columns='Instrument'
-        ).reset_index()
-    res['Date'] = pd.to_datetime(res['Date']).dt.date
-
-    return(
-        res.to_dict('records')
-    )
+    with stage('frame'):
+        dt_prc_div_splt = pd.DataFrame(history_tbl)
+
+    # split- & dividend-adjusted log returns, one column per instrument
+    with stage('returns'):
+        res = returns_frame(dt_prc_div_splt).reset_index()
+        res['Date'] = pd.to_datetime(res['Date']).dt.date
+
+    with stage('records') as s:
+        records = res.to_dict('records')
+        s.rows = len(records)
+    return(records)
 
 @app.callback(
     Output("ab-plot", "figure"),
@@ -235,18 +206,25 @@ def calculate_returns(history_tbl):
     ],
     prevent_initial_call = True
 )
+@profiled
 def render_ab_plot(n_clicks,returns, benchmark_id, asset_id, start_date, end_date):
-    returns_df = pd.DataFrame(returns)
-    returns_df['Date'] = pd.to_datetime(returns_df['Date']).dt.date
-    date_format = "%Y-%m-%d"
-    start_date = datetime.strptime(start_date, date_format).date()
-    end_date = datetime.strptime(end_date, date_format).date()
-    returns_df = returns_df[(returns_df['Date'] >= start_date) & (returns_df['Date'] <= end_date)]
-    returns = returns_df.to_dict()
-    fig = px.scatter(returns, x=benchmark_id, y=asset_id, trendline='ols')
-    model = px.get_trendline_results(fig)
-    alpha = model.iloc[0]["px_fit_results"].params[0]
-    beta = model.iloc[0]["px_fit_results"].params[1]
+    import plotly.express as px
+    with stage('frame'):
+        returns_df = pd.DataFrame(returns)
+        returns_df['Date'] = pd.to_datetime(returns_df['Date']).dt.date
+        date_format = "%Y-%m-%d"
+        start_date = datetime.strptime(start_date, date_format).date()
+        end_date = datetime.strptime(end_date, date_format).date()
+        returns_df = returns_df[(returns_df['Date'] >= start_date) & (returns_df['Date'] <= end_date)]
+    with stage('fit'):
+        alpha, beta = AlphaBeta(
+            returns_df[benchmark_id].to_numpy(), returns_df[asset_id].to_numpy()
+        ).window()
+    with stage('figure') as s:
+        fig = px.scatter(returns_df, x=benchmark_id, y=asset_id, render_mode='webgl')
+        x_line = np.array([returns_df[benchmark_id].min(), returns_df[benchmark_id].max()])
+        fig.add_scatter(x=x_line, y=alpha + beta * x_line, mode='lines', showlegend=False)
+        s.rows = returns_df.shape[0]
     alpha_beta_string = 'alpha is ' + str(alpha) + ', beta is ' + str(beta)
     return(fig, alpha_beta_string)
 
@@ -1,18 +1,60 @@
 from dash import Dash, html, dcc, dash_table, Input, Output, State
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
-import eikon as ek
+from algo.provider import market_data
 import pandas as pd
 import numpy as np
 from datetime import datetime, date, timedelta
-import plotly.express as px
-import os
+import importlib
+from functools import lru_cache
+from algo.alphabeta import AlphaBeta
+from algo.cache import PriceCache
+from algo.corporate_actions import (
+    clean_divs, clean_prices, clean_splits, merge_history
+)
+from algo.datastore import DataStore
+from algo.fetcher import (
+    FetchScheduler, history_field_groups, raise_for_errors
+)
+from algo.profiling import add_diagnostics, profiled, stage
+from algo.returns import returns_frame
+from algo.warmup import Warmup
+
+# one long-lived Refinitiv connection per worker process, with the app key
+# from AppKey (or the offline stand-in when REFINITIV_OFFLINE is set; see
+# algo/provider.py and algo/offline.py)
+provider = market_data()
+
+# serve already-downloaded dates from disk, fetch only what's missing
+price_cache = PriceCache(provider.get_data)
+scheduler = FetchScheduler(price_cache.get_data)
+
+# query results & returns stay on the server; the browser only gets tokens
+# and the page of each table it is showing
+dataset_store = DataStore()
+PAGE_SIZE = 25
 
-ek.set_app_key(os.getenv('AppKey'))
+# slow setup (the Refinitiv login, plotly.express) runs on a background thread,
+# or on first use, so the server answers /_health at once and /_ready once it
+# is done (see algo/warmup.py)
+warmup = Warmup()
+warmup.task('refinitiv', provider.connect)
+warmup.task('plotly', lambda: importlib.import_module('plotly.express'),
+            shared=True)
 
 app = Dash(external_stylesheets=[dbc.themes.BOOTSTRAP])
+warmup.add_routes(app.server)
+warmup.start()
 
 percentage = dash_table.FormatTemplate.percentage(3)
 
+# per-callback & per-stage timings; with PROFILE_DIAGNOSTICS=1, as JSON at
+# /_diagnostics and in a panel at the bottom of the page (see
+# algo/profiling.py)
+diagnostics = add_diagnostics(
+    app, provider=provider.stats, price_cache=price_cache.stats
+)
+
 controls = dbc.Card(
     [
         dbc.Row(html.Button('QUERY Refinitiv', id='run-query', n_clicks=0)),
@@ -81,24 +123,32 @@ app.layout = dbc.Container(
             ],
             align="center",
         ),
+        # tokens for the DataFrames held server-side in dataset_store
+        dcc.Store(id="history-token"),
+        dcc.Store(id="returns-token"),
         html.H2('Raw Data from Refinitiv'),
         dash_table.DataTable(
             id = "history-tbl",
-            page_action='none',
+            page_action='custom',
+            page_current=0,
+            page_size=PAGE_SIZE,
             style_table={'height': '300px', 'overflowY': 'auto'}
         ),
         html.H2('Historical Returns'),
         dash_table.DataTable(
             id = "returns-tbl",
-            page_action='none',
+            page_action='custom',
+            page_current=0,
+            page_size=PAGE_SIZE,
             style_table={'height': '300px', 'overflowY': 'auto'}
-        )
+        ),
+        diagnostics
     ],
     fluid=True
 )
 
 @app.callback(
-    Output("history-tbl", "data"),
+    Output("history-token", "data"),
     Input("run-query", "n_clicks"),
     [
         State('benchmark-id', 'value'),
@@ -108,162 +158,75 @@ app.layout = dbc.Container(
     ],
     prevent_initial_call=True
 )
+@profiled
 def query_refinitiv(n_clicks, benchmark_id, asset_id, start_date, end_date):
     assets = [benchmark_id, asset_id]
 
-    prices, prc_err = ek.get_data(
-        instruments=assets,
-        fields=[
-            'TR.OPENPRICE(Adjusted=0)',
-            'TR.HIGHPRICE(Adjusted=0)',
-            'TR.LOWPRICE(Adjusted=0)',
-            'TR.CLOSEPRICE(Adjusted=0)',
-            'TR.PriceCloseDate'
-        ],
-        parameters={
-            'SDate': start_date,
-            'EDate': end_date,
-            'Frq': 'D'
-        }
-    )
-    prices.dropna(inplace=True)
-
-    divs, div_err = ek.get_data(
-        instruments=assets,
-        fields=[
-            'TR.DivExDate',
-            'TR.DivUnadjustedGross',
-            'TR.DivType',
-            'TR.DivPaymentType'
-        ],
-        parameters={
-            'SDate': start_date,
-            'EDate': end_date,
-            'Frq': 'D'
-        }
-    )
-    divs.dropna(inplace=True)
-
-    splits, splits_err = ek.get_data(
-        instruments=assets,
-        fields=['TR.CAEffectiveDate', 'TR.CAAdjustmentFactor'],
-        parameters={
-            "CAEventType": "SSP",
-            'SDate': start_date,
-            'EDate': end_date,
-            'Frq': 'D'
-        }
-    )
-    splits.dropna(inplace=True)
-
-    #######
-
-    prices.rename(
-        columns={
-            'Open Price': 'open',
-            'High Price': 'high',
-            'Low Price': 'low',
-            'Close Price': 'close'
-        },
-        inplace=True
-    )
-    prices['Date'] = pd.to_datetime(prices['Date']).dt.date
-
-    if divs.shape[0] == 0:
-        unadjusted_price_history = prices
-        unadjusted_price_history['div_amt'] = 0
-    else:
-        divs.rename(
-            columns={
-                'Dividend Ex Date': 'Date',
-                'Gross Dividend Amount': 'div_amt',
-                'Dividend Type': 'div_type',
-                'Dividend Payment Type': 'pay_type'
-            },
-            inplace=True
+    with stage('get_data') as s:
+        fetched, fetch_errors = scheduler.fetch(
+            assets, history_field_groups(start_date, end_date)
         )
-        divs['Date'] = pd.to_datetime(divs['Date']).dt.date
-        divs = divs[(divs.Date.notnull()) & (divs.div_amt > 0)]
-        divs = divs.groupby(['Instrument', 'Date'], as_index=False).agg({
-            'div_amt': 'sum',
-            'div_type': lambda x: ", ".join(x),
-            'pay_type': lambda x: ", ".join(x)
-        })
-        unadjusted_price_history = pd.merge(
-            prices, divs[['Instrument', 'Date', 'div_amt']],
-            how='outer',
-            on=['Date', 'Instrument']
-        )
-        unadjusted_price_history['div_amt'].fillna(0, inplace=True)
+        s.rows = scheduler.last_stats['rows']
+    # a failed dividend or split query would leave those rows at 0 / 1
+    raise_for_errors(fetch_errors)
 
-    if splits.shape[0] == 0:
-        unadjusted_price_history = prices
-        unadjusted_price_history['split_rto'] = 1
-    else:
-        splits.rename(
-            columns={
-                'Capital Change Effective Date': 'Date',
-                'Adjustment Factor': 'split_rto'
-            },
-            inplace=True
+    with stage('frame') as s:
+        # cleaning, dividend & split alignment and the missing-value /
+        # duplicate checks in one vectorized pass (see
+        # algo/corporate_actions.py)
+        unadjusted_price_history = merge_history(
+            clean_prices(fetched['prices']),
+            clean_divs(fetched['divs']),
+            clean_splits(fetched['splits'])
         )
-        splits['Date'] = pd.to_datetime(splits['Date']).dt.date
-
-        unadjusted_price_history = pd.merge(
-            unadjusted_price_history, splits,
-            how='outer',
-            on=['Date', 'Instrument']
+        unadjusted_price_history['Date'] = (
+            unadjusted_price_history['Date'].dt.date
         )
-        unadjusted_price_history['split_rto'].fillna(1, inplace=True)
+        s.rows = unadjusted_price_history.shape[0]
 
-    if unadjusted_price_history.isnull().values.any():
-        raise Exception('missing values detected!')
+    with stage('store'):
+        return(dataset_store.put(unadjusted_price_history))
 
-    return(unadjusted_price_history.to_dict('records'))
+@app.callback(
+    Output("history-tbl", "data"),
+    Output("history-tbl", "page_count"),
+    Input("history-token", "data"),
+    Input("history-tbl", "page_current"),
+    Input("history-tbl", "page_size"),
+    prevent_initial_call = True
+)
+@profiled
+def render_history_tbl(history_token, page_current, page_size):
+    # only the page on screen is sent to the browser
+    with stage('page') as s:
+        records = dataset_store.page(history_token, page_current, page_size)
+        s.rows = len(records)
+    return (records, dataset_store.page_count(history_token, page_size))
 
 @app.callback(
     [
-        Output("returns-tbl", "data"),
+        Output("returns-token", "data"),
         Output("returns-tbl", "columns"),
         Output('ab-range-slider', 'min'),
         Output('ab-range-slider', 'max'),
         Output('ab-range-slider', 'value')
     ],
-    Input("history-tbl", "data"),
+    Input("history-token", "data"),
     prevent_initial_call = True
 )
-def calculate_returns(history_tbl):
-
-    dt_prc_div_splt = pd.DataFrame(history_tbl)
+@profiled
+def calculate_returns(history_token):
 
-    # Define what columns contain the Identifier, date, price, div, & split info
-    ins_col = 'Instrument'
-    dte_col = 'Date'
-    prc_col = 'close'
-    div_col = 'div_amt'
-    spt_col = 'split_rto'
+    dt_prc_div_splt = dataset_store.get(history_token)
 
-    dt_prc_div_splt[dte_col] = pd.to_datetime(dt_prc_div_splt[dte_col])
-    dt_prc_div_splt = dt_prc_div_splt.sort_values([ins_col, dte_col])[
-        [ins_col, dte_col, prc_col, div_col, spt_col]].groupby(ins_col)
-    numerator = dt_prc_div_splt[[dte_col, ins_col, prc_col, div_col]].tail(-1)
-    denominator = dt_prc_div_splt[[prc_col, spt_col]].head(-1)
-
-    hist_rtns = pd.DataFrame({
-        'Date': numerator[dte_col].reset_index(drop=True),
-        'Instrument': numerator[ins_col].reset_index(drop=True),
-        'rtn': np.log(
-            (numerator[prc_col] + numerator[div_col]).reset_index(drop=True) / (
-                    denominator[prc_col] * denominator[spt_col]
-            ).reset_index(drop=True)
-        )
-    }).pivot_table(
-        values='rtn', index='Date', columns='Instrument'
-    )
+    # split- & dividend-adjusted log returns, one column per instrument
+    with stage('returns') as s:
+        hist_rtns = returns_frame(dt_prc_div_splt)
+        s.rows = hist_rtns.shape[0]
 
-    hist_rtns.reset_index(inplace=True)
-    hist_rtns = hist_rtns.rename(columns={'index': 'Date'})
-    hist_rtns['Date'] = pd.to_datetime(hist_rtns['Date']).dt.date
+    with stage('frame'):
+        hist_rtns.reset_index(inplace=True)
+        hist_rtns['Date'] = pd.to_datetime(hist_rtns['Date']).dt.date
 
     columns = [
         dict(id=hist_rtns.columns[0], name=hist_rtns.columns[0]),
@@ -281,42 +244,77 @@ def calculate_returns(history_tbl):
         ),
     ]
 
+    with stage('store'):
+        returns_token = dataset_store.put(hist_rtns)
     return (
-        hist_rtns.to_dict('records'), columns, 0, hist_rtns.shape[0],
+        returns_token, columns, 0, hist_rtns.shape[0],
         [0, hist_rtns.shape[0]]
     )
 
+@app.callback(
+    Output("returns-tbl", "data"),
+    Output("returns-tbl", "page_count"),
+    Input("returns-token", "data"),
+    Input("returns-tbl", "page_current"),
+    Input("returns-tbl", "page_size"),
+    prevent_initial_call = True
+)
+@profiled
+def render_returns_tbl(returns_token, page_current, page_size):
+    with stage('page') as s:
+        records = dataset_store.page(returns_token, page_current, page_size)
+        s.rows = len(records)
+    return (records, dataset_store.page_count(returns_token, page_size))
+
 @app.callback(
     Output("ab-plot", "figure"),
-    [Input("returns-tbl", "data"), Input('ab-range-slider', 'value')],
+    [Input("returns-token", "data"), Input('ab-range-slider', 'value')],
+    [State('benchmark-id', 'value'), State('asset-id', 'value')],
     prevent_initial_call = True
 )
-def render_ab_plot(returns, slider_range):
+@profiled
+def render_ab_plot(returns_token, slider_range, benchmark, asset):
+    import plotly.express as px
 
-    returns = pd.DataFrame(returns)
-    returns = returns[int(slider_range[0]):int(slider_range[1])]
+    returns = dataset_store.get(returns_token)
+    start, end = int(slider_range[0]), int(slider_range[1])
+    # returns_frame sorts its columns by RIC, so they are picked by name
+    if benchmark not in returns or asset not in returns:
+        raise PreventUpdate  # the ids were edited since the last query
 
-    fig = px.scatter(
-        returns,
-        x=returns.columns[1],
-        y=returns.columns[2],
-        trendline='ols'
-    )
+    # the fit comes from the prefix sums built once per returns table; the
+    # plot only has to draw the points and one line
+    with stage('fit'):
+        alpha, beta = ab_engine(returns_token, benchmark, asset).window(
+            start, end
+        )
+    returns = returns[start:end]
 
-    fit_results = px.get_trendline_results(fig).px_fit_results.iloc[0].params
+    with stage('figure') as s:
+        fig = px.scatter(returns, x=benchmark, y=asset, render_mode='webgl')
+        x_line = np.array([returns[benchmark].min(), returns[benchmark].max()])
+        fig.add_scatter(
+            x=x_line, y=alpha + beta * x_line, mode='lines', showlegend=False
+        )
+        s.rows = returns.shape[0]
 
     fig.update_layout(
-        title = "Benchmark Plot: " + returns.columns[2] + " vs " + \
-                returns.columns[1] + '<br><sup>' + "Alpha: " + \
-                str("{:.5%}".format(fit_results[0])) + "; Beta: " + \
-                str(round(fit_results[1], 3)) + '     From ' + \
-                returns['Date'][slider_range[0]] + ' to ' + returns['Date'][
-                    slider_range[0]] + '</sup>',
+        title = "Benchmark Plot: " + asset + " vs " + \
+                benchmark + '<br><sup>' + "Alpha: " + \
+                str("{:.5%}".format(alpha)) + "; Beta: " + \
+                str(round(beta, 3)) + '     From ' + \
+                str(returns['Date'].iloc[0]) + ' to ' + \
+                str(returns['Date'].iloc[-1]) + '</sup>',
         xaxis=dict(tickformat=".2%"),
         yaxis=dict(tickformat=".2%")
     )
 
     return(fig)
 
+@lru_cache(maxsize=32)
+def ab_engine(returns_token, benchmark, asset):
+    returns = dataset_store.get(returns_token)
+    return AlphaBeta(returns[benchmark].to_numpy(), returns[asset].to_numpy())
+
 if __name__ == '__main__':
     app.run_server(debug=True)
\ No newline at end of file
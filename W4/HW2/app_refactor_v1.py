@@ -1,20 +1,60 @@
 from dash import Dash, html, dcc, dash_table, Input, Output, State
 import dash_bootstrap_components as dbc
-import eikon as ek
+from algo.provider import market_data
 import pandas as pd
-import numpy as np
 from datetime import date, datetime
-import refinitiv.data as rd
+from functools import lru_cache
+from algo.cache import PriceCache
+from algo.datastore import DataStore
+from algo.fills import entry_order_book, exit_order_book
+from algo.orderbook import BLOTTER_COLUMNS, OrderBook
+from algo.profiling import add_diagnostics, profiled, stage
+from algo.rangeindex import RangeMinMax
+from algo.trading_calendar import TradingCalendar, verify_with_refinitiv
+from algo.warmup import Warmup
 
 import os
 
-ek.set_app_key(os.getenv('AppKey'))
+# one long-lived Refinitiv connection per worker process, with the app key
+# from AppKey (or the offline stand-in when REFINITIV_OFFLINE is set; see
+# algo/provider.py and algo/offline.py)
+provider = market_data()
+
+# serve already-downloaded dates from disk, fetch only what's missing
+price_cache = PriceCache(provider.get_data)
+
+# next business day comes from a local calendar instead of a Refinitiv
+# session per callback; set VERIFY_CALENDAR=1 to check it against Refinitiv
+usa_calendar = TradingCalendar()
+
+# price history & order tables stay on the server; the browser only gets
+# tokens and the page of the blotter it is showing
+dataset_store = DataStore()
+PAGE_SIZE = 25
+
+# slow setup (the Refinitiv login, the calendar check) runs on a background
+# thread, or on first use, so the server answers /_health at once and /_ready
+# once it is done (see algo/warmup.py)
+warmup = Warmup()
+warmup.task('refinitiv', provider.connect)
+if os.getenv('VERIFY_CALENDAR'):
+    warmup.task('verify_calendar', lambda: print(verify_with_refinitiv(
+        usa_calendar, date(datetime.now().year - 1, 1, 1), datetime.now()
+    )))
 
 
 app = Dash(external_stylesheets=[dbc.themes.BOOTSTRAP])
+warmup.add_routes(app.server)
+warmup.start()
 
 percentage = dash_table.FormatTemplate.percentage(3)
 
+# per-callback & per-stage timings; with PROFILE_DIAGNOSTICS=1, as JSON at
+# /_diagnostics and in a panel under the blotter (see algo/profiling.py)
+diagnostics = add_diagnostics(
+    app, provider=provider.stats, price_cache=price_cache.stats
+)
+
 controls = dbc.Card(
     [
         dbc.Row(html.Button('QUERY Refinitiv', id='run-query', n_clicks=0)),
@@ -111,19 +151,18 @@ app.layout = dbc.Container(
             align="center",
         ),
         html.H2('Trade Blotter:'),
+        # tokens for the DataFrames held server-side in dataset_store
+        dcc.Store(id="history-token"),
+        dcc.Store(id="entry-token"),
+        dcc.Store(id="exit-token"),
+        dcc.Store(id="blotter-token"),
         dash_table.DataTable(
-            id="history-tbl",
-            style_table={'display': 'none'}
-        ),
-        dash_table.DataTable(
-            id="entry-tbl",
-            style_table={'display': 'none'}
-        ),
-        dash_table.DataTable(
-            id="exit-tbl",
-            style_table={'display': 'none'}
+            id = "blotter",
+            page_action='custom',
+            page_current=0,
+            page_size=PAGE_SIZE
         ),
-        dash_table.DataTable(id = "blotter"),
+        diagnostics,
         html.Footer('Copyright © Qihang Ma, Yuanzhe Wang')
     ],
     fluid=True
@@ -131,349 +170,156 @@ app.layout = dbc.Container(
 
 
 @app.callback(
-    Output("history-tbl", "data"),
+    Output("history-token", "data"),
     Input("run-query", "n_clicks"),
     [State('asset', 'value'),
      State('refinitiv-date-range', 'start_date'), State('refinitiv-date-range', 'end_date')],
     prevent_initial_call=True
 )
+@profiled
 def query_refinitiv(n_clicks, asset_id, start_date, end_date):
     assets = [asset_id]
     start_date_object = date.fromisoformat(start_date)
     end_date_object = date.fromisoformat(end_date)
     data_start = start_date_object.strftime("%Y-%m-%d")
     data_end = end_date_object.strftime("%Y-%m-%d")
-    prices, prc_err = ek.get_data(
-        instruments=assets,
-        fields = [
-            'TR.OPENPRICE(Adjusted=0)',
-            'TR.HIGHPRICE(Adjusted=0)',
-            'TR.LOWPRICE(Adjusted=0)',
-            'TR.CLOSEPRICE(Adjusted=0)',
-            'TR.PriceCloseDate'
-        ],
-        parameters = {
-            'SDate': data_start,
-            'EDate': data_end,
-            'Frq': 'D'
-        }
-    )
+    with stage('get_data') as s:
+        prices, prc_err = price_cache.get_data(
+            instruments=assets,
+            fields = [
+                'TR.OPENPRICE(Adjusted=0)',
+                'TR.HIGHPRICE(Adjusted=0)',
+                'TR.LOWPRICE(Adjusted=0)',
+                'TR.CLOSEPRICE(Adjusted=0)',
+                'TR.PriceCloseDate'
+            ],
+            parameters = {
+                'SDate': data_start,
+                'EDate': data_end,
+                'Frq': 'D'
+            }
+        )
+        s.rows = prices.shape[0]
 
-    prices['Date'] = pd.to_datetime(prices['Date']).dt.date
-    prices.drop(columns='Instrument', inplace=True)
+    with stage('frame'):
+        prices['Date'] = pd.to_datetime(prices['Date']).dt.date
+        prices.drop(columns='Instrument', inplace=True)
 
-    return(prices.to_dict('records'))
+    with stage('store'):
+        return(dataset_store.put(prices))
 
 @app.callback(
-    Output("entry-tbl", "data"),
+    Output("entry-token", "data"),
     Input("run-query", "n_clicks"),
-    Input("history-tbl", "data"),
+    Input("history-token", "data"),
     Input('n1', 'value'),
     Input('alpha1', 'value'),
     State('asset', 'value'),
     prevent_initial_call = True
 )
-def get_entry_tbl(n_clicks, history_tbl, n1, alpha1, asset):
+@profiled
+def get_entry_tbl(n_clicks, history_token, n1, alpha1, asset):
     n1 = int(n1)
     alpha1 = float(alpha1)
-    prices = pd.DataFrame(history_tbl)
-    prices['Date'] = list(pd.to_datetime(prices["Date"].iloc[:]).dt.date)
-    ##### Get the next business day from Refinitiv!!!!!!!
-    rd.open_session()
-
-    next_business_day = rd.dates_and_calendars.add_periods(
-        start_date= prices['Date'].iloc[-1].strftime("%Y-%m-%d"),
-        period="1D",
-        calendars=["USA"],
-        date_moving_convention="NextBusinessDay",
-    )
-
-    rd.close_session()
-    ######################################################
-
-    submitted_entry_orders = pd.DataFrame({
-        "trade_id": range(1, prices.shape[0]),
-        "date": list(pd.to_datetime(prices["Date"].iloc[1:]).dt.date),
-        "asset": asset,
-        "trip": 'ENTER',
-        "action": "BUY",
-        "type": "LMT",
-        "price": prices['Close Price'].iloc[:-1] * (1 + alpha1),
-        'status': 'SUBMITTED'
-    })
-    #print(submitted_entry_orders)
-
-
-
-    # if the lowest traded price is still higher than the price you bid, then the
-    # order never filled and was cancelled.
-    with np.errstate(invalid='ignore'):
-        cancelled_entry_orders = submitted_entry_orders[
-            np.greater(
-                prices['Low Price'].iloc[1:][::-1].rolling(n1).min()[::-1].to_numpy(),
-                submitted_entry_orders['price'].to_numpy()
-            )
-        ].copy()
-    cancelled_entry_orders.reset_index(drop=True, inplace=True)
-    cancelled_entry_orders['status'] = 'CANCELLED'
-    cancelled_entry_orders['date'] = pd.DataFrame(
-        {'cancel_date': submitted_entry_orders['date'].iloc[(n1-1):].to_numpy()},
-        index=submitted_entry_orders['date'].iloc[:(1-n1)].to_numpy()
-    ).loc[cancelled_entry_orders['date']]['cancel_date'].to_list()
-    #print(cancelled_entry_orders)
-
-    filled_entry_orders = submitted_entry_orders[
-        submitted_entry_orders['trade_id'].isin(
-            list(
-                set(submitted_entry_orders['trade_id']) - set(
-                    cancelled_entry_orders['trade_id']
-                )
-            )
+    prices = dataset_store.get(history_token)
+    with stage('calendar'):
+        next_business_day = usa_calendar.next_business_day(
+            prices['Date'].iloc[-1]
+        ).item()
+
+    with stage('index'):
+        lows = price_index(history_token)['Low Price']
+    with stage('fills') as s:
+        entry_orders = entry_order_book(
+            prices, asset, alpha1, n1, next_business_day, lows=lows
         )
-    ].copy()
-    filled_entry_orders.reset_index(drop=True, inplace=True)
-    filled_entry_orders['status'] = 'FILLED'
-    for i in range(0, len(filled_entry_orders)):
-
-        idx1 = np.flatnonzero(
-            prices['Date'] == filled_entry_orders['date'].iloc[i]
-        )[0]
-
-        ivv_slice = prices.iloc[idx1:(idx1+n1)]['Low Price']
-
-        fill_inds = ivv_slice <= filled_entry_orders['price'].iloc[i]
-
-        if (len(fill_inds) < n1) & (not any(fill_inds)):
-            filled_entry_orders.at[i, 'status'] = 'LIVE'
-        else:
-            filled_entry_orders.at[i, 'date'] = prices['Date'].iloc[
-                fill_inds.idxmax()
-            ]
-
-    if any(filled_entry_orders['status'] =='LIVE'):
-        live_entry_orders = pd.concat(
-            [
-                pd.DataFrame({
-                    "trade_id": prices.shape[0],
-                    "date": pd.to_datetime(next_business_day).date(),
-                    "asset": asset,
-                    "trip": 'ENTER',
-                    "action": "BUY",
-                    "type": "LMT",
-                    "price": prices['Close Price'].iloc[-1] * (1 + alpha1),
-                    'status': 'LIVE'
-                },
-                    index=[0]
-                ),
-                filled_entry_orders[filled_entry_orders['status'] == 'LIVE']
-            ]
-        )
-    else:
-        live_entry_orders = pd.DataFrame({
-            "trade_id": prices.shape[0],
-            "date": pd.to_datetime(next_business_day).date(),
-            "asset": asset,
-            "trip": 'ENTER',
-            "action": "BUY",
-            "type": "LMT",
-            "price": prices['Close Price'].iloc[-1] * (1 + alpha1),
-            'status': 'LIVE'
-        },
-            index=[0]
-        )
-    
-    #for i in range(0, len(live_entry_orders)):
-    #    live_entry_orders.loc[i, 'date'] = pd.to_datetime(next_business_day).date()
-
-    live_entry_orders['date'] = pd.to_datetime(next_business_day).date()
-
-    filled_entry_orders = filled_entry_orders[
-        filled_entry_orders['status'] == 'FILLED'
-        ]
-
-    #print(filled_entry_orders)
-    #print(live_entry_orders)
+        s.rows = len(entry_orders)
 
-    entry_orders = pd.concat(
-        [
-            submitted_entry_orders,
-            cancelled_entry_orders,
-            filled_entry_orders,
-            live_entry_orders
-        ]
-    ).sort_values(["date", 'trade_id'])
-
-    return(entry_orders.to_dict('records'))
+    with stage('store'):
+        return(dataset_store.put(entry_orders))
 
 
 @app.callback(
-    Output("exit-tbl", "data"),
+    Output("exit-token", "data"),
     Input("run-query", "n_clicks"),
-    Input("entry-tbl", "data"),
-    Input("history-tbl", "data"),
+    Input("entry-token", "data"),
+    Input("history-token", "data"),
     Input('n2', 'value'),
     Input('alpha2', 'value'),
     State('asset', 'value'),
     prevent_initial_call = True
 )
-def get_exit_tbl(n_clicks, entry_tbl, history_tbl, n2, alpha2, asset):    
+@profiled
+def get_exit_tbl(n_clicks, entry_token, history_token, n2, alpha2, asset):
     n2 = int(n2)
     alpha2 = float(alpha2)
-    prices = pd.DataFrame(history_tbl)
-    prices['Date'] = list(pd.to_datetime(prices["Date"].iloc[:]).dt.date)
-    ##### Get the next business day from Refinitiv!!!!!!!
-    rd.open_session()
-
-    next_business_day = rd.dates_and_calendars.add_periods(
-        start_date= prices['Date'].iloc[-1].strftime("%Y-%m-%d"),
-        period="1D",
-        calendars=["USA"],
-        date_moving_convention="NextBusinessDay",
-    )
-
-    rd.close_session()
-    ######################################################
-    entry = pd.DataFrame(entry_tbl)
-    entry['date'] = list(pd.to_datetime(entry["date"].iloc[:]).dt.date)
-
-    filled_entry_orders = entry[entry['status']=='FILLED'].copy()
-
-    submitted_exit_orders = pd.DataFrame({
-        "trade_id": list(filled_entry_orders['trade_id']),
-        "date": list(pd.to_datetime(filled_entry_orders["date"].iloc[:]).dt.date),
-        "asset": asset,
-        "trip": 'EXIT',
-        "action": "SELL",
-        "type": "LMT",
-        "price": filled_entry_orders['price'].iloc[:] * (1 + alpha2),
-        'status': 'SUBMITTED'
-    })
-    submitted_exit_orders = submitted_exit_orders.sort_values(["date", 'trade_id'])
-    submitted_exit_orders.reset_index(drop=True, inplace=True)
-
-
-    high_prices = pd.DataFrame({
-        'High_price': prices['High Price'][::-1].rolling(window=n2).apply(lambda x: x[:-1].max(), raw=True)[::-1],
-        'date': list(pd.to_datetime(prices["Date"].iloc[:]).dt.date),
-        'Close_price':prices['Close Price']
-        })
-    
-    high_prices['High_price'] = high_prices['High_price'].where(high_prices['High_price'].isna() | (high_prices['Close_price'] < high_prices['High_price']), high_prices['Close_price'])
-    
-
-    merge_orders =  pd.merge(submitted_exit_orders, high_prices, on='date', how='left')
-    merge_orders.drop_duplicates(subset=['trade_id'], inplace=True)
-    
-    with np.errstate(invalid='ignore'):
-        cancelled_exit_orders = submitted_exit_orders[
-            np.greater(
-                submitted_exit_orders['price'].to_numpy(),
-                merge_orders['High_price'].to_numpy()
-            )
-        ].copy()
-    cancelled_exit_orders.reset_index(drop=True, inplace=True)
-    cancelled_exit_orders['status'] = 'CANCELLED'
-
-    cancelled_exit_orders['date'] = pd.DataFrame(
-        {'cancel_date': prices['Date'].iloc[(n2-1):].to_numpy()},
-        index=prices['Date'].iloc[:(1-n2)].to_numpy()
-    ).loc[cancelled_exit_orders['date']]['cancel_date'].to_list()
-
-
-    filled_exit_orders = submitted_exit_orders[
-        submitted_exit_orders['trade_id'].isin(
-            list(
-                set(submitted_exit_orders['trade_id']) - set(
-                    cancelled_exit_orders['trade_id']
-                )
-            )
+    prices = dataset_store.get(history_token)
+    with stage('calendar'):
+        next_business_day = usa_calendar.next_business_day(
+            prices['Date'].iloc[-1]
+        ).item()
+    entry = dataset_store.get(entry_token)
+
+    with stage('index'):
+        highs = price_index(history_token)['High Price']
+    with stage('fills') as s:
+        exit_orders = exit_order_book(
+            prices, entry, asset, alpha2, n2, next_business_day, highs=highs
         )
-    ].copy()
-    filled_exit_orders.reset_index(drop=True, inplace=True)
-    filled_exit_orders['status'] = 'FILLED'
-
-    for i in range(0, len(filled_exit_orders)):
-
-        idx1 = np.flatnonzero(
-            prices['Date'] == filled_exit_orders['date'].iloc[i]
-        )[0]
+        s.rows = len(exit_orders)
 
-        price_slice = pd.Series([prices.iloc[idx1]['Close Price']] + list(prices.iloc[idx1+1:(idx1+n2)]['High Price']))
+    with stage('store'):
+        return(dataset_store.put(exit_orders))
 
-        fill_inds = price_slice >= filled_exit_orders['price'].iloc[i]
 
-        if (len(fill_inds) < n2) & (not any(fill_inds)):
-            filled_exit_orders.at[i, 'status'] = 'LIVE'
-        else:
-            filled_exit_orders.at[i, 'date'] = prices['Date'].iloc[
-                idx1+fill_inds.idxmax()
-            ]
-    
-    live_exit_orders = filled_exit_orders[
-        filled_exit_orders['status'] == 'LIVE'
-        ].copy()
-    
-    #for i in range(0, len(live_exit_orders)):
-    #    print(pd.to_datetime(next_business_day).date())
-    #    live_exit_orders.loc[i, 'date'] = pd.to_datetime(next_business_day).date()
-    #print(live_exit_orders)
-
-    live_exit_orders['date'] = pd.to_datetime(next_business_day).date()
-    
-
-    filled_exit_orders = filled_exit_orders[
-        filled_exit_orders['status'] == 'FILLED'
-        ]
-
-    submitted_market_exit_orders = pd.DataFrame({
-        "trade_id": list(cancelled_exit_orders['trade_id']),
-        "date": list(pd.to_datetime(cancelled_exit_orders["date"].iloc[:]).dt.date),
-        "asset": asset,
-        "trip": 'EXIT',
-        "action": "SELL",
-        "type": "MKT",
-        "price": list(cancelled_exit_orders['price']),
-        'status': 'SUBMITTED'
-    })
-
-    for i in range(0, len(submitted_market_exit_orders)):
-
-        idx1 = np.flatnonzero(
-            prices['Date'] == submitted_market_exit_orders['date'].iloc[i]
-        )[0]
-
-        submitted_market_exit_orders.loc[i, 'price'] = prices.loc[idx1, 'Close Price']
-
-    filled_market_exit_orders = submitted_market_exit_orders.copy()
-    filled_market_exit_orders["status"] = "FILLED"
-
-
-    exit_orders = pd.concat(
-        [
-            submitted_exit_orders,
-            cancelled_exit_orders,
-            filled_exit_orders,
-            live_exit_orders,
-            submitted_market_exit_orders,
-            filled_market_exit_orders
-        ]
-    ).sort_values(["date", 'trade_id'])
-
-    return(exit_orders.to_dict('records'))
+@app.callback(
+    Output("blotter-token", "data"),
+    Input("run-query", "n_clicks"),
+    Input("entry-token", "data"),
+    Input('exit-token', 'data'),
+    prevent_initial_call = True
+)
+@profiled
+def get_blotter(n_clicks, entry_token, exit_token):
+    entry_tbl = dataset_store.get(entry_token)
+    exit_tbl = dataset_store.get(exit_token)
+    with stage('concat') as s:
+        result = OrderBook.concat([entry_tbl, exit_tbl]).sorted(['trade_id','date'])
+        s.rows = len(result)
+    with stage('store'):
+        return(dataset_store.put(result))
 
 
 @app.callback(
     Output("blotter", "data"),
-    Input("run-query", "n_clicks"),
-    Input("entry-tbl", "data"),
-    Input('exit-tbl', 'data'),
+    Output("blotter", "columns"),
+    Output("blotter", "page_count"),
+    Input("blotter-token", "data"),
+    Input("blotter", "page_current"),
+    Input("blotter", "page_size"),
     prevent_initial_call = True
 )
-def get_blotter(n_clicks, entry_tbl, exit_tbl):
-    entry_tbl = pd.DataFrame(entry_tbl)
-    exit_tbl = pd.DataFrame(exit_tbl)    
-    result = pd.concat([entry_tbl, exit_tbl]).sort_values(['trade_id','date'])
-    return(result.to_dict('records'))
+@profiled
+def render_blotter(blotter_token, page_current, page_size):
+    # only the page on screen is sent to the browser
+    columns = [dict(id=col, name=col) for col in BLOTTER_COLUMNS]
+    with stage('page') as s:
+        records = dataset_store.page(blotter_token, page_current, page_size)
+        s.rows = len(records)
+    return (
+        records,
+        columns,
+        dataset_store.page_count(blotter_token, page_size)
+    )
+
+@lru_cache(maxsize=32)
+def price_index(history_token):
+    # range min / max over the lows & highs, built once per price history
+    # and reused whenever n1 / n2 change
+    prices = dataset_store.get(history_token)
+    return {
+        col: RangeMinMax(prices[col]) for col in ['Low Price', 'High Price']
+    }
 
 if __name__ == '__main__':
     app.run_server(debug=True)
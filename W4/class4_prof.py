@@ -1,22 +1,24 @@
 import pandas as pd
 from datetime import datetime
 import numpy as np
-import os
-import eikon as ek
-import refinitiv.data as rd
 import time
+from algo.fills import fill_windows, simulate_fills, first_row_of
+from algo.provider import market_data
+from algo.trading_calendar import TradingCalendar
 
 start_time = time.time()
 
 #####################################################
 
-ek.set_app_key(os.getenv('AppKey'))
+# one Refinitiv connection, with the app key from AppKey (or the offline
+# stand-in when REFINITIV_OFFLINE is set; see algo/provider.py)
+provider = market_data()
 
 start_date_str = '2023-01-30'
 end_date_str = '2023-02-08'
 asset = "IVV"
 
-ivv_prc, ivv_prc_err = ek.get_data(
+ivv_prc, ivv_prc_err = provider.get_data(
     instruments = [asset],
     fields = [
         'TR.OPENPRICE(Adjusted=0)',
@@ -35,17 +37,11 @@ ivv_prc, ivv_prc_err = ek.get_data(
 ivv_prc['Date'] = pd.to_datetime(ivv_prc['Date']).dt.date
 ivv_prc.drop(columns='Instrument', inplace=True)
 
-##### Get the next business day from Refinitiv!!!!!!!
-rd.open_session()
-
-next_business_day = rd.dates_and_calendars.add_periods(
-    start_date= ivv_prc['Date'].iloc[-1].strftime("%Y-%m-%d"),
-    period="1D",
-    calendars=["USA"],
-    date_moving_convention="NextBusinessDay",
-)
-
-rd.close_session()
+##### Get the next business day from a local US trading calendar (see
+##### algo/trading_calendar.py) instead of opening a Refinitiv session
+next_business_day = TradingCalendar().next_business_day(
+    ivv_prc['Date'].iloc[-1]
+).item()
 ######################################################
 
 # Parameters:
@@ -89,22 +85,18 @@ filled_entry_orders = submitted_entry_orders[
 ].copy()
 filled_entry_orders.reset_index(drop=True, inplace=True)
 filled_entry_orders['status'] = 'FILLED'
-for i in range(0, len(filled_entry_orders)):
-
-    idx1 = np.flatnonzero(
-        ivv_prc['Date'] == filled_entry_orders['date'].iloc[i]
-    )[0]
-
-    ivv_slice = ivv_prc.iloc[idx1:(idx1+n1)]['Low Price']
-
-    fill_inds = ivv_slice <= filled_entry_orders['price'].iloc[i]
-
-    if (len(fill_inds) < n1) & (not any(fill_inds)):
-        filled_entry_orders.at[i, 'status'] = 'LIVE'
-    else:
-        filled_entry_orders.at[i, 'date'] = ivv_prc['Date'].iloc[
-            fill_inds.idxmax()
-        ]
+fill_rows = first_row_of(
+    ivv_prc['Date'].to_numpy(), filled_entry_orders['date'].to_numpy()
+)
+windows, n_avail = fill_windows(ivv_prc['Low Price'], fill_rows, n1)
+fill_status, fill_offset = simulate_fills(
+    windows, filled_entry_orders['price'], 'BUY', n_avail
+)
+is_live = fill_status == 'LIVE'
+filled_entry_orders.loc[is_live, 'status'] = 'LIVE'
+filled_entry_orders.loc[~is_live, 'date'] = ivv_prc['Date'].to_numpy()[
+    fill_rows[~is_live] + fill_offset[~is_live]
+]
 
 live_entry_orders = pd.DataFrame({
     "trade_id": ivv_prc.shape[0],
@@ -0,0 +1,4 @@
+# Shared strategy & data code used by the W2-W4 scripts and Dash apps
+from algo.fills import build_entry_orders, build_exit_orders
+from algo.batch import build_universe_blotter
+from algo.sweep import sweep
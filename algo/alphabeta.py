@@ -0,0 +1,177 @@
+# alphabeta.py
+#  - OLS alpha & beta of assets against a benchmark from prefix sums of
+#    x, y, x^2 and xy: once they are built, the fit over any window of rows
+#    is a handful of subtractions, whatever its length
+#  - rolling & expanding alpha/beta series for every asset at once
+#  - rows where the benchmark or an asset return is missing (NaN) are left
+#    out of that asset's fits
+
+import numpy as np
+import pandas as pd
+
+
+class AlphaBeta:
+    """Fits y = alpha + beta * x over windows of rows.
+
+    `x` is the benchmark's returns (length n); `y` one asset's returns
+    (length n) or a 2-D array with one column per asset. The fit over rows
+    [start, end) costs O(1) per asset. Windows with fewer than two
+    observations, or a flat benchmark, give NaN.
+    """
+
+    def __init__(self, x, y):
+        x = np.asarray(x, dtype='float64')
+        y = np.asarray(y, dtype='float64')
+        self.single = y.ndim == 1
+        y = y.reshape(y.shape[0], -1)
+        x = np.broadcast_to(x[:, None], y.shape)
+        self.n_rows = y.shape[0]
+
+        used = ~np.isnan(x) & ~np.isnan(y)
+        # centring first keeps the prefix sums well-conditioned over long
+        # histories; alpha is shifted back in _fit
+        count = np.maximum(used.sum(axis=0), 1)
+        self._x_mean = np.where(used, x, 0.0).sum(axis=0) / count
+        self._y_mean = np.where(used, y, 0.0).sum(axis=0) / count
+        dx = np.where(used, x - self._x_mean, 0.0)
+        dy = np.where(used, y - self._y_mean, 0.0)
+
+        def prefix(values):
+            return np.concatenate(
+                [np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)]
+            )
+
+        self._n = prefix(used.astype('float64'))
+        self._x = prefix(dx)
+        self._y = prefix(dy)
+        self._xx = prefix(dx * dx)
+        self._xy = prefix(dx * dy)
+
+    def window(self, start=0, end=None):
+        """(alpha, beta) over rows start..end-1; start/end may be arrays."""
+        end = self.n_rows if end is None else end
+        return self._fit(start, end)
+
+    def n_obs(self, start=0, end=None):
+        end = self.n_rows if end is None else end
+        n = self._n[end] - self._n[start]
+        return n[..., 0][()] if self.single else n
+
+    def rolling(self, window):
+        """(alpha, beta) of the last `window` rows at every row.
+
+        Rows before the first full window are NaN. With several assets both
+        are (n_rows, n_assets) arrays.
+        """
+        end = np.arange(1, self.n_rows + 1)
+        start = end - window
+        alpha, beta = self._fit(np.maximum(start, 0), end)
+        alpha[start < 0] = np.nan
+        beta[start < 0] = np.nan
+        return alpha, beta
+
+    def expanding(self):
+        """(alpha, beta) of all rows up to & including each row."""
+        end = np.arange(1, self.n_rows + 1)
+        return self._fit(np.zeros_like(end), end)
+
+    def _fit(self, start, end):
+        n = self._n[end] - self._n[start]
+        sx = self._x[end] - self._x[start]
+        sy = self._y[end] - self._y[start]
+        sxx = self._xx[end] - self._xx[start]
+        sxy = self._xy[end] - self._xy[start]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var_x = n * sxx - sx * sx
+            beta = (n * sxy - sx * sy) / var_x
+            alpha = (sy - beta * sx) / n
+        bad = (n < 2) | (var_x <= 0)
+        beta = np.where(bad, np.nan, beta)
+        alpha = np.where(bad, np.nan, alpha + self._y_mean - beta * self._x_mean)
+
+        if self.single:
+            return alpha[..., 0][()], beta[..., 0][()]
+        return alpha, beta
+
+
+def rolling_alpha_beta(returns, benchmark, window=None):
+    """Rolling (or, with window=None, expanding) alpha & beta of every column
+    of a wide returns table against its `benchmark` column.
+
+    `returns` is calculate_returns' output: one column per instrument, plus
+    an optional Date column that becomes the index. Returns two DataFrames,
+    alpha and beta, with one column per non-benchmark instrument.
+    """
+    if 'Date' in returns.columns:
+        returns = returns.set_index('Date')
+    assets = returns.columns.drop(benchmark)
+    engine = AlphaBeta(returns[benchmark].to_numpy(), returns[assets].to_numpy())
+    if window is None:
+        alpha, beta = engine.expanding()
+    else:
+        alpha, beta = engine.rolling(window)
+    return (
+        pd.DataFrame(alpha, index=returns.index, columns=assets),
+        pd.DataFrame(beta, index=returns.index, columns=assets)
+    )
+
+
+def universe_alpha_beta(returns, benchmark, start=None, end=None):
+    """Alpha, beta, R^2 and residual volatility of every instrument in a wide
+    returns table against its `benchmark` column, computed for all columns
+    at once.
+
+    `returns` is calculate_returns' output (Date as a column or the index).
+    Only dates from `start` to `end` (inclusive, either may be None) are
+    used. Each instrument is fitted on the dates where both it and the
+    benchmark have a return; the others are masked out, not dropped.
+    """
+    if 'Date' in returns.columns:
+        returns = returns.set_index('Date')
+    returns = returns.set_axis(pd.to_datetime(returns.index)).sort_index()
+    returns = returns.loc[slice(start, end)]
+    assets = returns.columns.drop(benchmark)
+
+    x = returns[benchmark].to_numpy(dtype='float64')
+    y = returns[assets].to_numpy(dtype='float64')
+    used = ~np.isnan(y) & ~np.isnan(x)[:, None]
+    weight = used.astype('float64')
+
+    n = weight.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # demean inside each instrument's own sample, so every sum below is
+        # a centred second moment
+        x0 = np.where(np.isnan(x), 0.0, x)
+        x_mean = (x0 @ weight) / n
+        y_mean = np.where(used, y, 0.0).sum(axis=0) / n
+        dx = np.where(used, x[:, None] - x_mean, 0.0)
+        dy = np.where(used, y - y_mean, 0.0)
+
+        sxx = (dx * dx).sum(axis=0)
+        syy = (dy * dy).sum(axis=0)
+        sxy = (dx * dy).sum(axis=0)
+
+        beta = sxy / sxx
+        alpha = y_mean - beta * x_mean
+        ss_resid = np.maximum(syy - beta * sxy, 0.0)
+        r2 = 1 - ss_resid / syy
+        resid_vol = np.sqrt(ss_resid / (n - 2))
+
+    bad = (n < 2) | ~(sxx > 0)
+    result = pd.DataFrame({
+        'alpha': alpha, 'beta': beta, 'r2': r2, 'resid_vol': resid_vol,
+        'n_obs': n.astype('int64')
+    }, index=assets)
+    result.loc[bad, ['alpha', 'beta', 'r2', 'resid_vol']] = np.nan
+    return result
+
+
+if __name__ == '__main__':
+    # python -m algo.alphabeta unadjusted_price_history.csv IVV [start] [end]
+    import sys
+    from algo.returns import returns_frame
+
+    print(universe_alpha_beta(
+        returns_frame(pd.read_csv(sys.argv[1])), sys.argv[2], *sys.argv[3:5]
+    ))
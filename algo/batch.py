@@ -0,0 +1,145 @@
+# batch.py
+#  - run the limit-entry / limit-exit strategy over a whole universe at once
+#  - takes the long format of unadjusted_price_history.csv (one row per
+#    Instrument & Date) and returns the blotter for every instrument
+#  - instruments are laid end to end in one set of arrays and every order in
+#    the universe is resolved in the same vectorized pass (see fills.py),
+#    by range queries on the lows & highs that stop at each instrument's end
+
+import numpy as np
+import pandas as pd
+
+from algo.fills import resolve_fills, FILLED, LIVE, CANCELLED
+from algo.orderbook import BLOTTER_COLUMNS
+from algo.rangeindex import RangeMinMax
+from algo.trading_calendar import TradingCalendar
+
+
+def build_universe_blotter(history, alpha1, n1, alpha2, n2,
+                           next_business_day=None, calendar=None):
+    """Entry & exit orders for every instrument in `history`.
+
+    `history` needs Instrument, Date, high, low & close columns. Per
+    instrument the result matches running get_entry_tbl / get_exit_tbl /
+    get_blotter on that instrument alone; `date` comes back as datetime64.
+    `next_business_day` is the date LIVE orders are carried to; by default
+    it is the trading day after each instrument's last bar in `calendar`
+    (a TradingCalendar).
+    """
+    history = history.assign(Date=pd.to_datetime(history['Date']))
+    history = history.sort_values(['Instrument', 'Date']).drop_duplicates(
+        ['Instrument', 'Date']
+    )
+
+    instrument = history['Instrument'].to_numpy()
+    dates = history['Date'].to_numpy()
+    low = history['low'].to_numpy(dtype=float)
+    high = history['high'].to_numpy(dtype=float)
+    close = history['close'].to_numpy(dtype=float)
+    n_rows = history.shape[0]
+
+    # first row & end (exclusive) of the instrument each row belongs to
+    grp_start = np.flatnonzero(
+        np.r_[True, instrument[1:] != instrument[:-1]]
+    )
+    grp_end = np.r_[grp_start[1:], n_rows]
+    grp_size = grp_end - grp_start
+    first = np.repeat(grp_start, grp_size)
+    stop = np.repeat(grp_end, grp_size)
+
+    if next_business_day is None:
+        calendar = calendar or TradingCalendar()
+        nbd = pd.DatetimeIndex(
+            calendar.next_business_day(dates[grp_end - 1])
+        )
+    else:
+        nbd = pd.DatetimeIndex(np.repeat(
+            pd.Timestamp(next_business_day), grp_start.shape[0]
+        ))
+    row_nbd = np.repeat(nbd.to_numpy(), grp_size)
+
+    ##### entry orders: one limit buy per bar after each instrument's first
+    start = np.flatnonzero(np.arange(n_rows) != first)
+    entry_price = close[start - 1] * (1 + alpha1)
+    status, offset = resolve_fills(
+        RangeMinMax(low), start, n1, entry_price, 'BUY', stop=stop[start]
+    )
+    entry_row = start + np.maximum(offset, 0)
+
+    submitted_entry = _orders(
+        start - first[start], dates[start], instrument[start], 'ENTER',
+        'BUY', 'LMT', entry_price, 'SUBMITTED'
+    )
+    is_cancelled = status == CANCELLED
+    is_filled = status == FILLED
+    is_live = status == LIVE
+    last = grp_end - 1
+    entry_orders = [
+        submitted_entry,
+        _with(submitted_entry, is_cancelled, CANCELLED, dates[entry_row]),
+        _with(submitted_entry, is_filled, FILLED, dates[entry_row]),
+        # tomorrow's order for each instrument, then any still-working ones
+        _orders(
+            grp_size, nbd.to_numpy(), instrument[grp_start], 'ENTER', 'BUY',
+            'LMT', close[last] * (1 + alpha1), LIVE
+        ),
+        _with(submitted_entry, is_live, LIVE, row_nbd[start])
+    ]
+
+    ##### exit orders: a limit sell from each filled entry's fill bar
+    exit_start = entry_row[is_filled]
+    exit_price = entry_price[is_filled] * (1 + alpha2)
+    status, offset = resolve_fills(
+        RangeMinMax(high), exit_start, n2, exit_price, 'SELL',
+        stop=stop[exit_start], first_bar=close[exit_start]
+    )
+    exit_row = exit_start + np.maximum(offset, 0)
+
+    submitted_exit = _orders(
+        start[is_filled] - first[start[is_filled]], dates[exit_start],
+        instrument[exit_start], 'EXIT', 'SELL', 'LMT', exit_price, 'SUBMITTED'
+    )
+    is_cancelled = status == CANCELLED
+    market_exit = _orders(
+        submitted_exit['trade_id'][is_cancelled],
+        dates[exit_row[is_cancelled]], submitted_exit['asset'][is_cancelled],
+        'EXIT', 'SELL', 'MKT', close[exit_row[is_cancelled]], 'SUBMITTED'
+    )
+    exit_orders = [
+        submitted_exit,
+        _with(submitted_exit, is_cancelled, CANCELLED, dates[exit_row]),
+        _with(submitted_exit, status == FILLED, FILLED, dates[exit_row]),
+        _with(submitted_exit, status == LIVE, LIVE, row_nbd[exit_start]),
+        market_exit,
+        dict(market_exit, status=np.full(market_exit['price'].shape, FILLED))
+    ]
+
+    blotter = pd.DataFrame({
+        col: np.concatenate([part[col] for part in entry_orders + exit_orders])
+        for col in BLOTTER_COLUMNS
+    })
+    return blotter.sort_values(['asset', 'trade_id', 'date'],
+                               ignore_index=True)
+
+
+def _orders(trade_id, date, asset, trip, action, type, price, status):
+    # column arrays for a batch of orders; scalars are broadcast
+    n = np.shape(price)[0]
+    return {
+        'trade_id': np.asarray(trade_id),
+        'date': np.asarray(date),
+        'asset': np.asarray(asset, dtype=object),
+        'trip': np.full(n, trip, dtype=object),
+        'action': np.full(n, action, dtype=object),
+        'type': np.full(n, type, dtype=object),
+        'price': np.asarray(price, dtype=float),
+        'status': np.full(n, status, dtype=object)
+    }
+
+
+def _with(orders, mask, status, date):
+    # the masked orders moved to a new status & date
+    out = {col: values[mask] for col, values in orders.items()}
+    out['status'] = np.full(mask.sum(), status, dtype=object)
+    out['date'] = date[mask]
+    return out
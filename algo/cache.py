@@ -0,0 +1,252 @@
+# cache.py
+#  - on-disk cache in front of ek.get_data for date-ranged (SDate/EDate)
+#    queries: prices, dividends, splits
+#  - one parquet file per instrument for each set of fields & parameters,
+#    plus a record of which date ranges have already been fetched, so only
+#    the missing part of a requested range goes to Refinitiv
+#  - dates from today onward are never marked as fetched: today's bar can
+#    still change, so it is re-requested every time
+#  - nor are ranges that came back with errors: they are fetched again on
+#    the next request
+#  - safe to share between processes (the workers of algo/serve.py): each
+#    field set's directory is locked with a lock file while it is read or
+#    updated, and files are replaced whole, never rewritten in place
+
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+from urllib.parse import quote
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: algo/serve.py runs a single process there
+    fcntl = None
+
+
+class PriceCache:
+    """Drop-in for ek.get_data that serves already-fetched dates from disk.
+
+    `get_data` is the provider function to call on a miss (e.g. ek.get_data).
+    Rows are assigned to dates through `date_column`, by default the first
+    returned column with "Date" in its name; rows without a date are dropped.
+    """
+
+    def __init__(self, get_data, cache_dir='refinitiv_cache', date_column=None):
+        self.provider_get_data = get_data
+        self.cache_dir = cache_dir
+        self.date_column = date_column
+        self.hits = 0
+        self.misses = 0
+        self.upstream_calls = 0
+        self.rows_fetched = 0
+        # one lock per field set, so e.g. prices & dividends can be fetched
+        # at the same time
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        # the counters are shared by all of them
+        self._stats_lock = threading.Lock()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'upstream_calls': self.upstream_calls,
+                'rows_fetched': self.rows_fetched
+            }
+
+    def get_data(self, instruments, fields, parameters=None):
+        parameters = dict(parameters or {})
+        if 'SDate' not in parameters or 'EDate' not in parameters:
+            return self.provider_get_data(
+                instruments=instruments, fields=fields, parameters=parameters
+            )
+        instruments = [instruments] if isinstance(instruments, str) \
+            else list(instruments)
+        start = _to_date(parameters.pop('SDate'))
+        end = _to_date(parameters.pop('EDate'))
+
+        key_dir = self._key_dir(fields, parameters)
+        with self._locks_lock:
+            lock = self._locks.setdefault(key_dir, threading.Lock())
+        with lock, _locked(os.path.join(key_dir, '.lock')):
+            meta = _read_json(os.path.join(key_dir, 'meta.json'), {
+                'fields': fields, 'parameters': parameters, 'coverage': {}
+            })
+
+            # Group instruments missing the same date ranges, so each range
+            # is one upstream call however many instruments need it.
+            todo = {}
+            for ric in instruments:
+                missing = _subtract(
+                    (start, end), meta['coverage'].get(ric, [])
+                )
+                if missing:
+                    todo.setdefault(tuple(missing), []).append(ric)
+            misses = sum(len(rics) for rics in todo.values())
+            self._count(hits=len(instruments) - misses, misses=misses)
+
+            errors = []
+            for missing, rics in todo.items():
+                for lo, hi in missing:
+                    fetched, err = self.provider_get_data(
+                        instruments=rics, fields=fields,
+                        parameters=dict(parameters, SDate=lo.isoformat(),
+                                        EDate=hi.isoformat())
+                    )
+                    self._count(upstream_calls=1)
+                    if err is not None:
+                        errors.append(err)
+                    # rows are kept either way, but a range that came back
+                    # with errors isn't marked as fetched: a RIC that
+                    # failed would otherwise stay empty for good
+                    self._store(key_dir, meta, rics, fetched, lo, hi,
+                                covered=err is None)
+
+            if todo:
+                _write_json(os.path.join(key_dir, 'meta.json'), meta)
+
+            out = []
+            for ric in instruments:
+                rows = self._load(key_dir, ric)
+                if rows is not None:
+                    rows = rows[_between(rows[meta['date_column']], start, end)]
+                    out.append(rows)
+            if out:
+                result = pd.concat(out, ignore_index=True)
+            else:
+                result = pd.DataFrame(columns=meta.get('columns', []))
+
+        return result, (errors or None)
+
+    def _count(self, **counts):
+        with self._stats_lock:
+            for name, n in counts.items():
+                setattr(self, name, getattr(self, name) + n)
+
+    def _key_dir(self, fields, parameters):
+        key = json.dumps(
+            {'fields': list(fields), 'parameters': parameters}, sort_keys=True
+        )
+        key_dir = os.path.join(
+            self.cache_dir, hashlib.sha1(key.encode()).hexdigest()[:16]
+        )
+        os.makedirs(key_dir, exist_ok=True)
+        return key_dir
+
+    def _store(self, key_dir, meta, rics, fetched, lo, hi, covered=True):
+        if fetched is None:
+            return
+        if 'date_column' not in meta:
+            meta['columns'] = list(fetched.columns)
+            meta['date_column'] = self.date_column or next(
+                col for col in fetched.columns
+                if col != 'Instrument' and 'Date' in col
+            )
+        date_col = meta['date_column']
+        fetched = fetched[pd.to_datetime(
+            fetched[date_col], errors='coerce', utc=True
+        ).notna()]
+        self._count(rows_fetched=fetched.shape[0])
+
+        # never mark today or later as fetched
+        last_final = min(hi, date.today() - timedelta(days=1))
+        for ric in rics:
+            new_rows = fetched[fetched['Instrument'] == ric]
+            old_rows = self._load(key_dir, ric)
+            if old_rows is not None:
+                # the new fetch replaces whatever was stored for lo..hi
+                new_rows = pd.concat([
+                    old_rows[~_between(old_rows[date_col], lo, hi)], new_rows
+                ])
+                new_rows = new_rows.sort_values(date_col, kind='stable')
+            _replace(self._path(key_dir, ric),
+                     lambda f: new_rows.to_parquet(f, index=False))
+            if covered and lo <= last_final:
+                meta['coverage'][ric] = _merge(
+                    meta['coverage'].get(ric, []) + [[lo, last_final]]
+                )
+
+    def _load(self, key_dir, ric):
+        path = self._path(key_dir, ric)
+        if not os.path.exists(path):
+            return None
+        return pd.read_parquet(path)
+
+    def _path(self, key_dir, ric):
+        return os.path.join(key_dir, quote(ric, safe='') + '.parquet')
+
+
+def _to_date(value):
+    return pd.Timestamp(value).date()
+
+
+def _between(values, lo, hi):
+    dates = pd.to_datetime(values, errors='coerce', utc=True).dt.date
+    return ((dates >= lo) & (dates <= hi)).to_numpy()
+
+
+def _subtract(span, covered):
+    # parts of the inclusive date range `span` not inside any covered range
+    missing = []
+    lo, hi = span
+    for c_lo, c_hi in sorted((_to_date(a), _to_date(b)) for a, b in covered):
+        if c_hi < lo or c_lo > hi:
+            continue
+        if c_lo > lo:
+            missing.append((lo, c_lo - timedelta(days=1)))
+        lo = max(lo, c_hi + timedelta(days=1))
+    if lo <= hi:
+        missing.append((lo, hi))
+    return missing
+
+
+def _merge(ranges):
+    # union of inclusive date ranges, stored as ISO strings
+    merged = []
+    for lo, hi in sorted((_to_date(a), _to_date(b)) for a, b in ranges):
+        if merged and lo <= merged[-1][1] + timedelta(days=1):
+            merged[-1][1] = max(merged[-1][1], hi)
+        else:
+            merged.append([lo, hi])
+    return [[lo.isoformat(), hi.isoformat()] for lo, hi in merged]
+
+
+def _read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path, obj):
+    def write(tmp):
+        with open(tmp, 'w') as f:
+            json.dump(obj, f, indent=1, default=str)
+    _replace(path, write)
+
+
+def _replace(path, write):
+    # write() a temporary file, then swap it in: readers see the old file
+    # or the new one, never half of one
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    write(tmp)
+    os.replace(tmp, path)
+
+
+@contextmanager
+def _locked(path):
+    # exclusive lock on `path` across processes (threads use their own lock)
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,207 @@
+# corporate_actions.py
+#  - the cleaning rules of W2/fetch_refinitiv_data.py (steps 8-11) for
+#    prices, dividends & splits, vectorized for whole universes:
+#      - dividends on the same day are summed, and their div_type /
+#        pay_type joined ("Interim, Special"), working on categorical codes:
+#        only the few days with more than one dividend join any strings
+#      - dividends & splits are put on the price rows with one searchsorted
+#        over sorted (instrument, day) keys, instead of two outer merges,
+#        fillna & drop_duplicates over the whole table
+#      - the same pass checks what the merges used to leave for the final
+#        isnull() check: corporate actions with no price bar, missing values,
+#        and duplicate days (exact repeats, like the copy of the latest bar
+#        Refinitiv sometimes sends, are dropped; conflicting ones raise)
+#  - Date columns come back as datetime64 (written to csv as YYYY-MM-DD)
+#  - merge_history returns rows sorted by instrument then date
+
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = {
+    'Open Price': 'open',
+    'High Price': 'high',
+    'Low Price': 'low',
+    'Close Price': 'close'
+}
+DIV_COLUMNS = {
+    'Dividend Ex Date': 'Date',
+    'Gross Dividend Amount': 'div_amt',
+    'Dividend Type': 'div_type',
+    'Dividend Payment Type': 'pay_type'
+}
+SPLIT_COLUMNS = {
+    'Capital Change Effective Date': 'Date',
+    'Adjustment Factor': 'split_rto'
+}
+# joined per day when an instrument has several dividends on it
+JOINED_COLUMNS = ['div_type', 'pay_type']
+
+
+class CorporateActionError(ValueError):
+    pass
+
+
+def clean_prices(prices):
+    prices = prices.rename(columns=PRICE_COLUMNS).dropna()
+    return prices.assign(Date=pd.to_datetime(prices['Date']))
+
+
+def clean_divs(divs):
+    divs = divs.rename(columns=DIV_COLUMNS).dropna()
+    if divs.shape[0] == 0:
+        return divs
+    divs = aggregate_divs(divs)
+    # a div must have an Ex Date and an amount greater than zero
+    return divs[divs['div_amt'].to_numpy() > 0].reset_index(drop=True)
+
+
+def clean_splits(splits):
+    splits = splits.rename(columns=SPLIT_COLUMNS).dropna()
+    if splits.shape[0] == 0:
+        return splits
+    return splits.assign(Date=pd.to_datetime(splits['Date']))
+
+
+def aggregate_divs(divs):
+    """One row per instrument & ex date, like
+    groupby(['Instrument', 'Date']).agg(sum, ", ".join, ", ".join);
+    div_type & pay_type come back categorical."""
+    codes, instruments = pd.factorize(divs['Instrument'], sort=True)
+    days = _days(divs['Date'])
+    order = np.lexsort((days, codes))
+    key = _keys(codes[order], days[order])
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])[:len(key)]
+
+    out = pd.DataFrame({
+        'Instrument': instruments[codes[order][starts]],
+        'Date': days[order][starts].astype('datetime64[ns]'),
+        'div_amt': np.add.reduceat(
+            divs['div_amt'].to_numpy(dtype=float)[order], starts
+        ) if len(key) else np.empty(0)
+    })
+    for col in JOINED_COLUMNS:
+        if col in divs:
+            out[col] = _joined(divs[col].to_numpy()[order], starts)
+    return out
+
+
+def merge_history(prices, divs, splits):
+    """Cleaned prices with div_amt (0 without a dividend) and split_rto (1
+    without a split) for every bar; raises CorporateActionError if a
+    dividend or split has no bar, values are missing or days conflict."""
+    codes, instruments = pd.factorize(prices['Instrument'], sort=True)
+    days = _days(prices['Date'])
+    key = _keys(codes, days)
+    if (key[1:] < key[:-1]).any():
+        order = np.argsort(key, kind='stable')
+        prices, key = prices.iloc[order], key[order]
+    prices = prices.reset_index(drop=True)
+
+    values = prices.drop(columns=['Instrument', 'Date'])
+    missing = values.isna().to_numpy().any(axis=1)
+    if missing.any():
+        raise CorporateActionError(
+            'missing values detected: {} price rows'.format(int(missing.sum()))
+        )
+    keep = _unique_rows(key, values, 'prices')
+    if not keep.all():
+        prices, key = prices[keep].reset_index(drop=True), key[keep]
+
+    return prices.assign(
+        div_amt=_aligned(key, instruments, divs, 'div_amt', 0.0),
+        split_rto=_aligned(key, instruments, splits, 'split_rto', 1.0)
+    )
+
+
+##### helpers
+
+def _days(dates):
+    days = pd.to_datetime(dates).to_numpy(dtype='datetime64[D]')
+    if np.isnat(days).any():
+        raise CorporateActionError('missing values detected: {} dates'.format(
+            int(np.isnat(days).sum())
+        ))
+    return days
+
+
+def _keys(codes, days):
+    # (instrument code, day) as one sortable int64; codes < 0 (unknown
+    # instruments) give negative keys, which match nothing
+    return (np.asarray(codes, dtype=np.int64) << 32) | (
+        days.astype(np.int64) + (1 << 31)
+    )
+
+
+def _unique_rows(key, values, what):
+    # sorted keys: repeats are adjacent. Drop exact copies, raise on the
+    # rest; returns the rows to keep
+    dup = np.flatnonzero(key[1:] == key[:-1]) + 1
+    keep = np.ones(key.shape[0], dtype=bool)
+    if dup.size:
+        v = values.to_numpy()
+        conflicting = (v[dup] != v[dup - 1]).any(axis=1)
+        if conflicting.any():
+            raise CorporateActionError(
+                'conflicting {} for the same instrument & day: {} rows'
+                .format(what, int(conflicting.sum()))
+            )
+        keep[dup] = False
+    return keep
+
+
+def _aligned(key, instruments, actions, col, fill):
+    # `col` of `actions` on the rows with the same (instrument, day) key
+    out = np.full(key.shape[0], fill)
+    if actions is None or actions.shape[0] == 0:
+        return out
+    codes = pd.Categorical(
+        actions['Instrument'], categories=instruments
+    ).codes
+    action_key = _keys(codes, _days(actions['Date']))
+    amounts = actions[col].to_numpy(dtype=float)
+    if np.isnan(amounts).any():
+        raise CorporateActionError('missing values detected: {} {}'.format(
+            int(np.isnan(amounts).sum()), col
+        ))
+
+    order = np.argsort(action_key, kind='stable')
+    action_key, amounts = action_key[order], amounts[order]
+
+    pos = np.searchsorted(key, action_key)
+    found = pos < key.shape[0]
+    found[found] = key[pos[found]] == action_key[found]
+    if not found.all():
+        missing = actions.iloc[order[~found]]
+        raise CorporateActionError(
+            'missing values detected: {} {} rows have no price bar, e.g. '
+            '{} on {}'.format(
+                int((~found).sum()), col, missing['Instrument'].iloc[0],
+                pd.Timestamp(missing['Date'].iloc[0]).date()
+            )
+        )
+    keep = _unique_rows(action_key, pd.DataFrame({col: amounts}), col)
+    out[pos[keep]] = amounts[keep]
+    return out
+
+
+def _joined(values, starts):
+    # ", ".join of each group's values (groups start at `starts`), as a
+    # categorical: singletons keep their code, and each distinct
+    # combination of codes is joined once
+    codes, labels = pd.factorize(values)
+    labels = [str(label) for label in labels]
+    sizes = np.diff(np.r_[starts, values.shape[0]])
+    out = codes[starts].copy()
+    index = {label: i for i, label in enumerate(labels)}
+    combos = {}
+    for group in np.flatnonzero(sizes > 1):
+        start = starts[group]
+        combo = tuple(codes[start:start + sizes[group]].tolist())
+        if combo not in combos:
+            label = ', '.join(labels[c] for c in combo)
+            if label not in index:
+                index[label] = len(labels)
+                labels.append(label)
+            combos[combo] = index[label]
+        out[group] = combos[combo]
+    return pd.Categorical.from_codes(out, categories=labels)
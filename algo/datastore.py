@@ -0,0 +1,172 @@
+# datastore.py
+#  - keeps the DataFrames behind the Dash apps in server memory, so
+#    callbacks pass a short token through dcc.Store instead of shipping
+#    every row to the browser & back as JSON records
+#  - least-recently-used datasets are evicted past a count / memory cap
+#  - besides DataFrames it holds OrderBooks (orderbook.py), which are only
+#    decoded one page at a time
+#  - with several worker processes (algo/serve.py) the callbacks of one
+#    chain can land on different workers: each dataset is then also written
+#    to a directory they share, and a worker that doesn't hold a token
+#    loads it from there
+#  - a worker's LRU only drops its in-memory copies: the shared files are
+#    expired by the writers, oldest use first, once unused for max_age
+#    seconds or past dir_max_bytes in total (every get() of a token marks
+#    its file as used)
+#
+# Environment:
+#   DATASTORE_DIR       the shared directory (algo/serve.py sets it)
+#   DATASTORE_MAX_AGE   seconds a shared file is kept unused (default 3600)
+
+import os
+import pickle
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+# what secrets.token_urlsafe() produces; anything else the browser sends
+# back is never looked up on disk
+_TOKEN = re.compile(r'[A-Za-z0-9_-]+')
+
+
+class DatasetExpired(KeyError):
+    pass
+
+
+class DataStore:
+    """Token -> DataFrame cache with LRU eviction.
+
+    Datasets are dropped once there are more than `max_items` or their
+    combined size (pandas deep memory usage) passes `max_bytes`. The most
+    recently stored dataset is always kept, however large. Every get()
+    returns the stored object itself, so copy it before modifying it.
+    Files in the shared `directory` are expired separately; by default
+    they may take dir_max_bytes = 4 * max_bytes of disk.
+    """
+
+    def __init__(self, max_bytes=512 * 2**20, max_items=256, directory=None,
+                 max_age=None, dir_max_bytes=None):
+        self.max_bytes = max_bytes
+        self.max_items = max_items
+        self.directory = directory or os.getenv('DATASTORE_DIR')
+        self.max_age = max_age or float(
+            os.getenv('DATASTORE_MAX_AGE', 3600)
+        )
+        self.dir_max_bytes = dir_max_bytes or 4 * max_bytes
+        self.nbytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, df):
+        token = secrets.token_urlsafe(8)
+        if self.directory:
+            self._write(token, df)
+            self._expire_files(token)
+        self._keep(token, df)
+        return token
+
+    def get(self, token):
+        with self._lock:
+            if token in self._data:
+                self._data.move_to_end(token)
+                df = self._data[token][0]
+            else:
+                df = None
+        if df is not None:
+            if self.directory:
+                self._touch(token)
+            return df
+        df = self._read(token) if self.directory else None
+        if df is None:
+            raise DatasetExpired(
+                'dataset {} has expired, re-run the query'.format(token)
+            )
+        self._keep(token, df)
+        return df
+
+    def page(self, token, page_current, page_size):
+        """Records for one page of a DataTable using page_action='custom'."""
+        df = self.get(token)
+        start = (page_current or 0) * page_size
+        if hasattr(df, 'records'):
+            return df.records(start, start + page_size)
+        return df.iloc[start:start + page_size].to_dict('records')
+
+    def page_count(self, token, page_size):
+        return max(1, -(-len(self.get(token)) // page_size))
+
+    def __len__(self):
+        return len(self._data)
+
+    ##### helpers
+
+    def _keep(self, token, df):
+        if hasattr(df, 'memory_usage'):
+            size = int(df.memory_usage(deep=True).sum())
+        else:
+            size = df.nbytes
+        with self._lock:
+            if token in self._data:
+                return
+            self._data[token] = (df, size)
+            self.nbytes += size
+            while len(self._data) > 1 and (
+                    self.nbytes > self.max_bytes
+                    or len(self._data) > self.max_items):
+                _, (_, old_size) = self._data.popitem(last=False)
+                self.nbytes -= old_size
+
+    def _expire_files(self, keep):
+        # other workers (and their clients) may still use what this one
+        # has evicted, so files go by their last use across all workers
+        files = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.pkl'):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            total += st.st_size
+            if entry.name != keep + '.pkl':
+                files.append((st.st_mtime, st.st_size, entry.path))
+        files.sort()
+        oldest = time.time() - self.max_age
+        for mtime, size, path in files:
+            if mtime >= oldest and total <= self.dir_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _touch(self, token):
+        try:
+            os.utime(self._path(token))
+        except FileNotFoundError:
+            pass
+
+    def _path(self, token):
+        return os.path.join(self.directory, token + '.pkl')
+
+    def _write(self, token, df):
+        # written under a temporary name, so readers never see half a file
+        path = self._path(token)
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+
+    def _read(self, token):
+        if not isinstance(token, str) or not _TOKEN.fullmatch(token):
+            return None
+        try:
+            with open(self._path(token), 'rb') as f:
+                df = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        self._touch(token)
+        return df
@@ -0,0 +1,196 @@
+# fills.py
+#  - vectorized fill simulation for the limit-entry / limit-exit strategy
+#  - builds the same entry & exit order tables as get_entry_tbl / get_exit_tbl
+#    in W4/HW2/app_refactor_v1.py, without looping over orders
+#  - orders are collected in an OrderBook (orderbook.py); the build_*
+#    functions turn it into the old DataFrame at the end
+#  - the books resolve orders with range queries on a RangeMinMax
+#    (rangeindex.py) over the lows / highs, which callers can build once
+#    per price history and reuse for any n1 / n2
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from algo.orderbook import OrderBook
+from algo.rangeindex import RangeMinMax
+
+FILLED = 'FILLED'
+LIVE = 'LIVE'
+CANCELLED = 'CANCELLED'
+
+
+def fill_windows(path, start, n, stop=None):
+    """(orders x n) matrix of path[start:start+n], NaN-padded past the end.
+
+    `stop` optionally gives each order its own (exclusive) end of data, so
+    several instruments stored back to back in one array never see each
+    other's bars. Also returns how many real bars each window holds.
+    """
+    path = np.asarray(path, dtype=float)
+    start = np.asarray(start, dtype=np.int64)
+    padded = np.concatenate([path, np.full(n - 1, np.nan)])
+    windows = sliding_window_view(padded, n)[start]
+    if stop is None:
+        n_avail = np.minimum(n, path.shape[0] - start)
+    else:
+        n_avail = np.minimum(n, np.asarray(stop) - start)
+        windows[np.arange(n)[None, :] >= n_avail[:, None]] = np.nan
+    return windows, n_avail
+
+
+def simulate_fills(windows, limit, side, n_avail):
+    """Resolve every limit order against its window of prices in one pass.
+
+    An order is CANCELLED if a full window of n bars never trades through the
+    limit, LIVE if the window is not complete yet and nothing traded, and
+    FILLED otherwise. `offset` is the bar (from the order's start) on which
+    the order was filled or cancelled; -1 for LIVE orders. A NaN price (a
+    missing bar) never trades.
+    """
+    n = windows.shape[1]
+    limit = np.asarray(limit, dtype=float)[:, None]
+    with np.errstate(invalid='ignore'):
+        if side == 'BUY':
+            hit = windows <= limit
+        else:
+            hit = windows >= limit
+    miss = ~hit
+
+    full = n_avail >= n
+    cancelled = full & miss.all(axis=1)
+    live = ~cancelled & ~full & ~hit.any(axis=1)
+
+    status = np.where(cancelled, CANCELLED, np.where(live, LIVE, FILLED))
+    offset = np.where(cancelled, n - 1, np.where(live, -1, hit.argmax(axis=1)))
+    return status, offset
+
+
+def resolve_fills(index, start, n, limit, side, stop=None, first_bar=None):
+    """simulate_fills' (status, offset), from range queries on `index`.
+
+    `index` is a RangeMinMax over the lows (BUY) or highs (SELL); each order
+    works the n bars from `start`, cut short at `stop` (default: the end of
+    the series). `first_bar` optionally replaces the price on each order's
+    first bar, as the exit's submission-day close does.
+    """
+    start = np.asarray(start, dtype=np.int64)
+    limit = np.asarray(limit, dtype=float)
+    stop = index.n if stop is None else np.asarray(stop, dtype=np.int64)
+    n_avail = np.minimum(n, stop - start)
+    end = start + n_avail
+    first = index.first_at_most if side == 'BUY' else index.first_at_least
+
+    if first_bar is None:
+        hit_row = first(start, end, limit)
+    else:
+        first_bar = np.asarray(first_bar, dtype=float)
+        on_first = first_bar <= limit if side == 'BUY' else first_bar >= limit
+        hit_row = np.where(on_first, start, first(start + 1, end, limit))
+
+    found = hit_row >= 0
+    full = n_avail >= n
+    cancelled = full & ~found
+    live = ~full & ~found
+
+    status = np.where(cancelled, CANCELLED, np.where(live, LIVE, FILLED))
+    offset = np.where(cancelled, n - 1,
+                      np.where(live, -1, hit_row - start))
+    return status, offset
+
+
+def build_entry_orders(prices, asset, alpha1, n1, next_business_day):
+    return entry_order_book(
+        prices, asset, alpha1, n1, next_business_day
+    ).sorted(['date', 'trade_id']).to_frame()
+
+
+def build_exit_orders(prices, entry_orders, asset, alpha2, n2,
+                      next_business_day):
+    return exit_order_book(
+        prices, OrderBook.from_frame(entry_orders), asset, alpha2, n2,
+        next_business_day
+    ).sorted(['date', 'trade_id']).to_frame()
+
+
+def entry_order_book(prices, asset, alpha1, n1, next_business_day,
+                     lows=None):
+    """build_entry_orders' orders, as an OrderBook.
+
+    `lows` is a RangeMinMax over prices['Low Price'], if the caller keeps
+    one for this history.
+    """
+    dates = prices['Date'].to_numpy()
+    close = prices['Close Price'].to_numpy(dtype=float)
+    start = np.arange(1, prices.shape[0])
+    price = close[:-1] * (1 + alpha1)
+
+    if lows is None:
+        lows = RangeMinMax(prices['Low Price'])
+    status, offset = resolve_fills(lows, start, n1, price, 'BUY')
+    event_date = dates[start + np.maximum(offset, 0)]
+
+    book = OrderBook()
+    ids = book.submit(start, dates[start], asset, 'ENTER', 'BUY', 'LMT', price)
+    for resolved in (CANCELLED, FILLED):
+        book.transition(
+            ids[status == resolved], event_date[status == resolved], resolved
+        )
+    # tomorrow's order, then any that are still working
+    book.submit(
+        [prices.shape[0]], next_business_day, asset, 'ENTER', 'BUY', 'LMT',
+        close[-1:] * (1 + alpha1), status=LIVE
+    )
+    book.transition(ids[status == LIVE], next_business_day, LIVE)
+    return book
+
+
+def exit_order_book(prices, entry_book, asset, alpha2, n2, next_business_day,
+                    highs=None):
+    """build_exit_orders' orders for the FILLED entries in `entry_book`.
+
+    `highs` is a RangeMinMax over prices['High Price'], if the caller keeps
+    one for this history.
+    """
+    days = pd.to_datetime(prices['Date']).to_numpy(dtype='datetime64[D]')
+    close = prices['Close Price'].to_numpy(dtype=float)
+
+    filled = entry_book.where(FILLED, trip='ENTER')
+    order = np.lexsort((filled['trade_id'], filled['date']))
+    trade_id = filled['trade_id'][order]
+    fill_date = filled['date'][order]
+    price = filled['price'][order] * (1 + alpha2)
+
+    # An exit is submitted on the entry's fill date, so the first bar it can
+    # trade against is that day's close; after that it sees each day's high.
+    start = first_row_of(days, fill_date)
+    if highs is None:
+        highs = RangeMinMax(prices['High Price'])
+    status, offset = resolve_fills(
+        highs, start, n2, price, 'SELL', first_bar=close[start]
+    )
+    event_row = start + np.maximum(offset, 0)
+
+    book = OrderBook()
+    ids = book.submit(trade_id, fill_date, asset, 'EXIT', 'SELL', 'LMT', price)
+    is_cancelled = status == CANCELLED
+    book.transition(ids[is_cancelled], days[event_row[is_cancelled]],
+                    CANCELLED)
+    book.transition(ids[status == FILLED], days[event_row[status == FILLED]],
+                    FILLED)
+    book.transition(ids[status == LIVE], next_business_day, LIVE)
+
+    # Limit exits that expire are closed out with a market order at that
+    # day's close.
+    market_ids = book.submit(
+        trade_id[is_cancelled], days[event_row[is_cancelled]], asset, 'EXIT',
+        'SELL', 'MKT', close[event_row[is_cancelled]]
+    )
+    book.transition(market_ids, days[event_row[is_cancelled]], FILLED)
+    return book
+
+
+def first_row_of(dates, targets):
+    # row of the first bar on each target date (dates must be sortable)
+    uniq, first = np.unique(dates, return_index=True)
+    return first[np.searchsorted(uniq, targets)]
@@ -0,0 +1,77 @@
+# incremental.py
+#  - daily top-up for the history built by W2/fetch_refinitiv_data.py
+#  - reads the last stored date of every instrument from the column store,
+#    asks Refinitiv only for bars, dividends & splits after it, applies the
+#    script's cleaning rules (steps 8-11, algo/corporate_actions.py) to
+#    those new rows only, and appends them to the store & csv
+
+import sys
+from datetime import date, timedelta
+
+import pandas as pd
+
+from algo.corporate_actions import (
+    clean_divs, clean_prices, clean_splits, merge_history
+)
+from algo.fetcher import FetchScheduler, history_field_groups
+from algo.pricestore import PriceStore, append_price_store
+
+CSV_COLUMNS = [
+    'Instrument', 'open', 'high', 'low', 'close', 'Date', 'div_amt',
+    'split_rto'
+]
+
+
+def update_price_history(get_data, store_path, csv_path=None, end_date=None,
+                         scheduler=None):
+    """Fetch & append everything newer than the store's last date.
+
+    `get_data` is ek.get_data (or a stand-in with the same signature); the
+    calls go through `scheduler`, a FetchScheduler by default. Instruments
+    are grouped by their last stored date, so usually one fetch covers the
+    whole universe. A group whose prices, dividends or splits come back
+    with errors is skipped (and reported on stderr), so the next run
+    fetches it again. Returns the appended rows.
+    """
+    scheduler = scheduler or FetchScheduler(get_data)
+    store = PriceStore(store_path)
+    end_date = end_date or date.today()
+    last_day = store.dates(store.offsets[1:] - 1)
+
+    by_start = {}
+    for ric, day in zip(store.instruments, last_day):
+        start = day.item() + timedelta(days=1)
+        if start <= end_date:
+            by_start.setdefault(start, []).append(ric)
+
+    new_rows = []
+    for start, rics in by_start.items():
+        fetched, fetch_errors = scheduler.fetch(rics, history_field_groups(
+            start.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+        ))
+        if any(fetch_errors.values()):
+            # appending the bars without their dividends or splits would
+            # move the store's last date past them for good: leave these
+            # instruments for the next run
+            print('skipping {} instrument(s) from {}: {}'.format(
+                len(rics), start, {
+                    name: errs for name, errs in fetch_errors.items() if errs
+                }
+            ), file=sys.stderr)
+            continue
+        prices, divs, splits = (
+            fetched['prices'], fetched['divs'], fetched['splits']
+        )
+        if prices.dropna().shape[0] == 0:
+            continue
+        new_rows.append(merge_history(
+            clean_prices(prices), clean_divs(divs), clean_splits(splits)
+        ))
+
+    if not new_rows:
+        return pd.DataFrame(columns=CSV_COLUMNS)
+    new_rows = append_price_store(pd.concat(new_rows), store_path)
+    new_rows = new_rows[CSV_COLUMNS].assign(Date=new_rows['Date'].dt.date)
+    if csv_path:
+        new_rows.to_csv(csv_path, mode='a', header=False, index=False)
+    return new_rows
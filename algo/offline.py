@@ -0,0 +1,324 @@
+# offline.py
+#  - stand-ins for the parts of eikon (get_data, get_timeseries) and
+#    refinitiv.data (dates_and_calendars.add_periods) used in this repo,
+#    so the apps & fetch pipeline run, and can be load-tested, without a
+#    Refinitiv Workspace session
+#  - data comes from the repo's csvs (unadjusted_price_history.csv,
+#    dirty_divs.csv, splits.csv) or from algo/synthetic.py for any RIC
+#  - latency, random errors and the number of rows returned are
+#    configurable; everything is thread-safe, and the latency is a sleep,
+#    so thousands of concurrent queries only cost threads
+#
+# Switch an app over with environment variables:
+#   REFINITIV_OFFLINE=csv | synthetic     use the stand-in with that data
+#   REFINITIV_OFFLINE_LATENCY=0.2         seconds per call (plus up to 50%
+#                                         random jitter)
+#   REFINITIV_OFFLINE_ERROR_RATE=0.01     share of calls that raise
+#   REFINITIV_OFFLINE_ROWS=500            rows per instrument (the last ones
+#                                         up to EDate), instead of the range
+#   REFINITIV_OFFLINE_SEED=0
+
+import os
+import random
+import threading
+import time
+import types
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from algo.synthetic import synthetic_history
+from algo.trading_calendar import TradingCalendar
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# get_data field -> (query group, column of the offline data, header)
+FIELDS = {
+    'TR.OPENPRICE(Adjusted=0)': ('prices', 'open', 'Open Price'),
+    'TR.HIGHPRICE(Adjusted=0)': ('prices', 'high', 'High Price'),
+    'TR.LOWPRICE(Adjusted=0)': ('prices', 'low', 'Low Price'),
+    'TR.CLOSEPRICE(Adjusted=0)': ('prices', 'close', 'Close Price'),
+    'TR.PriceCloseDate': ('prices', 'Date', 'Date'),
+    'TR.DivExDate': ('divs', 'Date', 'Dividend Ex Date'),
+    'TR.DivUnadjustedGross': ('divs', 'div_amt', 'Gross Dividend Amount'),
+    'TR.DivType': ('divs', 'div_type', 'Dividend Type'),
+    'TR.DivPaymentType': ('divs', 'pay_type', 'Dividend Payment Type'),
+    'TR.CAEffectiveDate': ('splits', 'Date', 'Capital Change Effective Date'),
+    'TR.CAAdjustmentFactor': ('splits', 'split_rto', 'Adjustment Factor')
+}
+TIMESERIES_FIELDS = ['HIGH', 'CLOSE', 'LOW', 'OPEN', 'COUNT', 'VOLUME']
+
+
+class OfflineError(Exception):
+    """Raised like eikon's EikonError: `code` is the HTTP-style status."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class OfflineData:
+    """Prices, dividends & splits per instrument, from csvs or synthetic.
+
+    source='csv' serves the instruments in the repo's csvs (others come
+    back empty, with an error, like an unknown RIC); source='synthetic'
+    makes up a deterministic history for any RIC from 2000 on.
+    """
+
+    def __init__(self, source='csv', data_dir=REPO_ROOT):
+        self.source = source
+        self._by_ric = {}
+        self._lock = threading.Lock()
+        if source == 'csv':
+            self._load_csvs(data_dir)
+        elif source != 'synthetic':
+            raise ValueError('unknown offline data source: {}'.format(source))
+
+    def table(self, group, ric):
+        """The `group` ('prices', 'divs' or 'splits') rows of `ric`, sorted
+        by date with a datetime64[D] Date column, or None if unknown."""
+        with self._lock:
+            tables = self._by_ric.get(ric)
+            if tables is None and self.source == 'synthetic':
+                tables = self._by_ric[ric] = _synthetic_tables(ric)
+        return None if tables is None else tables[group]
+
+    def _load_csvs(self, data_dir):
+        def read(name, **kwargs):
+            df = pd.read_csv(os.path.join(data_dir, name), **kwargs)
+            df['Date'] = pd.to_datetime(df['Date']).to_numpy(
+                dtype='datetime64[D]'
+            )
+            return df.drop_duplicates().sort_values(['Instrument', 'Date'],
+                                                    kind='stable')
+
+        history = read('unadjusted_price_history.csv')
+        groups = {
+            'prices': history[['Instrument', 'open', 'high', 'low', 'close',
+                               'Date']],
+            'divs': read('dirty_divs.csv'),
+            'splits': read('splits.csv')
+        }
+        for ric in history['Instrument'].unique():
+            self._by_ric[ric] = {
+                group: df[df['Instrument'] == ric].reset_index(drop=True)
+                for group, df in groups.items()
+            }
+
+
+class OfflineEikon:
+    """Stand-in for the eikon module: set_app_key, get_data, get_timeseries.
+
+    Every call sleeps `latency` seconds (plus up to `jitter` of it at
+    random) and raises OfflineError with probability `error_rate`: half of
+    those are rate limits (429), the rest server errors (500). With `rows`
+    set, each instrument returns its last `rows` rows up to EDate instead
+    of the SDate..EDate range.
+    """
+
+    EikonError = OfflineError
+
+    def __init__(self, data=None, latency=0.0, jitter=0.5, error_rate=0.0,
+                 rows=None, seed=0):
+        self.data = data or OfflineData()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rows = rows
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def set_app_key(self, app_key):
+        pass
+
+    def get_data(self, instruments, fields, parameters=None, **kwargs):
+        self._respond()
+        instruments = [instruments] if isinstance(instruments, str) \
+            else list(instruments)
+        fields = [fields] if isinstance(fields, str) else list(fields)
+        parameters = parameters or {}
+        groups = {FIELDS[field][0] for field in fields if field in FIELDS}
+        unknown = [field for field in fields if field not in FIELDS]
+        if unknown or len(groups) != 1:
+            raise OfflineError(400, 'offline stand-in cannot serve fields {}'
+                               .format(fields))
+        group = groups.pop()
+        columns = [FIELDS[field][1] for field in fields]
+        headers = ['Instrument'] + [FIELDS[field][2] for field in fields]
+
+        parts = []
+        errors = []
+        for row, ric in enumerate(instruments):
+            table = self.data.table(group, ric)
+            if table is None:
+                errors.append({
+                    'code': 416, 'col': 1, 'row': row,
+                    'message': "Unable to collect data for the field '{}' and "
+                               "some specific identifier(s).".format(fields[0])
+                })
+                parts.append(pd.DataFrame([[ric] + [np.nan] * len(columns)],
+                                          columns=headers))
+                continue
+            table = self._window(table, parameters.get('SDate'),
+                                 parameters.get('EDate'))
+            part = table[columns].copy()
+            if 'Date' in columns:
+                part['Date'] = np.char.add(np.datetime_as_string(
+                    table['Date'].to_numpy(dtype='datetime64[s]')
+                ), 'Z')
+            part.columns = headers[1:]
+            part.insert(0, 'Instrument', ric)
+            parts.append(part)
+
+        df = pd.concat(parts, ignore_index=True) if parts \
+            else pd.DataFrame(columns=headers)
+        return df, (errors or None)
+
+    def get_timeseries(self, rics, fields='*', start_date=None, end_date=None,
+                       interval='daily', **kwargs):
+        """Split-adjusted daily bars indexed by Date, like ek.get_timeseries.
+
+        One RIC gives one column per field; several give (RIC, field)
+        columns. COUNT & VOLUME are not in the offline data and come back
+        as NaN.
+        """
+        self._respond()
+        if interval != 'daily':
+            raise OfflineError(400, 'offline stand-in only has daily bars')
+        rics = [rics] if isinstance(rics, str) else list(rics)
+        fields = TIMESERIES_FIELDS if fields == '*' else (
+            [fields] if isinstance(fields, str) else list(fields)
+        )
+
+        frames = {}
+        for ric in rics:
+            prices = self.data.table('prices', ric)
+            splits = self.data.table('splits', ric)
+            if prices is None:
+                raise OfflineError(404, 'unknown RIC: {}'.format(ric))
+            prices = self._window(prices, start_date, end_date)
+            # everything before a split is scaled by its factor
+            factor = np.ones(prices.shape[0])
+            for day, rto in zip(splits['Date'], splits['split_rto']):
+                factor[prices['Date'].to_numpy() <= day] *= rto
+            bars = pd.DataFrame(
+                {
+                    'HIGH': prices['high'].to_numpy() * factor,
+                    'CLOSE': prices['close'].to_numpy() * factor,
+                    'LOW': prices['low'].to_numpy() * factor,
+                    'OPEN': prices['open'].to_numpy() * factor,
+                    'COUNT': np.nan,
+                    'VOLUME': np.nan
+                },
+                index=pd.DatetimeIndex(prices['Date'], name='Date')
+            )
+            frames[ric] = bars[fields]
+
+        if len(rics) == 1:
+            out = frames[rics[0]]
+            out.columns.name = rics[0]
+            return out
+        return pd.concat(frames, axis=1)
+
+    def _respond(self):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency * (1 + self.jitter * self._random.random())
+            fail = self._random.random() < self.error_rate
+            code = self._random.choice([429, 500])
+        time.sleep(delay)
+        if fail:
+            raise OfflineError(
+                code, 'Too many requests, please retry later' if code == 429
+                else 'Backend error. 500 Internal Server Error'
+            )
+
+    def _window(self, table, start, end):
+        days = table['Date'].to_numpy()
+        hi = np.searchsorted(days, _day(end), side='right') \
+            if end is not None else days.shape[0]
+        if self.rows is not None:
+            lo = max(0, hi - self.rows)
+        else:
+            lo = np.searchsorted(days, _day(start)) if start is not None else 0
+        return table.iloc[lo:hi]
+
+
+class OfflineRefinitivData:
+    """Stand-in for refinitiv.data: sessions and add_periods on a local
+    TradingCalendar."""
+
+    def __init__(self, calendar=None):
+        self.calendar = calendar or TradingCalendar()
+        self.sessions_open = 0
+        self.dates_and_calendars = types.SimpleNamespace(
+            add_periods=self.add_periods
+        )
+
+    def open_session(self, *args, **kwargs):
+        self.sessions_open += 1
+
+    def close_session(self):
+        self.sessions_open = max(0, self.sessions_open - 1)
+
+    def add_periods(self, start_date, period, calendars=('USA',),
+                    date_moving_convention='NextBusinessDay', **kwargs):
+        """`period` business days ('1D', '5D', ...) after start_date."""
+        if not period.endswith('D') or list(calendars) != ['USA']:
+            raise OfflineError(400, 'offline add_periods supports "<n>D" on '
+                                    'the USA calendar only')
+        day = np.datetime64(_day(start_date))
+        for _ in range(int(period[:-1])):
+            day = self.calendar.next_business_day(day)
+        return day.item()
+
+
+def eikon_api():
+    """The eikon module, or an OfflineEikon if REFINITIV_OFFLINE is set."""
+    source = os.getenv('REFINITIV_OFFLINE')
+    if not source:
+        import eikon
+        return eikon
+    rows = os.getenv('REFINITIV_OFFLINE_ROWS')
+    return OfflineEikon(
+        OfflineData(source),
+        latency=float(os.getenv('REFINITIV_OFFLINE_LATENCY', 0)),
+        error_rate=float(os.getenv('REFINITIV_OFFLINE_ERROR_RATE', 0)),
+        rows=int(rows) if rows else None,
+        seed=int(os.getenv('REFINITIV_OFFLINE_SEED', 0))
+    )
+
+
+def refinitiv_data_api():
+    """refinitiv.data, or an OfflineRefinitivData if REFINITIV_OFFLINE is
+    set."""
+    if not os.getenv('REFINITIV_OFFLINE'):
+        import refinitiv.data
+        return refinitiv.data
+    return OfflineRefinitivData()
+
+
+def _synthetic_tables(ric):
+    n_days = np.busday_count('2000-01-03', '2031-01-01')
+    history = synthetic_history(
+        1, n_days, start='2000-01-03', seed=zlib.crc32(ric.encode())
+    ).assign(Instrument=ric)
+    history['Date'] = history['Date'].to_numpy(dtype='datetime64[D]')
+    divs = history.loc[history['div_amt'] > 0, ['Instrument', 'Date',
+                                                  'div_amt']]
+    return {
+        'prices': history[['Instrument', 'open', 'high', 'low', 'close',
+                           'Date']],
+        'divs': divs.assign(div_type='Interim', pay_type='Cash Dividend')
+                    .reset_index(drop=True),
+        'splits': history.loc[history['split_rto'] != 1,
+                              ['Instrument', 'Date', 'split_rto']]
+                         .reset_index(drop=True)
+    }
+
+
+def _day(value):
+    return pd.Timestamp(value).to_datetime64().astype('datetime64[D]')
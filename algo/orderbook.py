@@ -0,0 +1,249 @@
+# orderbook.py
+#  - columnar, append-only store for the blotter's orders
+#  - an order's fixed attributes (trade id, asset, trip, action, type, price)
+#    are stored once, as typed arrays with small integer codes for the
+#    string columns; every status change (SUBMITTED, CANCELLED, FILLED,
+#    LIVE) is one row in a transition log pointing back at its order
+#  - a blotter row is a log row joined with its order; that join, and the
+#    decoding of the codes, happens only in to_frame() / records()
+
+import numpy as np
+import pandas as pd
+
+TRIPS = ('ENTER', 'EXIT')
+ACTIONS = ('BUY', 'SELL')
+ORDER_TYPES = ('LMT', 'MKT')
+STATUSES = ('SUBMITTED', 'CANCELLED', 'FILLED', 'LIVE')
+
+BLOTTER_COLUMNS = [
+    'trade_id', 'date', 'asset', 'trip', 'action', 'type', 'price', 'status'
+]
+_ORDER_DTYPES = {
+    'trade_id': np.int64, 'asset': np.int32, 'trip': np.int8,
+    'action': np.int8, 'type': np.int8, 'price': np.float64
+}
+_LOG_DTYPES = {
+    'order': np.int64, 'date': 'datetime64[D]', 'status': np.int8
+}
+_ENUMS = {
+    'trip': TRIPS, 'action': ACTIONS, 'type': ORDER_TYPES, 'status': STATUSES
+}
+
+
+class _Columns:
+    # same-length growable arrays; capacity doubles as rows are appended
+
+    def __init__(self, dtypes, capacity=64):
+        self.n = 0
+        self._arrays = {
+            name: np.empty(capacity, dtype) for name, dtype in dtypes.items()
+        }
+
+    def append(self, n_new, values):
+        end = self.n + n_new
+        capacity = next(iter(self._arrays.values())).shape[0]
+        if end > capacity:
+            capacity = max(end, 2 * capacity)
+            for name, array in self._arrays.items():
+                grown = np.empty(capacity, array.dtype)
+                grown[:self.n] = array[:self.n]
+                self._arrays[name] = grown
+        for name, array in self._arrays.items():
+            array[self.n:end] = values[name]
+        self.n = end
+        return np.arange(end - n_new, end)
+
+    def __getitem__(self, name):
+        return self._arrays[name][:self.n]
+
+    @property
+    def nbytes(self):
+        return sum(self[name].nbytes for name in self._arrays)
+
+
+class OrderBook:
+    """Orders & their status transitions, in typed columns.
+
+    len(book) is the number of blotter rows (transitions). String columns
+    are passed in as strings and stored as codes into TRIPS, ACTIONS,
+    ORDER_TYPES, STATUSES and book.assets; dates as datetime64[D].
+    """
+
+    def __init__(self):
+        self.assets = []
+        self._asset_code = {}
+        self.orders = _Columns(_ORDER_DTYPES)
+        self.log = _Columns(_LOG_DTYPES)
+
+    def submit(self, trade_id, date, asset, trip, action, type, price,
+               status='SUBMITTED'):
+        """Add a batch of orders (scalars are broadcast) and log their first
+        status; returns their order ids."""
+        n = np.broadcast(trade_id, date, asset, price).size
+        ids = self.orders.append(n, {
+            'trade_id': trade_id,
+            'asset': self._encode_assets(asset, n),
+            'trip': TRIPS.index(trip),
+            'action': ACTIONS.index(action),
+            'type': ORDER_TYPES.index(type),
+            'price': price
+        })
+        self.transition(ids, date, status)
+        return ids
+
+    def transition(self, order_ids, date, status):
+        """Log orders moving to `status` on `date`."""
+        n = np.shape(order_ids)[0]
+        self.log.append(n, {
+            'order': order_ids,
+            'date': _to_days(date),
+            'status': STATUSES.index(status)
+        })
+
+    def __len__(self):
+        return self.log.n
+
+    @property
+    def n_orders(self):
+        return self.orders.n
+
+    @property
+    def nbytes(self):
+        return self.orders.nbytes + self.log.nbytes
+
+    def where(self, status, trip=None):
+        """Log rows with the given status (and trip), as raw column arrays."""
+        cols = self._joined()
+        mask = cols['status'] == STATUSES.index(status)
+        if trip is not None:
+            mask &= cols['trip'] == TRIPS.index(trip)
+        return {name: values[mask] for name, values in cols.items()}
+
+    def sorted(self, by):
+        """A view of the book with its log stably sorted by `by` (log or
+        order columns); the orders themselves are shared, not copied."""
+        cols = self._joined()
+        order = _stable_order([cols[name] for name in by])
+        view = OrderBook()
+        view.assets = self.assets
+        view._asset_code = self._asset_code
+        view.orders = self.orders
+        view.log.append(order.shape[0], {
+            name: self.log[name][order] for name in _LOG_DTYPES
+        })
+        return view
+
+    def columns(self, rows=slice(None)):
+        """Decoded blotter columns for log rows `rows`."""
+        cols = self._joined(rows)
+        cols['asset'] = np.asarray(self.assets, dtype=object)[cols['asset']]
+        for name, labels in _ENUMS.items():
+            cols[name] = np.asarray(labels, dtype=object)[cols[name]]
+        # datetime.date objects, like the apps' Date columns
+        cols['date'] = cols['date'].astype(object)
+        return {name: cols[name] for name in BLOTTER_COLUMNS}
+
+    def to_frame(self):
+        return pd.DataFrame(self.columns())
+
+    def records(self, start=0, stop=None):
+        """Blotter rows start..stop-1 as a list of dicts (DataTable data)."""
+        cols = self.columns(slice(start, stop))
+        return [
+            dict(zip(BLOTTER_COLUMNS, row))
+            for row in zip(*[cols[name].tolist() for name in BLOTTER_COLUMNS])
+        ]
+
+    @classmethod
+    def concat(cls, books):
+        """One book holding the orders & logs of `books`, in order."""
+        out = cls()
+        for book in books:
+            joined = book._joined()
+            ids = out.orders.append(book.n_orders, dict(
+                {name: book.orders[name] for name in _ORDER_DTYPES},
+                asset=out._encode_assets(
+                    np.asarray(book.assets, dtype=object)[book.orders['asset']],
+                    book.n_orders
+                )
+            ))
+            out.log.append(len(book), {
+                'order': ids[joined['order']],
+                'date': joined['date'],
+                'status': joined['status']
+            })
+        return out
+
+    @classmethod
+    def from_frame(cls, df):
+        """Book from a blotter-shaped DataFrame; every row is its own order."""
+        book = cls()
+        n = df.shape[0]
+        ids = book.orders.append(n, {
+            'trade_id': df['trade_id'].to_numpy(),
+            'asset': book._encode_assets(df['asset'].to_numpy(), n),
+            'trip': _encode(df['trip'], TRIPS),
+            'action': _encode(df['action'], ACTIONS),
+            'type': _encode(df['type'], ORDER_TYPES),
+            'price': df['price'].to_numpy(dtype=float)
+        })
+        book.log.append(n, {
+            'order': ids,
+            'date': _to_days(df['date']),
+            'status': _encode(df['status'], STATUSES)
+        })
+        return book
+
+    ##### helpers
+
+    def _joined(self, rows=slice(None)):
+        # log columns plus the attributes of each row's order
+        order = self.log['order'][rows]
+        cols = {name: self.orders[name][order] for name in _ORDER_DTYPES}
+        cols.update({name: self.log[name][rows] for name in _LOG_DTYPES})
+        return cols
+
+    def _encode_assets(self, asset, n):
+        if isinstance(asset, str):
+            return self._code_of(asset)
+        inverse, uniq = pd.factorize(np.asarray(asset, dtype=object))
+        codes = np.array([self._code_of(a) for a in uniq], dtype=np.int32)
+        return codes[inverse]
+
+    def _code_of(self, asset):
+        if asset not in self._asset_code:
+            self._asset_code[asset] = len(self.assets)
+            self.assets.append(asset)
+        return self._asset_code[asset]
+
+
+def _stable_order(keys):
+    # lexsort, but when the keys are integers (or dates) whose ranges fit
+    # in one int64 they are packed into a single key: sorting that is
+    # several times faster, and the log is usually nearly sorted already
+    packed = np.zeros(keys[0].shape[0], dtype=np.int64)
+    span = 1
+    for key in reversed(keys):
+        if key.dtype.kind not in 'iuM' or key.shape[0] == 0:
+            return np.lexsort(keys[::-1])
+        key = key.view(np.int64) if key.dtype.kind == 'M' else \
+            key.astype(np.int64)
+        lo, hi = int(key.min()), int(key.max())
+        if span * (hi - lo + 1) >= 2**62:
+            return np.lexsort(keys[::-1])
+        packed += (key - lo) * span
+        span *= hi - lo + 1
+    return np.argsort(packed, kind='stable')
+
+
+def _encode(values, labels):
+    codes = pd.Categorical(values, categories=labels).codes
+    if (codes < 0).any():
+        raise ValueError('unknown value in {}'.format(labels))
+    return codes
+
+
+def _to_days(date):
+    if isinstance(date, (pd.Series, pd.Index, np.ndarray, list)):
+        return pd.to_datetime(np.asarray(date)).to_numpy(dtype='datetime64[D]')
+    return np.datetime64(pd.Timestamp(date), 'D')
@@ -0,0 +1,182 @@
+# pricestore.py
+#  - binary column store for unadjusted_price_history (and anything else in
+#    its long Instrument / Date format)
+#  - one .npy file per column: float OHLC, int32 day numbers (days since
+#    1970-01-01) and a dictionary-encoded Instrument column, rows sorted by
+#    instrument then date
+#  - opened with memory-mapping, so loading is near-instant and worker
+#    processes reading the same store share the OS page cache
+#
+# Convert an existing csv with:
+#   python -m algo.pricestore unadjusted_price_history.csv
+
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 1
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+
+def write_price_store(history, path, price_dtype='float64'):
+    """Write a long-format history to the column store at `path`.
+
+    Prices are stored as `price_dtype` (float64 or float32); any other
+    numeric columns (div_amt, split_rto, ...) as float64. The store is built
+    next to `path` and swapped in at the end, so readers never see it
+    half-written.
+    """
+    history = history.assign(Date=pd.to_datetime(history['Date']))
+    history = history.sort_values(['Instrument', 'Date'], kind='stable')
+    codes, instruments = pd.factorize(history['Instrument'], sort=True)
+    offsets = np.searchsorted(codes, np.arange(len(instruments) + 1))
+
+    columns = {
+        'instrument': codes.astype(np.int32),
+        'day': history['Date'].to_numpy(dtype='datetime64[D]').astype(np.int32)
+    }
+    for col in history.columns.drop(['Instrument', 'Date']):
+        dtype = price_dtype if col in PRICE_COLUMNS else 'float64'
+        columns[col] = history[col].to_numpy(dtype=dtype)
+
+    _write_columns(path, columns, offsets, list(instruments))
+
+
+def append_price_store(new_rows, path):
+    """Add rows for instruments already in the store at `path`.
+
+    Rows at or before an instrument's last stored date are ignored. Each
+    instrument's new rows go at the end of its block, so the store stays
+    sorted; the columns are rewritten with one bulk copy.
+    """
+    store = PriceStore(path, mmap=False)
+    new_rows = new_rows.assign(Date=pd.to_datetime(new_rows['Date']))
+    unknown = set(new_rows['Instrument']) - set(store.instruments)
+    if unknown:
+        raise ValueError('instruments not in the store: {}'.format(
+            sorted(unknown)
+        ))
+
+    codes = new_rows['Instrument'].map(store._code).to_numpy()
+    days = new_rows['Date'].to_numpy(dtype='datetime64[D]').astype(np.int32)
+    keep = days > store['day'][store.offsets[1:] - 1][codes]
+    order = np.lexsort((days[keep], codes[keep]))
+    codes = codes[keep][order]
+    new_rows = new_rows[keep].iloc[order]
+
+    insert_at = store.offsets[1:][codes]
+    columns = {
+        'instrument': np.insert(store['instrument'], insert_at, codes),
+        'day': np.insert(store['day'], insert_at, days[keep][order])
+    }
+    for col in store.columns:
+        if col not in columns:
+            columns[col] = np.insert(
+                store[col], insert_at,
+                new_rows[col].to_numpy(dtype=store[col].dtype)
+            )
+    added = np.bincount(codes, minlength=len(store.instruments))
+    offsets = store.offsets + np.r_[0, np.cumsum(added)]
+
+    _write_columns(path, columns, offsets, store.instruments)
+    return new_rows
+
+
+def _write_columns(path, columns, offsets, instruments):
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for col, values in columns.items():
+        np.save(os.path.join(tmp_path, col + '.npy'), values)
+    np.save(os.path.join(tmp_path, 'offsets.npy'), offsets.astype(np.int64))
+    with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+        json.dump({
+            'version': FORMAT_VERSION,
+            'n_rows': int(offsets[-1]),
+            'instruments': instruments,
+            'columns': list(columns)
+        }, f, indent=1)
+
+    if os.path.exists(path):
+        old_path = path + '.old'
+        shutil.rmtree(old_path, ignore_errors=True)
+        os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(old_path)
+    else:
+        os.rename(tmp_path, path)
+
+
+class PriceStore:
+    """Read-only, memory-mapped view of a store written by write_price_store.
+
+    Columns are numpy arrays indexed like store['close']; rows of one
+    instrument are contiguous, store.rows(ric) gives their slice. With
+    mmap=False the columns are read into memory instead.
+    """
+
+    def __init__(self, path, mmap=True):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['version'] != FORMAT_VERSION:
+            raise ValueError('unsupported price store version {}'.format(
+                meta['version']
+            ))
+        self.n_rows = meta['n_rows']
+        self.instruments = meta['instruments']
+        self.columns = meta['columns']
+        self._code = {ric: i for i, ric in enumerate(self.instruments)}
+        self._arrays = {
+            col: np.load(os.path.join(path, col + '.npy'),
+                         mmap_mode='r' if mmap else None)
+            for col in self.columns + ['offsets']
+        }
+
+    def __getitem__(self, col):
+        return self._arrays[col]
+
+    def __len__(self):
+        return self.n_rows
+
+    @property
+    def offsets(self):
+        """Start row of each instrument, plus the end of the last one."""
+        return self._arrays['offsets']
+
+    def dates(self, rows=slice(None)):
+        return self['day'][rows].astype('datetime64[D]')
+
+    def rows(self, ric):
+        code = self._code[ric]
+        return slice(int(self.offsets[code]), int(self.offsets[code + 1]))
+
+    def to_frame(self, instruments=None):
+        """The store (or some instruments of it) in the csv's long format."""
+        if instruments is None:
+            parts = [slice(None)]
+        else:
+            parts = [self.rows(ric) for ric in instruments]
+        frame = {
+            'Instrument': np.concatenate([
+                np.asarray(self.instruments, dtype=object)[
+                    self['instrument'][rows]
+                ] for rows in parts
+            ]),
+            'Date': np.concatenate([self.dates(rows) for rows in parts])
+        }
+        for col in self.columns:
+            if col not in ('instrument', 'day'):
+                frame[col] = np.concatenate([self[col][rows] for rows in parts])
+        return pd.DataFrame(frame)
+
+
+if __name__ == '__main__':
+    csv_path = sys.argv[1]
+    write_price_store(
+        pd.read_csv(csv_path), os.path.splitext(csv_path)[0] + '.cols'
+    )
@@ -0,0 +1,323 @@
+# profiling.py
+#  - timing for the Dash apps' callbacks: wall time of every call and of
+#    the named stages inside it (fetch, calendar, fills, store, page, ...),
+#    with row counts, plus the size of the response it was sent in (taken
+#    from Flask's Content-Length, so the output isn't serialized twice)
+#  - with PROFILE_DIAGNOSTICS=1, per (callback, stage) summaries and the
+#    most recent calls are served as JSON at /_diagnostics and shown in a
+#    panel in the app; off by default, as nothing there is authenticated
+#  - optionally, every call's stack is sampled from a side thread, and the
+#    samples of calls slower than PROFILE_SLOW_SECONDS are kept as
+#    collapsed stacks (flamegraph.pl / speedscope format) at
+#    /_diagnostics/profile/<n>
+#
+# Usage in an app:
+#   @app.callback(...)
+#   @profiled
+#   def get_entry_tbl(...):
+#       with stage('fills') as s:
+#           book = entry_order_book(...)
+#           s.rows = len(book)
+#
+# Environment:
+#   PROFILE_CALLBACKS=0            turn the timing off
+#   PROFILE_DIAGNOSTICS=1          serve /_diagnostics & show the panel
+#   PROFILE_SAMPLING=1             sample call stacks, keep the slow calls'
+#   PROFILE_SLOW_SECONDS=1         what counts as slow
+#   PROFILE_SAMPLE_INTERVAL=0.005  seconds between stack samples
+
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+import numpy as np
+
+RECENT_CALLS = 100
+SLOW_PROFILES = 20
+# durations kept per (callback, stage) for the percentiles
+DURATIONS_KEPT = 500
+# distinct stacks kept per slow profile
+STACKS_KEPT = 200
+
+
+class _Stage:
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.rows = None
+        self.bytes = None
+
+    def as_dict(self):
+        return {'stage': self.name, 'seconds': self.seconds,
+                'rows': self.rows, 'bytes': self.bytes}
+
+
+class _Sampler(threading.Thread):
+    # counts the stacks one thread is in, every `interval` seconds
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append('{} ({}:{})'.format(
+                    code.co_name, os.path.basename(code.co_filename),
+                    code.co_firstlineno
+                ))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        return self.stacks
+
+
+class CallbackProfiler:
+    """Collects callback & stage timings; see the module notes."""
+
+    def __init__(self, enabled=True, sampling=False, slow_seconds=1.0,
+                 sample_interval=0.005):
+        self.enabled = enabled
+        self.sampling = sampling
+        self.slow_seconds = slow_seconds
+        self.sample_interval = sample_interval
+        self.recent = deque(maxlen=RECENT_CALLS)
+        self.slow_profiles = deque(maxlen=SLOW_PROFILES)
+        self._totals = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._n_slow = 0
+
+    def profiled(self, f):
+        """Decorator timing every call of callback `f`."""
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return f(*args, **kwargs)
+            call = {'callback': f.__name__, 'stages': [], 'error': None,
+                    'started': time.time()}
+            outer = getattr(self._local, 'call', None)
+            self._local.call = call
+            sampler = None
+            if self.sampling:
+                sampler = _Sampler(threading.get_ident(), self.sample_interval)
+                sampler.start()
+            start_time = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            except BaseException as error:
+                call['error'] = type(error).__name__
+                raise
+            finally:
+                call['seconds'] = time.perf_counter() - start_time
+                self._local.call = outer
+                if outer is None:
+                    # for record_bytes(), once the response is built
+                    self._local.last_call = call
+                stacks = sampler.stop() if sampler is not None else None
+                self._finish(call, stacks)
+        return wrapper
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block inside a profiled callback; set .rows / .bytes on
+        the yielded stage to record them."""
+        s = _Stage(name)
+        call = getattr(self._local, 'call', None)
+        start_time = time.perf_counter()
+        try:
+            yield s
+        finally:
+            s.seconds = time.perf_counter() - start_time
+            if call is not None:
+                call['stages'].append(s.as_dict())
+
+    def record_bytes(self, n_bytes):
+        """Size of the response to this thread's last profiled call; shown
+        on its 'total' row."""
+        call = getattr(self._local, 'last_call', None)
+        self._local.last_call = None
+        if call is None or n_bytes is None:
+            return
+        with self._lock:
+            call['bytes'] = n_bytes
+            t = self._totals.get((call['callback'], 'total'))
+            if t is not None:
+                t['bytes'] = n_bytes
+
+    def summary(self):
+        """One row per (callback, stage); stage 'total' is the whole call."""
+        with self._lock:
+            totals = [
+                (key, dict(t, durations=np.array(t['durations'])))
+                for key, t in self._totals.items()
+            ]
+        rows = []
+        for (callback, stage), t in sorted(totals, key=lambda kv: kv[0]):
+            seconds = t['durations']
+            rows.append({
+                'callback': callback,
+                'stage': stage,
+                'calls': t['calls'],
+                'errors': t['errors'],
+                'mean_s': t['seconds'] / t['calls'],
+                'p50_s': float(np.percentile(seconds, 50)),
+                'p95_s': float(np.percentile(seconds, 95)),
+                'max_s': t['max_s'],
+                'rows': t['rows'],
+                'bytes': t['bytes']
+            })
+        return rows
+
+    def report(self, **sources):
+        """Everything the /_diagnostics endpoint serves. `sources` are
+        extra {name: callable returning a dict}, e.g. provider.stats."""
+        out = {
+            'summary': self.summary(),
+            'recent': list(self.recent),
+            'slow_profiles': [
+                {key: value for key, value in p.items() if key != 'stacks'}
+                for p in self.slow_profiles
+            ],
+            'sampling': self.sampling
+        }
+        for name, stats in sources.items():
+            out[name] = stats()
+        return out
+
+    def collapsed(self, n):
+        """Slow profile `n` as collapsed stack lines ("a;b;c count")."""
+        for p in self.slow_profiles:
+            if p['id'] == n:
+                return ''.join(
+                    '{} {}\n'.format(stack, count)
+                    for stack, count in p['stacks']
+                )
+        return None
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+            self.recent.clear()
+            self.slow_profiles.clear()
+
+    ##### helpers
+
+    def _finish(self, call, stacks):
+        stages = call['stages'] + [{
+            'stage': 'total', 'seconds': call['seconds'], 'rows': None,
+            'bytes': None
+        }]
+        with self._lock:
+            for s in stages:
+                t = self._totals.setdefault((call['callback'], s['stage']), {
+                    'calls': 0, 'errors': 0, 'seconds': 0.0, 'max_s': 0.0,
+                    'rows': None, 'bytes': None,
+                    'durations': deque(maxlen=DURATIONS_KEPT)
+                })
+                t['calls'] += 1
+                t['errors'] += call['error'] is not None
+                t['seconds'] += s['seconds']
+                t['max_s'] = max(t['max_s'], s['seconds'])
+                t['durations'].append(s['seconds'])
+                # the latest call's sizes
+                if s['rows'] is not None:
+                    t['rows'] = s['rows']
+                if s['bytes'] is not None:
+                    t['bytes'] = s['bytes']
+
+            if stacks is not None and call['seconds'] >= self.slow_seconds:
+                self._n_slow += 1
+                call['profile'] = self._n_slow
+                self.slow_profiles.append({
+                    'id': self._n_slow,
+                    'callback': call['callback'],
+                    'started': call['started'],
+                    'seconds': call['seconds'],
+                    'samples': sum(stacks.values()),
+                    'stacks': stacks.most_common(STACKS_KEPT)
+                })
+            self.recent.append(call)
+
+
+profiler = CallbackProfiler(
+    enabled=os.getenv('PROFILE_CALLBACKS', '1') != '0',
+    sampling=os.getenv('PROFILE_SAMPLING', '0') != '0',
+    slow_seconds=float(os.getenv('PROFILE_SLOW_SECONDS', 1)),
+    sample_interval=float(os.getenv('PROFILE_SAMPLE_INTERVAL', 0.005))
+)
+diagnostics_enabled = os.getenv('PROFILE_DIAGNOSTICS', '0') != '0'
+profiled = profiler.profiled
+stage = profiler.stage
+
+DIAGNOSTICS_COLUMNS = [
+    'callback', 'stage', 'calls', 'errors', 'mean_s', 'p50_s', 'p95_s',
+    'max_s', 'rows', 'bytes'
+]
+
+
+def add_diagnostics(app, refresh_ms=2000, **sources):
+    """Record the callbacks' response sizes; with PROFILE_DIAGNOSTICS=1,
+    also serve profiler.report(**sources) at /_diagnostics on `app`'s
+    server. Returns a collapsible panel showing the summary for the layout
+    (an empty Div when the diagnostics are off)."""
+    from dash import Input, Output, dash_table, dcc, html
+    from flask import Response, jsonify, request
+
+    @app.server.after_request
+    def record_bytes(response):
+        if request.path.endswith('/_dash-update-component'):
+            profiler.record_bytes(response.calculate_content_length())
+        return response
+
+    if not diagnostics_enabled:
+        return html.Div()
+
+    @app.server.route('/_diagnostics')
+    def diagnostics():
+        return jsonify(profiler.report(**sources))
+
+    @app.server.route('/_diagnostics/profile/<int:n>')
+    def diagnostics_profile(n):
+        stacks = profiler.collapsed(n)
+        if stacks is None:
+            return Response('no such profile\n', status=404,
+                            mimetype='text/plain')
+        return Response(stacks, mimetype='text/plain')
+
+    @app.callback(
+        Output('diagnostics-tbl', 'data'),
+        Input('diagnostics-interval', 'n_intervals')
+    )
+    def render_diagnostics(n_intervals):
+        return [
+            {name: round(value, 4) if isinstance(value, float) else value
+             for name, value in row.items()}
+            for row in profiler.summary()
+        ]
+
+    return html.Details([
+        html.Summary('Diagnostics (JSON at /_diagnostics)'),
+        dcc.Interval(id='diagnostics-interval', interval=refresh_ms),
+        dash_table.DataTable(
+            id='diagnostics-tbl',
+            columns=[dict(id=col, name=col) for col in DIAGNOSTICS_COLUMNS],
+            sort_action='native',
+            page_size=50
+        )
+    ])
@@ -0,0 +1,281 @@
+# provider.py
+#  - one long-lived Refinitiv connection per worker process, shared by all
+#    of its callbacks & threads, instead of setting the app key at import
+#    and opening / closing a refinitiv.data session per click
+#  - nothing is imported or logged into until the first call (or
+#    connect()): then eikon's app key is set once; the refinitiv.data
+#    session is opened on first use and then kept open
+#  - at most `max_concurrency` calls are in flight at once, the rest wait
+#    for a slot; a call that fails because the connection dropped
+#    reconnects and is retried once, and the connection is health-checked
+#    every `health_interval` seconds
+#  - identical get_data / get_timeseries requests made at the same time
+#    share one call, and its result is reused for `ttl` seconds (see
+#    algo/singleflight.py)
+#  - market_data() hands out one provider per process: a forked worker
+#    keeps its parent's provider object but drops its connection, and logs
+#    in again on first use; it wraps the offline stand-in when
+#    REFINITIV_OFFLINE is set
+#
+# Environment:
+#   AppKey                          app key used by market_data()
+#   MARKET_DATA_MAX_CONCURRENCY=8   calls in flight per worker process
+#   MARKET_DATA_TTL=5               seconds a result is reused (0: coalesce
+#                                   concurrent requests only)
+
+import os
+import threading
+import time
+
+import pandas as pd
+
+from algo.offline import eikon_api, refinitiv_data_api
+from algo.singleflight import SingleFlight, request_key
+
+# EikonError codes for "can't reach the Workspace proxy / not logged in"
+DISCONNECT_CODES = (-1, 401, 503)
+# probe used by the health check: one field for one instrument
+PROBE_INSTRUMENT = 'IVV'
+PROBE_FIELD = 'TR.PriceCloseDate'
+
+
+def is_disconnected(error):
+    """True if `error` means the connection is gone (rather than a bad or
+    rate-limited request)."""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    if getattr(error, 'code', None) in DISCONNECT_CODES:
+        return True
+    message = str(error).lower()
+    return 'proxy' in message or ('session' in message and 'closed' in message)
+
+
+class MarketDataProvider:
+    """get_data / get_timeseries / add_periods over a shared connection.
+
+    `eikon` and `rd` are the eikon and refinitiv.data modules (or stand-ins
+    with the same API); by default they come from algo/offline.py, and are
+    only imported the first time they are needed. get_data and get_timeseries
+    have eikon's signatures, so `provider.get_data` can be handed to
+    PriceCache or FetchScheduler in place of ek.get_data. Every caller gets
+    its own copy of a coalesced result's DataFrames.
+    """
+
+    def __init__(self, app_key=None, eikon=None, rd=None, max_concurrency=8,
+                 health_interval=300, probe=None, ttl=5.0):
+        self.app_key = app_key
+        self._eikon_api = eikon
+        self._eikon = None
+        self._rd = rd
+        self.max_concurrency = max_concurrency
+        self.health_interval = health_interval
+        self.probe = probe or self._probe
+        self.counts = {
+            'calls': 0, 'errors': 0, 'waits': 0, 'reconnects': 0,
+            'health_checks': 0, 'sessions_opened': 0, 'peak_in_flight': 0
+        }
+        self.flights = SingleFlight(ttl)
+        self._in_flight = 0
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._connect_lock = threading.RLock()
+        self._rd_session_open = False
+        self._checked_at = time.monotonic()
+
+    @property
+    def eikon(self):
+        if self._eikon is None:
+            self.connect()
+        return self._eikon
+
+    def connect(self):
+        """Import eikon and set the app key, if not done yet."""
+        with self._connect_lock:
+            if self._eikon is None:
+                eikon = self._eikon_api
+                if eikon is None:
+                    eikon = eikon_api()
+                eikon.set_app_key(self.app_key)
+                self._eikon = eikon
+        return self
+
+    def get_data(self, instruments, fields, parameters=None, **kwargs):
+        return self._coalesced(
+            self.eikon.get_data, instruments=instruments, fields=fields,
+            parameters=parameters, **kwargs
+        )
+
+    def get_timeseries(self, rics, fields='*', start_date=None, end_date=None,
+                       **kwargs):
+        return self._coalesced(
+            self.eikon.get_timeseries, rics=rics, fields=fields,
+            start_date=start_date, end_date=end_date, **kwargs
+        )
+
+    def add_periods(self, **kwargs):
+        """rd.dates_and_calendars.add_periods on the shared session."""
+        return self._call(self._add_periods, **kwargs)
+
+    def stats(self):
+        """Connection counts, plus the coalescing ones: `requests` made,
+        `coalesced` onto an identical call in flight, `ttl_hits` and
+        upstream calls `saved` by the two."""
+        flights = self.flights.stats()
+        with self._lock:
+            return dict(
+                self.counts, in_flight=self._in_flight,
+                max_concurrency=self.max_concurrency,
+                requests=flights['requests'], coalesced=flights['coalesced'],
+                ttl_hits=flights['ttl_hits'], saved=flights['saved']
+            )
+
+    def healthy(self):
+        """Run the health-check probe now; False if it raised."""
+        with self._lock:
+            self.counts['health_checks'] += 1
+            self._checked_at = time.monotonic()
+        try:
+            self.probe()
+        except Exception:
+            return False
+        return True
+
+    def reconnect(self):
+        """Set the app key again and reopen the rd session if one was open."""
+        with self._connect_lock:
+            with self._lock:
+                self.counts['reconnects'] += 1
+            self.eikon.set_app_key(self.app_key)
+            if self._rd_session_open:
+                self._close_rd_session()
+                self._open_rd_session()
+
+    def close(self):
+        with self._connect_lock:
+            if self._rd_session_open:
+                self._close_rd_session()
+
+    ##### helpers
+
+    def _coalesced(self, f, **kwargs):
+        key = request_key(f.__name__, **kwargs)
+        return _copied(self.flights.do(key, lambda: self._call(f, **kwargs)))
+
+    def _call(self, f, **kwargs):
+        self._check_health()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.counts['waits'] += 1
+            self._slots.acquire()
+        try:
+            with self._lock:
+                self.counts['calls'] += 1
+                self._in_flight += 1
+                self.counts['peak_in_flight'] = max(
+                    self.counts['peak_in_flight'], self._in_flight
+                )
+            try:
+                return f(**kwargs)
+            except Exception as error:
+                with self._lock:
+                    self.counts['errors'] += 1
+                if not is_disconnected(error):
+                    raise
+            self.reconnect()
+            return f(**kwargs)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def _check_health(self):
+        # only the first caller after the interval runs the probe
+        with self._lock:
+            due = time.monotonic() - self._checked_at > self.health_interval
+            if due:
+                self._checked_at = time.monotonic()
+        if due and not self.healthy():
+            self.reconnect()
+
+    def _add_periods(self, **kwargs):
+        if not self._rd_session_open:
+            with self._connect_lock:
+                if not self._rd_session_open:
+                    self._open_rd_session()
+        return self._rd.dates_and_calendars.add_periods(**kwargs)
+
+    def _open_rd_session(self):
+        # caller holds _connect_lock
+        if self._rd is None:
+            self._rd = refinitiv_data_api()
+        self._rd.open_session()
+        self._rd_session_open = True
+        with self._lock:
+            self.counts['sessions_opened'] += 1
+
+    def _close_rd_session(self):
+        # caller holds _connect_lock
+        try:
+            self._rd.close_session()
+        finally:
+            self._rd_session_open = False
+
+    def _probe(self):
+        self.eikon.get_data([PROBE_INSTRUMENT], [PROBE_FIELD])
+
+    def _forget_connection(self):
+        # in a forked child: the connection, the locks and any calls in
+        # flight belong to the parent process
+        self._eikon = None
+        self._rd_session_open = False
+        self._in_flight = 0
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._connect_lock = threading.RLock()
+        self.flights = SingleFlight(self.flights.ttl, self.flights.max_entries)
+
+
+def _copied(result):
+    # (DataFrame, err) from get_data, or a DataFrame from get_timeseries
+    if isinstance(result, tuple):
+        return tuple(_copied(part) for part in result)
+    if isinstance(result, pd.DataFrame):
+        return result.copy()
+    return result
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def _after_fork():
+    global _providers_lock
+    _providers_lock = threading.Lock()
+    parent = _providers.get(os.getppid())
+    _providers.clear()
+    if parent is not None:
+        parent._forget_connection()
+        _providers[os.getpid()] = parent
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def market_data(app_key=None, **kwargs):
+    """This process's MarketDataProvider, created on first use.
+
+    `app_key` defaults to the AppKey environment variable; keyword
+    arguments are passed to MarketDataProvider on that first call only.
+    """
+    pid = os.getpid()
+    with _providers_lock:
+        if pid not in _providers:
+            kwargs.setdefault('max_concurrency', int(
+                os.getenv('MARKET_DATA_MAX_CONCURRENCY', 8)
+            ))
+            kwargs.setdefault('ttl', float(os.getenv('MARKET_DATA_TTL', 5)))
+            _providers[pid] = MarketDataProvider(
+                app_key if app_key is not None else os.getenv('AppKey'),
+                **kwargs
+            )
+        return _providers[pid]
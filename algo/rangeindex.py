@@ -0,0 +1,114 @@
+# rangeindex.py
+#  - sparse tables over a price series (one per history, e.g. the lows or
+#    the highs), so the window questions the fill logic asks are answered
+#    without a rolling scan per n:
+#      min / max over [start, stop)                       O(1)
+#      first bar in [start, stop) at or below / above x   O(log n)
+#  - level k holds the min (or max) of every block of 2**k bars; levels are
+#    built on first use, so a history only ever queried with n <= 8 keeps
+#    4 levels (the series itself plus 3)
+#  - a NaN price (a missing bar) never crosses a limit: it is kept as +inf
+#    in the min tables and -inf in the max tables, so a window of only
+#    missing bars has min +inf / max -inf
+
+import threading
+
+import numpy as np
+
+
+class RangeMinMax:
+    """Range min / max and first-crossing queries over `values`.
+
+    Every query takes arrays of window starts and (exclusive) stops, one
+    per order, and returns one answer per window. Windows must lie within
+    the series; min / max windows must also be non-empty.
+    """
+
+    def __init__(self, values):
+        values = np.asarray(values, dtype=float)
+        self.n = values.shape[0]
+        missing = np.isnan(values)
+        self._levels = {
+            'min': [np.where(missing, np.inf, values)],
+            'max': [np.where(missing, -np.inf, values)]
+        }
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # picklable for process pools (see sweep.py); the lock is not
+        return {'n': self.n, '_levels': self._levels}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def min(self, start, stop):
+        return self._query('min', start, stop)
+
+    def max(self, start, stop):
+        return self._query('max', start, stop)
+
+    def first_at_most(self, start, stop, limit):
+        """First row in [start, stop) with value <= limit, else -1."""
+        return self._first('min', start, stop, limit)
+
+    def first_at_least(self, start, stop, limit):
+        """First row in [start, stop) with value >= limit, else -1."""
+        return self._first('max', start, stop, limit)
+
+    ##### helpers
+
+    def _query(self, kind, start, stop):
+        # the window is covered by two (overlapping) blocks of 2**k bars
+        start = np.asarray(start, dtype=np.int64)
+        stop = np.asarray(stop, dtype=np.int64)
+        k = _floor_log2(stop - start)
+        op = np.minimum if kind == 'min' else np.maximum
+        out = np.empty(np.broadcast(start, stop).shape)
+        for level in np.unique(k):
+            table = self._level(kind, level)
+            mask = k == level
+            out[mask] = op(
+                table[start[mask]], table[stop[mask] - (1 << int(level))]
+            )
+        return out
+
+    def _first(self, kind, start, stop, limit):
+        # binary lifting: skip the largest block that lies inside the window
+        # and never crosses the limit, then the next smaller one, ...;
+        # whatever row that stops on is the first crossing
+        start, stop, limit = np.broadcast_arrays(
+            np.asarray(start, dtype=np.int64),
+            np.asarray(stop, dtype=np.int64),
+            np.asarray(limit, dtype=float)
+        )
+        pos = start.copy()
+        longest = int((stop - start).max(initial=0))
+        for level in range(int(_floor_log2(max(longest, 1))), -1, -1):
+            step = 1 << level
+            fits = pos + step <= stop
+            if not fits.any():
+                continue
+            table = self._level(kind, level)
+            block = table[np.where(fits, pos, 0)]
+            misses = block > limit if kind == 'min' else block < limit
+            pos = np.where(fits & misses, pos + step, pos)
+        return np.where(pos < stop, pos, -1)
+
+    def _level(self, kind, level):
+        levels = self._levels[kind]
+        if level >= len(levels):
+            op = np.minimum if kind == 'min' else np.maximum
+            with self._lock:
+                while level >= len(levels):
+                    prev = levels[-1]
+                    half = 1 << (len(levels) - 1)
+                    levels.append(op(prev[:prev.shape[0] - half], prev[half:]))
+        return levels[level]
+
+
+def _floor_log2(length):
+    length = np.asarray(length, dtype=np.int64)
+    if (length < 1).any():
+        raise ValueError('empty window')
+    return np.frexp(length.astype(float))[1] - 1
@@ -0,0 +1,96 @@
+# returns.py
+#  - split- & dividend-adjusted daily log returns for many instruments at
+#    once:  rtn[t] = log((close[t] + div_amt[t]) / (close[t-1] * split_rto[t-1]))
+#  - works on arrays sorted by instrument then date (like a PriceStore), so
+#    every return is one shifted-array operation; the first row of each
+#    instrument has no previous close and is masked out
+#  - wide (Date x Instrument) output is built by scattering into an array,
+#    without pivot_table
+
+import numpy as np
+import pandas as pd
+
+
+def log_returns(instrument, close, div_amt, split_rto):
+    """Log return of every row of instrument-contiguous arrays.
+
+    `instrument` is any array that changes value exactly where a new
+    instrument starts (codes or names). Returns a float array of the same
+    length, NaN on the first row of each instrument.
+    """
+    close = np.asarray(close, dtype='float64')
+    rtn = np.full(close.shape[0], np.nan)
+    same = instrument[1:] == instrument[:-1]
+    rtn[1:][same] = np.log(
+        (close[1:][same] + np.asarray(div_amt)[1:][same])
+        / (close[:-1][same] * np.asarray(split_rto)[:-1][same])
+    )
+    return rtn
+
+
+def returns_frame(history, wide=True, price_col='close', div_col='div_amt',
+                  split_col='split_rto'):
+    """Returns of a long-format history, e.g. unadjusted_price_history.
+
+    Long output has one row per return: Date, Instrument, rtn. Wide output
+    has one row per Date and one column per Instrument, like the old
+    pivot_table (duplicate Date/Instrument pairs are averaged and dates with
+    no returns at all are left out).
+    """
+    codes, instruments = pd.factorize(history['Instrument'], sort=True)
+    days = pd.to_datetime(history['Date']).to_numpy(dtype='datetime64[ns]')
+    if _is_sorted(codes, days):
+        order = slice(None)
+    else:
+        order = np.lexsort((days, codes))
+    codes = codes[order]
+    days = days[order]
+
+    rtn = log_returns(
+        codes,
+        history[price_col].to_numpy()[order],
+        history[div_col].to_numpy()[order],
+        history[split_col].to_numpy()[order]
+    )
+    has_rtn = np.r_[False, codes[1:] == codes[:-1]]
+    codes, days, rtn = codes[has_rtn], days[has_rtn], rtn[has_rtn]
+
+    if not wide:
+        return pd.DataFrame({
+            'Date': days,
+            'Instrument': np.asarray(instruments, dtype=object)[codes],
+            'rtn': rtn
+        })
+
+    return _to_wide(days, codes, rtn, instruments)
+
+
+def _is_sorted(codes, days):
+    # already instrument-contiguous with ascending dates (a PriceStore or
+    # the fetch script's csv) -> no need to sort
+    step = np.diff(codes)
+    return bool(np.all((step > 0) | ((step == 0) & (days[1:] >= days[:-1]))))
+
+
+def _to_wide(days, codes, rtn, instruments):
+    # mean of the non-NaN returns in each Date/Instrument cell
+    day_codes, dates = pd.factorize(days, sort=True)
+    used = np.unique(codes[~np.isnan(rtn)])
+    col = np.searchsorted(used, codes)
+    n_cols = used.shape[0]
+
+    valid = ~np.isnan(rtn) & np.isin(codes, used)
+    cell = day_codes[valid] * n_cols + col[valid]
+    size = dates.shape[0] * n_cols
+    total = np.bincount(cell, weights=rtn[valid], minlength=size)
+    count = np.bincount(cell, minlength=size)
+    with np.errstate(invalid='ignore'):
+        values = (total / count).reshape(dates.shape[0], n_cols)
+
+    keep_rows = (count.reshape(dates.shape[0], n_cols) > 0).any(axis=1)
+    return pd.DataFrame(
+        values[keep_rows],
+        index=pd.Index(dates[keep_rows], name='Date'),
+        columns=pd.Index(np.asarray(instruments, dtype=object)[used],
+                         name='Instrument')
+    )
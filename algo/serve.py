@@ -0,0 +1,177 @@
+# serve.py
+#  - production launcher for the W3 / W4 Dash apps, instead of
+#    app.run_server(debug=True) or one waitress process
+#  - the parent binds the port, runs the app module once and preloads its
+#    shared warm-up tasks (plotly.express; see algo/warmup.py), then
+#    forks the workers: they inherit all of that
+#    copy-on-write instead of each loading their own copy. The Refinitiv
+#    login and the other tasks run in each worker after the fork
+#  - every worker serves the same listening socket with waitress, using
+#    --threads threads; by default a few per CPU, split across the workers,
+#    since most of a callback's time is spent waiting on Refinitiv
+#  - the parent restarts workers that die and stops them all on SIGTERM /
+#    Ctrl+C
+#  - the workers share the apps' DataStore through a temporary directory
+#    (DATASTORE_DIR), as consecutive callbacks may reach different workers
+#  - without os.fork (Windows) it serves from a single process
+#
+# Run from the repo root:
+#   PYTHONPATH=. python -m algo.serve W4/HW2/app_refactor_v1.py
+#   PYTHONPATH=. python -m algo.serve W3/app_prof.py --workers 4 --port 8050
+# and load-test it with benchmarks/load_test.py.
+#
+# Environment (the flags' defaults):
+#   SERVE_HOST=0.0.0.0
+#   SERVE_PORT=8050
+#   SERVE_WORKERS   number of worker processes (default: one per CPU)
+#   SERVE_THREADS   waitress threads per worker (default: see
+#                   default_threads())
+
+import argparse
+import gc
+import math
+import os
+import runpy
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+from algo import warmup as app_warmup
+
+# total threads per CPU, across the workers
+THREADS_PER_CPU = 4
+MAX_THREADS = 32
+# a worker that dies sooner than this after starting is restarted only
+# after waiting as long, so a broken app doesn't fork in a tight loop
+MIN_UPTIME = 1.0
+
+
+def default_threads(workers, cpus=None):
+    """waitress threads per worker: THREADS_PER_CPU per CPU in total."""
+    cpus = cpus or os.cpu_count() or 1
+    threads = math.ceil(THREADS_PER_CPU * cpus / workers)
+    return max(2, min(MAX_THREADS, threads))
+
+
+def load_app(path):
+    """Run the app module at `path` without starting its warm-up; returns
+    (its Dash app, its Warmup or None)."""
+    with app_warmup.deferred():
+        ns = runpy.run_path(path, run_name='algo_serve')
+    return ns['app'], ns.get('warmup')
+
+
+def serve(path, workers=None, threads=None, host='0.0.0.0', port=8050,
+          backlog=1024):
+    from waitress import serve as waitress_serve
+
+    workers = workers or os.cpu_count() or 1
+    threads = threads or default_threads(workers)
+    if not hasattr(os, 'fork'):
+        workers = 1
+
+    store_dir = None
+    if workers > 1 and not os.getenv('DATASTORE_DIR'):
+        store_dir = tempfile.mkdtemp(prefix='datastore-')
+        os.environ['DATASTORE_DIR'] = store_dir
+
+    sock = socket.create_server((host, port), backlog=backlog)
+    try:
+        app, warmup = load_app(path)
+        if warmup is not None:
+            warmup.preload()
+        print('serving {} on http://{}:{} with {} worker(s) x {} threads'
+              .format(path, host, port, workers, threads), flush=True)
+
+        def worker():
+            if warmup is not None:
+                warmup.start()
+            waitress_serve(app.server, sockets=[sock], threads=threads)
+
+        if workers == 1:
+            worker()
+        else:
+            # what's loaded now is never written again by the collector,
+            # so the workers' copies of those pages stay shared
+            gc.freeze()
+            _supervise(worker, workers)
+    finally:
+        sock.close()
+        if store_dir is not None:
+            shutil.rmtree(store_dir, ignore_errors=True)
+
+
+##### helpers
+
+def _supervise(worker, workers):
+    children = {}
+    stopping = []
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            # Ctrl+C reaches the whole process group: the parent handles it
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            code = 0
+            try:
+                worker()
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = time.monotonic()
+
+    def stop(signum, frame):
+        stopping.append(signum)
+        for pid in children:
+            _kill(pid)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        spawn()
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        print('worker {} exited ({}), restarting'.format(
+            pid, os.waitstatus_to_exitcode(status)
+        ), file=sys.stderr, flush=True)
+        uptime = time.monotonic() - started
+        if uptime < MIN_UPTIME:
+            time.sleep(MIN_UPTIME)
+        if not stopping:
+            spawn()
+
+
+def _kill(pid):
+    try:
+        os.kill(pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Serve a Dash app from preforked waitress workers.'
+    )
+    parser.add_argument('app', help='path of the app module, e.g. W3/app.py')
+    parser.add_argument('--workers', type=int,
+                        default=int(os.getenv('SERVE_WORKERS', 0)) or None)
+    parser.add_argument('--threads', type=int,
+                        default=int(os.getenv('SERVE_THREADS', 0)) or None)
+    parser.add_argument('--host', default=os.getenv('SERVE_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int,
+                        default=int(os.getenv('SERVE_PORT', 8050)))
+    args = parser.parse_args()
+    serve(args.app, args.workers, args.threads, args.host, args.port)
@@ -0,0 +1,100 @@
+# singleflight.py
+#  - coalesces identical concurrent requests: the first caller for a key
+#    runs the fetch, everyone who asks for the same key while it is in
+#    flight waits for it and gets the same result (or the same exception)
+#  - successful results are kept for `ttl` seconds, so requests arriving
+#    just after the fetch finished are served without another call
+#  - counts how many upstream calls that saved
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Flight:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """One in-flight call per key, plus a short-lived result cache.
+
+    Keys are any hashable value (see request_key). At most `max_entries`
+    results are cached; the oldest go first. Results are shared between
+    callers, so copy them before mutating.
+    """
+
+    def __init__(self, ttl=5.0, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.counts = {
+            'requests': 0, 'upstream_calls': 0, 'coalesced': 0, 'ttl_hits': 0
+        }
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._results = OrderedDict()
+
+    def do(self, key, fetch):
+        """fetch()'s result for `key`, calling it only if no identical call
+        is in flight or cached."""
+        with self._lock:
+            self.counts['requests'] += 1
+            cached = self._results.get(key)
+            if cached is not None:
+                expires, result = cached
+                if expires > time.monotonic():
+                    self.counts['ttl_hits'] += 1
+                    return result
+                del self._results[key]
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+                self.counts['upstream_calls'] += 1
+            else:
+                self.counts['coalesced'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fetch()
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+                if flight.error is None and self.ttl > 0:
+                    self._results[key] = (
+                        time.monotonic() + self.ttl, flight.result
+                    )
+                    self._results.move_to_end(key)
+                    while len(self._results) > self.max_entries:
+                        self._results.popitem(last=False)
+            flight.done.set()
+        return flight.result
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self.counts,
+                saved=self.counts['requests'] - self.counts['upstream_calls']
+            )
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+
+def request_key(*args, **kwargs):
+    """Hashable key for a call's arguments; lists & tuples, and dicts in
+    any key order, give the same key."""
+    return json.dumps([args, kwargs], sort_keys=True, default=str)
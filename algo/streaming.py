@@ -0,0 +1,192 @@
+# streaming.py
+#  - the limit-entry / limit-exit strategy of algo/fills.py as an order
+#    state machine that is fed one bar at a time, for live trading
+#  - only open orders are kept: each bar costs one comparison per open entry
+#    & exit order, and returns the orders that changed state on that bar
+#  - replaying a history bar by bar gives the same entry & exit tables as
+#    build_entry_orders / build_exit_orders
+
+import pandas as pd
+
+from algo.fills import CANCELLED, FILLED, LIVE
+
+SUBMITTED = 'SUBMITTED'
+ORDER_COLUMNS = [
+    'trade_id', 'date', 'asset', 'trip', 'action', 'type', 'price', 'status'
+]
+
+# build_entry_orders / build_exit_orders stack their tables in this order
+# before sorting by date & trade_id
+_ENTRY_TABLES = ['submitted', 'cancelled', 'filled', 'live']
+_EXIT_TABLES = [
+    'submitted', 'cancelled', 'filled', 'live', 'submitted_mkt', 'filled_mkt'
+]
+
+
+class StreamingBlotter:
+    """Order state for one asset, advanced with on_bar().
+
+    Every bar after the first submits a BUY LMT entry at the previous close
+    times (1 + alpha1); it fills on the first of its next n1 bars whose low
+    reaches the limit, or is cancelled. A filled entry submits a SELL LMT
+    exit at the entry price times (1 + alpha2) that can fill on that day's
+    close, then on the next n2 - 1 days' highs; if it expires it is closed
+    with a market order at that day's close.
+
+    With keep_history=True (the default) every transition is also kept, so
+    entry_orders() / exit_orders() can rebuild the batch tables.
+    """
+
+    def __init__(self, asset, alpha1, n1, alpha2, n2, keep_history=True):
+        self.asset = asset
+        self.alpha1 = alpha1
+        self.n1 = n1
+        self.alpha2 = alpha2
+        self.n2 = n2
+        self.keep_history = keep_history
+        self.n_bars = 0
+        self.last_close = None
+        # open orders: [order dict, bars seen so far]
+        self.open_entries = []
+        self.open_exits = []
+        self._entry_log = {table: [] for table in _ENTRY_TABLES}
+        self._exit_log = {table: [] for table in _EXIT_TABLES}
+
+    def on_bar(self, date, low, high, close):
+        """Advance one bar; returns the orders that changed state on it."""
+        events = []
+        if self.last_close is not None:
+            entry = self._order(
+                self.n_bars, date, 'ENTER', 'BUY', 'LMT',
+                self.last_close * (1 + self.alpha1), SUBMITTED
+            )
+            self._log(self._entry_log, 'submitted', entry, events)
+            self.open_entries.append([entry, 0])
+
+        # open exits see the day's high ...
+        still_open = []
+        for order, seen in self.open_exits:
+            seen += 1
+            if high >= order['price']:
+                self._log(self._exit_log, 'filled',
+                          dict(order, date=date, status=FILLED), events)
+            elif seen == self.n2:
+                self._expire_exit(order, date, close, events)
+            else:
+                still_open.append([order, seen])
+        self.open_exits = still_open
+
+        # ... entries the day's low; an entry filled today submits its exit,
+        # which first trades against today's close
+        still_open = []
+        for order, seen in self.open_entries:
+            seen += 1
+            if low <= order['price']:
+                filled = dict(order, date=date, status=FILLED)
+                self._log(self._entry_log, 'filled', filled, events)
+                self._submit_exit(filled, close, events)
+            elif seen == self.n1:
+                cancelled = dict(order, date=date, status=CANCELLED)
+                self._log(self._entry_log, 'cancelled', cancelled, events)
+            else:
+                still_open.append([order, seen])
+        self.open_entries = still_open
+
+        self.n_bars += 1
+        self.last_close = close
+        return events
+
+    def live_orders(self, next_business_day):
+        """Open orders, plus the entry the next bar will submit, as LIVE."""
+        return (
+            self._live_entries(next_business_day)
+            + self._live_exits(next_business_day)
+        )
+
+    def entry_orders(self, next_business_day):
+        """Same table as build_entry_orders for the bars seen so far."""
+        return self._table(
+            self._entry_log, _ENTRY_TABLES,
+            live=self._live_entries(next_business_day)
+        )
+
+    def exit_orders(self, next_business_day):
+        """Same table as build_exit_orders for the bars seen so far."""
+        return self._table(
+            self._exit_log, _EXIT_TABLES,
+            live=self._live_exits(next_business_day)
+        )
+
+    ##### helpers
+
+    def _submit_exit(self, entry, close, events):
+        order = self._order(
+            entry['trade_id'], entry['date'], 'EXIT', 'SELL', 'LMT',
+            entry['price'] * (1 + self.alpha2), SUBMITTED
+        )
+        self._log(self._exit_log, 'submitted', order, events)
+        if close >= order['price']:
+            self._log(self._exit_log, 'filled',
+                      dict(order, status=FILLED), events)
+        elif self.n2 == 1:
+            self._expire_exit(order, order['date'], close, events)
+        else:
+            self.open_exits.append([order, 1])
+
+    def _expire_exit(self, order, date, close, events):
+        self._log(self._exit_log, 'cancelled',
+                  dict(order, date=date, status=CANCELLED), events)
+        market = self._order(
+            order['trade_id'], date, 'EXIT', 'SELL', 'MKT', close, SUBMITTED
+        )
+        self._log(self._exit_log, 'submitted_mkt', market, events)
+        self._log(self._exit_log, 'filled_mkt',
+                  dict(market, status=FILLED), events)
+
+    def _live_entries(self, next_business_day):
+        live = []
+        if self.last_close is not None:
+            live.append(self._order(
+                self.n_bars, next_business_day, 'ENTER', 'BUY', 'LMT',
+                self.last_close * (1 + self.alpha1), LIVE
+            ))
+        return live + [
+            dict(order, date=next_business_day, status=LIVE)
+            for order, seen in self.open_entries
+        ]
+
+    def _live_exits(self, next_business_day):
+        return [
+            dict(order, date=next_business_day, status=LIVE)
+            for order, seen in self.open_exits
+        ]
+
+    def _order(self, trade_id, date, trip, action, type_, price, status):
+        return {
+            'trade_id': trade_id, 'date': date, 'asset': self.asset,
+            'trip': trip, 'action': action, 'type': type_, 'price': price,
+            'status': status
+        }
+
+    def _log(self, log, table, order, events):
+        events.append(order)
+        if self.keep_history:
+            log[table].append(order)
+
+    def _table(self, log, tables, live):
+        rows = []
+        for table in tables:
+            rows += live if table == 'live' else log[table]
+        return pd.DataFrame(rows, columns=ORDER_COLUMNS).sort_values(
+            ['date', 'trade_id']
+        )
+
+
+def replay(prices, asset, alpha1, n1, alpha2, n2):
+    """Feed a Refinitiv-style price table (Date, Low/High/Close Price) through
+    a StreamingBlotter, one bar at a time."""
+    blotter = StreamingBlotter(asset, alpha1, n1, alpha2, n2)
+    for row in prices[['Date', 'Low Price', 'High Price', 'Close Price']] \
+            .itertuples(index=False):
+        blotter.on_bar(*row)
+    return blotter
@@ -0,0 +1,131 @@
+# sweep.py
+#  - evaluate the limit-entry / limit-exit strategy over a grid of
+#    (alpha1, n1, alpha2, n2) for one instrument
+#  - range-min / max indexes over the lows & highs are built once and
+#    serve every n1 / n2; every alpha is evaluated against them by
+#    broadcasting, and (n1, n2) pairs are spread over a process pool
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from algo.rangeindex import RangeMinMax
+
+SWEEP_COLUMNS = [
+    'alpha1', 'n1', 'alpha2', 'n2', 'n_entries', 'entry_fill_rate',
+    'n_trips', 'exit_fill_rate', 'pnl'
+]
+
+# price indexes shared with pool workers, set once per process by
+# _init_worker
+_shared = {}
+
+
+def sweep(prices, alpha1, n1, alpha2, n2, max_workers=None):
+    """P&L and fill rates for every combination of the given parameters.
+
+    `prices` is one instrument's history with low, high & close columns in
+    date order. A round trip is one filled entry closed by its limit exit or
+    by the market exit after n2 days; still-open trades are left out of
+    `pnl`, which is per share. `max_workers=1` runs in this process.
+    """
+    prices = prices.dropna(subset=['low', 'high', 'close'])
+    close = prices['close'].to_numpy(dtype=float)
+    low = prices['low'].to_numpy(dtype=float)
+    high = prices['high'].to_numpy(dtype=float)
+    n1 = sorted(set(int(n) for n in n1))
+    n2 = sorted(set(int(n) for n in n2))
+
+    highs = RangeMinMax(high)
+    shared = {
+        'close': close,
+        'alpha1': np.asarray(alpha1, dtype=float),
+        'alpha2': np.asarray(alpha2, dtype=float),
+        'lows': RangeMinMax(low),
+        'exit': {n: _exit_best(close, highs, n) for n in n2}
+    }
+    tasks = list(itertools.product(n1, n2))
+
+    if max_workers == 1 or len(tasks) == 1:
+        _init_worker(shared)
+        results = [_run_task(task) for task in tasks]
+    else:
+        max_workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 initializer=_init_worker,
+                                 initargs=(shared,)) as pool:
+            results = list(pool.map(_run_task, tasks))
+
+    return pd.concat(results, ignore_index=True).sort_values(
+        ['alpha1', 'n1', 'alpha2', 'n2'], ignore_index=True
+    )
+
+
+def _exit_best(close, highs, n):
+    # For an exit submitted on bar r: the best price it can get over its n
+    # bars (r's close, then the highs), whether all n bars exist yet, and
+    # the close it is marketed out at if the limit never fills.
+    rows = np.arange(close.shape[0])
+    n_avail = np.minimum(n, close.shape[0] - rows)
+    best = close.copy()
+    more = n_avail > 1
+    best[more] = np.maximum(
+        close[more], highs.max(rows[more] + 1, rows[more] + n_avail[more])
+    )
+    full = n_avail >= n
+    market = np.where(full, close[np.minimum(rows + n - 1, rows[-1])], np.nan)
+    return best, full, market
+
+
+def _init_worker(shared):
+    _shared.clear()
+    _shared.update(shared)
+
+
+def _run_task(task):
+    n1, n2 = task
+    close = _shared['close']
+    alpha1 = _shared['alpha1']
+    alpha2 = _shared['alpha2']
+    lows = _shared['lows']
+    best, full, market = _shared['exit'][n2]
+
+    # (alpha1 x orders) entry limits, filled on the first bar that trades
+    # at or below the limit
+    entry_px = close[:-1][None, :] * (1 + alpha1)[:, None]
+    start = np.arange(1, close.shape[0])
+    stop = np.minimum(start + n1, close.shape[0])
+    hit_row = lows.first_at_most(start[None, :], stop[None, :], entry_px)
+    entry_filled = hit_row >= 0
+    fill_row = np.where(entry_filled, hit_row, start[None, :])
+
+    # (alpha2 x alpha1 x orders) exit limits from each entry's fill bar
+    exit_px = entry_px[None, :, :] * (1 + alpha2)[:, None, None]
+    exit_filled = best[fill_row][None, :, :] >= exit_px
+    exit_market = full[fill_row][None, :, :] & ~exit_filled
+    closed = entry_filled[None, :, :] & (exit_filled | exit_market)
+    pnl = np.where(
+        exit_filled, exit_px, market[fill_row][None, :, :]
+    ) - entry_px[None, :, :]
+
+    n_entries = close.shape[0] - 1
+    n_filled = entry_filled.sum(axis=1)
+    n_exit_filled = (entry_filled[None, :, :] & exit_filled).sum(axis=2)
+    a2, a1 = np.meshgrid(alpha2, alpha1, indexing='ij')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return pd.DataFrame({
+            'alpha1': a1.ravel(),
+            'n1': n1,
+            'alpha2': a2.ravel(),
+            'n2': n2,
+            'n_entries': n_entries,
+            'entry_fill_rate': np.broadcast_to(
+                n_filled / n_entries, a1.shape
+            ).ravel(),
+            'n_trips': closed.sum(axis=2).ravel(),
+            'exit_fill_rate': (n_exit_filled / n_filled[None, :]).ravel(),
+            'pnl': np.where(closed, pnl, 0).sum(axis=2).ravel()
+        })[SWEEP_COLUMNS]
@@ -0,0 +1,81 @@
+# synthetic.py
+#  - seeded fake price histories shaped like unadjusted_price_history.csv,
+#    for benchmarks and for trying things out without a Refinitiv session
+#  - unadjusted OHLC with quarterly dividends (div_amt on the ex date, when
+#    the price drops by the dividend) and the occasional forward split
+#    (split_rto = 1 / ratio on the last day before the split, as Refinitiv's
+#    Adjustment Factor is stored by the fetch script)
+
+import numpy as np
+import pandas as pd
+
+SPLIT_RATIOS = [2, 3, 4, 5]
+
+
+def synthetic_history(n_instruments, n_days, start='2017-01-03', seed=0,
+                      div_every=63, div_yield=0.02, split_prob=1 / 2500):
+    """Long-format daily history for `n_instruments` random-walk tickers.
+
+    Each ticker pays a dividend of about div_yield / 4 of its price every
+    `div_every` trading days (0 for no dividends) and splits on any given
+    day with probability `split_prob`. Dates are datetime64.
+    """
+    rng = np.random.default_rng(seed)
+    # weekdays from `start`, like pd.bdate_range but without its per-date loop
+    dates = np.busday_offset(
+        np.datetime64(pd.Timestamp(start).date()), np.arange(n_days),
+        roll='forward'
+    )
+    shape = (n_instruments, n_days)
+
+    # dividend-adjusted random walk
+    start_px = rng.uniform(20, 400, size=(n_instruments, 1))
+    total_return = start_px * np.exp(
+        np.cumsum(rng.normal(0, 0.015, shape), axis=1)
+    )
+
+    # on each ex date the price falls by the dividend, and stays lower
+    div_amt = np.zeros(shape)
+    if div_every:
+        first_ex = rng.integers(1, div_every, size=n_instruments)
+        ex_day = np.arange(n_days)[None, :] - first_ex[:, None]
+        is_ex = (ex_day >= 0) & (ex_day % div_every == 0)
+        div_rate = np.where(is_ex, div_yield / 4, 0.0)
+        div_amt = total_return * div_rate
+        total_return = total_return * np.cumprod(1 - div_rate, axis=1)
+
+    # a split on day t divides every price from t on by the ratio; the
+    # ratio's reciprocal is recorded on day t - 1. Like real companies,
+    # tickers only split while the price is high (over $50 a share after
+    # the split), so prices don't dwindle towards zero.
+    ratio = np.ones(shape, dtype=np.int64)
+    candidates = rng.random(shape) < split_prob
+    candidates[:, 0] = False
+    for i, t in zip(*np.nonzero(candidates)):
+        k = rng.choice(SPLIT_RATIOS)
+        if total_return[i, t] / ratio[i, :t].prod() >= 50 * k:
+            ratio[i, t] = k
+    scale = np.cumprod(ratio, axis=1)
+    close = total_return / scale
+    div_amt = div_amt / scale
+    split_rto = np.ones(shape)
+    split_rto[:, :-1] = 1 / ratio[:, 1:]
+
+    prev_close = np.concatenate([start_px, close[:, :-1]], axis=1)
+    prev_close[:, 1:] = prev_close[:, 1:] * split_rto[:, :-1]
+    open_ = (prev_close - div_amt) * np.exp(rng.normal(0, 0.004, shape))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.006, shape)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.006, shape)))
+
+    return pd.DataFrame({
+        'Instrument': np.repeat(
+            ['SYN{:05d}'.format(i) for i in range(n_instruments)], n_days
+        ),
+        'open': open_.ravel().round(2),
+        'high': high.ravel().round(2),
+        'low': low.ravel().round(2),
+        'close': close.ravel().round(2),
+        'Date': np.tile(dates, n_instruments).astype('datetime64[ns]'),
+        'div_amt': div_amt.ravel().round(4),
+        'split_rto': split_rto.ravel()
+    })
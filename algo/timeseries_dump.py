@@ -0,0 +1,160 @@
+# timeseries_dump.py
+#  - reads the get_timeseries() dump (get_timeseries_output.csv, written by
+#    W2/fetch_refinitiv_data.py) in fixed-size chunks: its two-row header
+#    (instrument x field) is parsed once, then each chunk of dates is read
+#    with float64 columns and reshaped into the repo's long format:
+#      Instrument, Date, open, high, low, close, volume
+#  - a chunk is CHUNK_CELLS values (fewer dates the more instruments the
+#    dump has, but at least MIN_CHUNK_ROWS: pandas pays ~0.1 ms per column
+#    per chunk), so peak memory is a few chunks, however long the file;
+#    rows come out chunk by chunk (dates ascending), each chunk instrument
+#    by instrument
+#  - Instrument is categorical over the dump's RICs; rows with no prices
+#    (before a RIC's first bar, say) are dropped; COUNT is not kept
+#  - needs the Date column: dumps written with index=False (before the fetch
+#    script kept it) can't be dated and are rejected
+#  - get_timeseries() for a single RIC gives a flat, one-row header that
+#    doesn't name it: such dumps are read only when given the `instrument`
+#
+# Convert a dump to a long csv with:
+#   python -m algo.timeseries_dump get_timeseries_output.csv timeseries.csv
+#   python -m algo.timeseries_dump one_ric.csv timeseries.csv AAPL.O
+
+import csv
+import sys
+
+import numpy as np
+import pandas as pd
+
+# csv values per chunk (~32 MB as float64)
+CHUNK_CELLS = 4_000_000
+MIN_CHUNK_ROWS = 1_000
+# get_timeseries field -> long-format column
+FIELDS = {
+    'OPEN': 'open', 'HIGH': 'high', 'LOW': 'low', 'CLOSE': 'close',
+    'VOLUME': 'volume'
+}
+ALL_FIELDS = set(FIELDS) | {'COUNT'}
+LONG_COLUMNS = ['Instrument', 'Date'] + list(FIELDS.values())
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+
+class DumpHeader:
+    """What the header of a get_timeseries() dump says about its body."""
+
+    def __init__(self, instruments, positions, n_columns, skip_rows):
+        # instruments in column order; positions[i, j] is the csv column of
+        # instrument i's FIELDS[j], or -1 if the dump doesn't have it
+        self.instruments = instruments
+        self.positions = positions
+        self.n_columns = n_columns
+        self.skip_rows = skip_rows
+
+
+def read_header(path, instrument=None):
+    """Parse the header rows of the dump at `path`; `instrument` names the
+    RIC of a single-instrument dump."""
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        rics = next(reader)
+        fields = next(reader, [''])
+        third = next(reader, [])
+    if rics[0].upper() in ALL_FIELDS or fields[0].upper() in ALL_FIELDS:
+        raise ValueError(
+            '{} has no Date column; re-run W2/fetch_refinitiv_data.py, which '
+            'writes the dump with its dates'.format(path)
+        )
+    if len(rics) > 1 and all(name.upper() in ALL_FIELDS for name in rics[1:]):
+        # Date, HIGH, CLOSE, ...: one instrument, which the file doesn't name
+        if instrument is None:
+            raise ValueError(
+                '{} has a single-instrument header that does not name its '
+                'RIC; pass instrument='.format(path)
+            )
+        rics, fields = [rics[0]] + [instrument] * (len(rics) - 1), rics
+        skip_rows = 1
+    else:
+        skip_rows = 2
+        # pandas adds a row holding just the index name ("Date") when it has
+        # one
+        if (third and not any(third[1:]) and third[0]
+                and not _is_date(third[0])):
+            skip_rows = 3
+
+    instruments = list(dict.fromkeys(rics[1:]))
+    positions = np.full((len(instruments), len(FIELDS)), -1, dtype=np.int64)
+    names = list(FIELDS)
+    for col, (ric, field) in enumerate(zip(rics, fields)):
+        if col and field.upper() in FIELDS:
+            positions[instruments.index(ric), names.index(field.upper())] = col
+    return DumpHeader(instruments, positions, len(rics), skip_rows)
+
+
+def iter_long(path, chunk_rows=None, instrument=None):
+    """Long-format DataFrames of up to chunk_rows dates (times the number
+    of instruments) each; by default, as many dates as fit CHUNK_CELLS."""
+    header = read_header(path, instrument)
+    chunk_rows = chunk_rows or max(
+        MIN_CHUNK_ROWS, CHUNK_CELLS // header.n_columns
+    )
+    used = sorted(set(header.positions[header.positions >= 0].tolist()))
+    # where each (instrument, field) lands in a chunk's array; the extra
+    # last column is all NaN, for fields the dump doesn't have
+    slot = {col: k for k, col in enumerate(used)}
+    take = np.array([
+        [slot.get(int(col), len(used)) for col in row]
+        for row in header.positions
+    ]).ravel()
+    instruments = pd.CategoricalDtype(header.instruments)
+    n_instruments = len(header.instruments)
+
+    chunks = pd.read_csv(
+        path, skiprows=header.skip_rows, header=None, usecols=[0] + used,
+        names=range(header.n_columns), dtype={col: 'float64' for col in used},
+        chunksize=chunk_rows
+    )
+    for chunk in chunks:
+        n = chunk.shape[0]
+        dates = pd.to_datetime(chunk[0], format='ISO8601').to_numpy()
+        values = np.empty((n, len(used) + 1))
+        values[:, :-1] = chunk[used].to_numpy()
+        values[:, -1] = np.nan
+        # (dates, instruments x fields) -> (instruments x dates, fields)
+        values = values[:, take].reshape(n, n_instruments, len(FIELDS))
+        values = values.transpose(1, 0, 2).reshape(-1, len(FIELDS))
+
+        out = pd.DataFrame(values, columns=list(FIELDS.values()))
+        out.insert(0, 'Date', np.tile(dates, n_instruments))
+        out.insert(0, 'Instrument', pd.Categorical.from_codes(
+            np.repeat(np.arange(n_instruments), n), dtype=instruments
+        ))
+        has_prices = ~np.isnan(values[:, :len(PRICE_COLUMNS)]).all(axis=1)
+        yield out[has_prices].reset_index(drop=True)
+
+
+def convert(path, out_path, chunk_rows=None, instrument=None):
+    """Write the dump at `path` to `out_path` as a long csv, chunk by chunk;
+    returns the number of rows written."""
+    n_rows = 0
+    with open(out_path, 'w', newline='') as f:
+        for i, chunk in enumerate(iter_long(path, chunk_rows, instrument)):
+            chunk.to_csv(f, header=i == 0, index=False,
+                         date_format='%Y-%m-%d')
+            n_rows += chunk.shape[0]
+    return n_rows
+
+
+##### helpers
+
+def _is_date(text):
+    try:
+        pd.Timestamp(text)
+    except ValueError:
+        return False
+    return True
+
+
+if __name__ == '__main__':
+    instrument = sys.argv[3] if len(sys.argv) > 3 else None
+    print(convert(sys.argv[1], sys.argv[2], instrument=instrument),
+          'rows written to', sys.argv[2])
@@ -0,0 +1,161 @@
+# trading_calendar.py
+#  - US equity trading calendar built in-process from the NYSE holiday rules,
+#    so finding "the next business day" doesn't need a Refinitiv session
+#  - lookups are vectorized through numpy's business-day functions
+#  - verify_with_refinitiv() optionally checks the calendar against
+#    rd.dates_and_calendars.add_periods(calendars=["USA"])
+
+from datetime import date, timedelta
+
+import numpy as np
+
+# one-off market closures that no rule produces
+SPECIAL_CLOSURES = [
+    date(1994, 4, 27),                       # President Nixon
+    date(2001, 9, 11), date(2001, 9, 12),    # September 11
+    date(2001, 9, 13), date(2001, 9, 14),
+    date(2004, 6, 11),                       # President Reagan
+    date(2007, 1, 2),                        # President Ford
+    date(2012, 10, 29), date(2012, 10, 30),  # Hurricane Sandy
+    date(2018, 12, 5),                       # President G.H.W. Bush
+    date(2025, 1, 9),                        # President Carter
+]
+
+
+def usa_holidays(year):
+    """NYSE full-day holidays in `year`, as observed."""
+    holidays = [
+        _nth_weekday(year, 2, 0, 3),        # Washington's Birthday
+        _easter(year) - timedelta(days=2),  # Good Friday
+        _last_weekday(year, 5, 0),          # Memorial Day
+        _observed(date(year, 7, 4)),        # Independence Day
+        _nth_weekday(year, 9, 0, 1),        # Labor Day
+        _nth_weekday(year, 11, 3, 4),       # Thanksgiving
+        _observed(date(year, 12, 25)),      # Christmas
+    ]
+    # New Year's Day on a Saturday is not made up on the Friday before
+    if date(year, 1, 1).weekday() != 5:
+        holidays.append(_observed(date(year, 1, 1)))
+    if year >= 1998:
+        holidays.append(_nth_weekday(year, 1, 0, 3))  # Martin Luther King Day
+    if year >= 2022:
+        holidays.append(_observed(date(year, 6, 19)))  # Juneteenth
+    holidays += [d for d in SPECIAL_CLOSURES if d.year == year]
+    return sorted(holidays)
+
+
+class TradingCalendar:
+    """US trading days for the years start_year..end_year (inclusive)."""
+
+    def __init__(self, start_year=1990, end_year=None):
+        self.start_year = start_year
+        self.end_year = end_year or date.today().year + 5
+        self.holidays = np.array(
+            [d for year in range(self.start_year, self.end_year + 1)
+             for d in usa_holidays(year)],
+            dtype='datetime64[D]'
+        )
+        self._busdaycal = np.busdaycalendar(holidays=self.holidays)
+
+    def is_business_day(self, dates):
+        return np.is_busday(self._days(dates), busdaycal=self._busdaycal)
+
+    def next_business_day(self, dates):
+        """First trading day strictly after each date."""
+        return np.busday_offset(
+            self._days(dates), 1, roll='backward', busdaycal=self._busdaycal
+        )
+
+    def previous_business_day(self, dates):
+        """Last trading day strictly before each date."""
+        return np.busday_offset(
+            self._days(dates), -1, roll='forward', busdaycal=self._busdaycal
+        )
+
+    def business_days(self, start, end):
+        """All trading days from start to end, inclusive."""
+        days = np.arange(
+            self._days(start), self._days(end) + np.timedelta64(1, 'D'),
+            dtype='datetime64[D]'
+        )
+        return days[self.is_business_day(days)]
+
+    def _days(self, dates):
+        days = np.asarray(dates, dtype='datetime64[D]')
+        lo = np.datetime64(date(self.start_year, 1, 1))
+        hi = np.datetime64(date(self.end_year, 12, 31))
+        # leave a week of slack at the ends for next/previous lookups
+        if np.any(days < lo + 7) or np.any(days > hi - 7):
+            raise ValueError(
+                "dates outside the calendar's years {}-{}".format(
+                    self.start_year, self.end_year
+                )
+            )
+        return days
+
+
+def verify_with_refinitiv(calendar, start, end, provider=None):
+    """Compare next_business_day against Refinitiv's USA calendar.
+
+    Only the days either side of each holiday in [start, end] are checked,
+    which is where the two can disagree. Returns (date, ours, refinitiv)
+    for every mismatch. Queries go through `provider` (by default this
+    process's market_data(), whose rd session stays open afterwards).
+    """
+    if provider is None:
+        from algo.provider import market_data
+        provider = market_data()
+
+    holidays = calendar.holidays[
+        (calendar.holidays >= np.datetime64(start))
+        & (calendar.holidays <= np.datetime64(end))
+    ]
+    checks = np.unique(np.concatenate([holidays - 1, holidays]))
+    ours = calendar.next_business_day(checks)
+
+    mismatches = []
+    for day, expected in zip(checks, ours):
+        theirs = provider.add_periods(
+            start_date=str(day),
+            period="1D",
+            calendars=["USA"],
+            date_moving_convention="NextBusinessDay",
+        )
+        theirs = np.datetime64(str(theirs)[:10])
+        if theirs != expected:
+            mismatches.append((day, expected, theirs))
+    return mismatches
+
+
+def _observed(day):
+    # Saturday holidays are taken on Friday, Sunday holidays on Monday
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def _nth_weekday(year, month, weekday, n):
+    first = date(year, month, 1)
+    return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+
+
+def _last_weekday(year, month, weekday):
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year):
+    # Anonymous Gregorian algorithm
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
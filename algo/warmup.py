@@ -0,0 +1,191 @@
+# warmup.py
+#  - lets a Dash app answer requests before its slow setup is done: SDK
+#    logins, heavy imports (plotly.express) and data files are registered
+#    as named tasks instead of running at import
+#  - by default the tasks run on a background thread started with the app;
+#    whatever a callback needs before then is loaded on first use
+#  - /_health answers as soon as the server is up; /_ready returns 503
+#    with the pending tasks until every task has finished, then 200
+#  - fork-safe: a worker forked from a process that was warming up resets
+#    the unfinished tasks and warms them up itself. Tasks registered with
+#    shared=True (read-only data, imports) can be preloaded before forking,
+#    so every worker shares them copy-on-write (see algo/serve.py)
+#
+# Environment:
+#   APP_WARMUP=background   (default) run the tasks on a thread at start()
+#   APP_WARMUP=lazy         only run a task when it's first used
+#   APP_WARMUP=eager        run them all inside start(), before serving
+
+import os
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+
+# set while a launcher imports an app it is about to fork (see deferred())
+_defer_start = False
+
+
+class Lazy:
+    """A value made by `factory()` once, on first get() or by the warm-up.
+
+    Calling the object is the same as get(). If the factory raises, the
+    caller gets the error and the next get() tries again; the warm-up
+    thread only records it.
+    """
+
+    def __init__(self, name, factory, shared=False):
+        self.name = name
+        self.factory = factory
+        self.shared = shared
+        self._reset()
+
+    def get(self):
+        if self.state != DONE:
+            with self._lock:
+                if self.state in (PENDING, FAILED):
+                    self._load()
+        if self.state == FAILED:
+            raise self.error
+        return self.value
+
+    __call__ = get
+
+    def status(self):
+        return {'state': self.state, 'seconds': self.seconds,
+                'error': repr(self.error) if self.error else None}
+
+    def _load(self):
+        # caller holds _lock
+        self.state = RUNNING
+        start_time = time.perf_counter()
+        try:
+            self.value = self.factory()
+            self.error = None
+            self.state = DONE
+        except Exception as error:
+            self.error = error
+            self.state = FAILED
+        self.seconds = time.perf_counter() - start_time
+
+    def _reset(self):
+        self.value = None
+        self.error = None
+        self.state = PENDING
+        self.seconds = None
+        self._lock = threading.Lock()
+
+
+class Warmup:
+    """Named Lazy tasks, warmed up in registration order."""
+
+    def __init__(self, mode=None):
+        self.mode = mode or os.getenv('APP_WARMUP', 'background')
+        if self.mode not in ('background', 'lazy', 'eager'):
+            raise ValueError('APP_WARMUP must be background, lazy or eager')
+        self.tasks = {}
+        self._thread = None
+        self._started = False
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def task(self, name, factory, shared=False):
+        """Register `factory` as task `name`; returns its Lazy.
+
+        shared=True marks tasks that are safe to run before forking workers
+        (no connections, threads or open sessions).
+        """
+        self.tasks[name] = Lazy(name, factory, shared)
+        return self.tasks[name]
+
+    def start(self):
+        """Begin warming up, as APP_WARMUP says. Safe to call again."""
+        if self._started or _defer_start:
+            return self
+        self._started = True
+        if self.mode == 'eager':
+            self._run()
+        elif self.mode == 'background':
+            self._thread = threading.Thread(
+                target=self._run, name='warmup', daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def preload(self):
+        """Run the shared tasks now, in this process. Failures are only
+        printed; the workers try again on first use."""
+        for task in self.tasks.values():
+            if task.shared:
+                try:
+                    task.get()
+                except Exception:
+                    traceback.print_exc()
+        return self
+
+    def ready(self):
+        """True once every task is done; always, in lazy mode, where tasks
+        load on first use."""
+        return self.mode == 'lazy' or all(
+            task.state == DONE for task in self.tasks.values()
+        )
+
+    def wait(self, timeout=None):
+        """Block until ready (or `timeout` seconds); returns ready()."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.ready()
+
+    def status(self):
+        return {
+            'ready': self.ready(),
+            'mode': self.mode,
+            'tasks': {name: task.status() for name, task in self.tasks.items()}
+        }
+
+    def add_routes(self, server):
+        """/_health and /_ready on a Flask server (a Dash app's .server)."""
+        from flask import jsonify
+
+        @server.route('/_health')
+        def health():
+            return jsonify({'status': 'ok', 'pid': os.getpid()})
+
+        @server.route('/_ready')
+        def ready():
+            status = self.status()
+            return jsonify(status), 200 if status['ready'] else 503
+
+    ##### helpers
+
+    def _run(self):
+        for task in self.tasks.values():
+            try:
+                task.get()
+            except Exception:
+                traceback.print_exc()
+
+    def _after_fork(self):
+        # the warm-up thread doesn't survive a fork and may have held a
+        # task's lock: start unfinished tasks over in the child
+        for task in self.tasks.values():
+            if task.state != DONE:
+                task._reset()
+        self._thread = None
+        if self._started:
+            self._started = False
+            self.start()
+
+
+@contextmanager
+def deferred():
+    """Apps imported inside this block don't start warming up: their
+    Warmup.start() calls are ignored, so the launcher can preload() the
+    shared tasks, fork, and start() in each worker."""
+    global _defer_start
+    _defer_start = True
+    try:
+        yield
+    finally:
+        _defer_start = False
@@ -0,0 +1,161 @@
+# bench_corporate_actions.py
+#  - cleaning & merging a universe's raw Refinitiv prices, dividends & splits
+#    into the unadjusted price history, up to 2,000 instruments x 5,000 days
+#    (10M price rows):
+#      merges     the old way: groupby + ", ".join per dividend day, then two
+#                 outer merges, fillna, isnull() & drop_duplicates
+#      vectorized algo/corporate_actions.py: categorical codes, one sorted
+#                 searchsorted per action table, checks in the same pass
+#  - raw tables come from seeded synthetic histories (algo/synthetic.py), in
+#    get_data()'s column names, with an extra "Special" dividend on ~2% of
+#    ex dates, some zero-amount dividends and the last bar of every instrument
+#    repeated, like Refinitiv sends it
+#  - the merges are only timed up to OLD_MAX_ROWS price rows; past that they
+#    need more memory than this machine has (--all times them anyway)
+#
+# Run from the repo root:
+#   PYTHONPATH=. python benchmarks/bench_corporate_actions.py
+#   PYTHONPATH=. python benchmarks/bench_corporate_actions.py --sizes 100x2500
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from algo.corporate_actions import (
+    clean_divs, clean_prices, clean_splits, merge_history
+)
+from algo.synthetic import synthetic_history
+
+# instruments x days
+SIZES = ['100x2500', '500x5000', '2000x5000']
+OLD_MAX_ROWS = 3_000_000
+
+
+def raw_tables(n_instruments, n_days, seed=0):
+    history = synthetic_history(n_instruments, n_days, seed=seed)
+    rng = np.random.default_rng(seed)
+
+    prices = history[['Instrument', 'Date', 'open', 'high', 'low', 'close']]
+    last = np.r_[history['Instrument'].to_numpy()[1:]
+                 != history['Instrument'].to_numpy()[:-1], True]
+    prices = pd.concat([prices, prices[last]], ignore_index=True).rename(
+        columns={'open': 'Open Price', 'high': 'High Price',
+                 'low': 'Low Price', 'close': 'Close Price'}
+    )
+
+    paid = history[history['div_amt'] > 0]
+    special = paid[rng.random(paid.shape[0]) < 0.02]
+    zero = paid[rng.random(paid.shape[0]) < 0.01].assign(div_amt=0.0)
+    divs = pd.concat([
+        paid.assign(div_type='Interim'),
+        special.assign(div_amt=special['div_amt'] / 2, div_type='Special'),
+        zero.assign(div_type='Final')
+    ], ignore_index=True)
+    divs = pd.DataFrame({
+        'Instrument': divs['Instrument'],
+        'Dividend Ex Date': divs['Date'],
+        'Gross Dividend Amount': divs['div_amt'],
+        'Dividend Type': divs['div_type'],
+        'Dividend Payment Type': 'Cash'
+    })
+
+    split = history[history['split_rto'] != 1]
+    splits = pd.DataFrame({
+        'Instrument': split['Instrument'],
+        'Capital Change Effective Date': split['Date'],
+        'Adjustment Factor': split['split_rto']
+    })
+    return prices, divs, splits
+
+
+def merges(prices, divs, splits):
+    # steps 8-11 as they were in W2/fetch_refinitiv_data.py & the W3 apps
+    prices = prices.rename(columns={
+        'Open Price': 'open', 'High Price': 'high', 'Low Price': 'low',
+        'Close Price': 'close'
+    }).dropna()
+    prices['Date'] = pd.to_datetime(prices['Date']).dt.date
+
+    divs = divs.rename(columns={
+        'Dividend Ex Date': 'Date', 'Gross Dividend Amount': 'div_amt',
+        'Dividend Type': 'div_type', 'Dividend Payment Type': 'pay_type'
+    }).dropna()
+    divs['Date'] = pd.to_datetime(divs['Date']).dt.date
+    divs = divs.groupby(['Instrument', 'Date'], as_index=False).agg({
+        'div_amt': 'sum',
+        'div_type': lambda x: ", ".join(x),
+        'pay_type': lambda x: ", ".join(x)
+    })
+    divs = divs[(divs.Date.notnull()) & (divs.div_amt > 0)]
+
+    splits = splits.rename(columns={
+        'Capital Change Effective Date': 'Date',
+        'Adjustment Factor': 'split_rto'
+    }).dropna()
+    splits['Date'] = pd.to_datetime(splits['Date']).dt.date
+
+    history = pd.merge(
+        prices, divs[['Instrument', 'Date', 'div_amt']],
+        how='outer', on=['Date', 'Instrument']
+    )
+    history['div_amt'] = history['div_amt'].fillna(0)
+    history = pd.merge(history, splits, how='outer', on=['Date', 'Instrument'])
+    history['split_rto'] = history['split_rto'].fillna(1)
+    if history.isnull().values.any():
+        raise Exception('missing values detected!')
+    return history.drop_duplicates()
+
+
+def vectorized(prices, divs, splits):
+    return merge_history(
+        clean_prices(prices), clean_divs(divs), clean_splits(splits)
+    )
+
+
+def timed(f, *args):
+    start_time = time.perf_counter()
+    result = f(*args)
+    return result, time.perf_counter() - start_time
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', nargs='+', default=SIZES,
+                        help='instruments x days, e.g. 2000x5000')
+    parser.add_argument('--all', action='store_true',
+                        help='time the merges at every size')
+    args = parser.parse_args()
+
+    print('{:>10} {:>10} {:>8} {:>11} {:>11} {:>11} {:>8}'.format(
+        'size', 'rows', 'divs', 'clean (s)', 'merge (s)', 'merges (s)',
+        'speedup'
+    ))
+    for size in args.sizes:
+        n_instruments, n_days = map(int, size.split('x'))
+        prices, divs, splits = raw_tables(n_instruments, n_days)
+
+        cleaned, clean_time = timed(
+            lambda: (clean_prices(prices), clean_divs(divs),
+                     clean_splits(splits))
+        )
+        new, merge_time = timed(merge_history, *cleaned)
+        del cleaned
+
+        old_time = None
+        if args.all or prices.shape[0] <= OLD_MAX_ROWS:
+            old, old_time = timed(merges, prices, divs, splits)
+            old = old.sort_values(['Instrument', 'Date'], kind='stable')
+            assert old.shape[0] == new.shape[0]
+            assert np.allclose(old['div_amt'], new['div_amt'])
+            assert np.allclose(old['split_rto'], new['split_rto'])
+            del old
+
+        new_time = clean_time + merge_time
+        print('{:>10} {:>10} {:>8} {:11.2f} {:11.2f} {:>11} {:>8}'.format(
+            size, new.shape[0], divs.shape[0], clean_time, merge_time,
+            '-' if old_time is None else '{:.2f}'.format(old_time),
+            '-' if old_time is None else '{:.1f}x'.format(old_time / new_time)
+        ))
+        del new, prices, divs, splits
@@ -0,0 +1,54 @@
+# bench_offline.py
+#  - load test against the offline Refinitiv stand-in (algo/offline.py):
+#    many concurrent "QUERY Refinitiv" clicks, each one the three get_data
+#    queries query_refinitiv makes for a benchmark & an asset
+#  - reports throughput and per-query latency as concurrency grows; with
+#    latency simulated by sleeping, the limit is this process, not Refinitiv
+#  - run from the repo root:  PYTHONPATH=. python benchmarks/bench_offline.py
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from algo.fetcher import history_field_groups
+from algo.offline import OfflineData, OfflineEikon, OfflineError
+
+N_QUERIES = 4000
+LATENCY = 0.2
+ERROR_RATE = 0.01
+ASSETS = ['AAPL.O', 'GLD', 'SHY.O', 'MSFT.O', 'TSLA.O']
+
+ek = OfflineEikon(OfflineData('csv'), latency=LATENCY, error_rate=ERROR_RATE)
+groups = history_field_groups('2020-01-01', '2022-12-31')
+
+
+def query(i):
+    start_time = time.perf_counter()
+    rows = 0
+    try:
+        for fields, parameters in groups.values():
+            df, err = ek.get_data(['IVV', ASSETS[i % len(ASSETS)]], fields,
+                                  parameters)
+            rows += df.shape[0]
+    except OfflineError:
+        rows = -1
+    return time.perf_counter() - start_time, rows
+
+
+print('{:>11} {:>9} {:>10} {:>9} {:>9} {:>7}'.format(
+    'concurrency', 'queries/s', 'rows/s', 'p50 (s)', 'p95 (s)', 'errors'
+))
+for concurrency in [1, 10, 100, 1000]:
+    n_queries = min(N_QUERIES, 20 * concurrency)
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(query, range(n_queries)))
+    seconds = time.perf_counter() - start_time
+
+    latency = np.array([r[0] for r in results])
+    rows = np.array([r[1] for r in results])
+    print('{:11d} {:9.1f} {:10.0f} {:9.3f} {:9.3f} {:7d}'.format(
+        concurrency, n_queries / seconds, rows[rows > 0].sum() / seconds,
+        np.median(latency), np.percentile(latency, 95), (rows < 0).sum()
+    ))
@@ -0,0 +1,90 @@
+# bench_orderbook.py
+#  - time & memory of building a blotter of 1M orders in an OrderBook,
+#    against the one-DataFrame-per-status + pd.concat + sort_values way the
+#    W4 app used to assemble it
+#  - each order is submitted, then ~70% fill, ~25% are cancelled (and
+#    replaced by a filled market order) and the rest stay LIVE
+#  - run from the repo root:  PYTHONPATH=. python benchmarks/bench_orderbook.py
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from algo.orderbook import OrderBook
+
+N_ORDERS = 1_000_000
+N_ASSETS = 200
+
+rng = np.random.default_rng(0)
+trade_id = np.arange(N_ORDERS)
+asset = np.array(['SYN{:05d}'.format(i) for i in range(N_ASSETS)],
+                 dtype=object)[rng.integers(0, N_ASSETS, N_ORDERS)]
+submit_date = np.datetime64('2000-01-03') + rng.integers(0, 8000, N_ORDERS)
+event_date = submit_date + rng.integers(0, 5, N_ORDERS)
+price = rng.uniform(20, 400, N_ORDERS)
+outcome = rng.choice(3, N_ORDERS, p=[0.7, 0.25, 0.05])
+filled, cancelled, live = outcome == 0, outcome == 1, outcome == 2
+live_date = np.datetime64('2022-01-03')
+
+
+def with_book():
+    book = OrderBook()
+    ids = book.submit(trade_id, submit_date, asset, 'ENTER', 'BUY', 'LMT',
+                      price)
+    book.transition(ids[cancelled], event_date[cancelled], 'CANCELLED')
+    book.transition(ids[filled], event_date[filled], 'FILLED')
+    book.transition(ids[live], live_date, 'LIVE')
+    market = book.submit(trade_id[cancelled], event_date[cancelled],
+                         asset[cancelled], 'ENTER', 'BUY', 'MKT',
+                         price[cancelled])
+    book.transition(market, event_date[cancelled], 'FILLED')
+    return book.sorted(['trade_id', 'date'])
+
+
+def with_frames():
+    submitted = pd.DataFrame({
+        'trade_id': trade_id, 'date': submit_date.astype(object),
+        'asset': asset, 'trip': 'ENTER', 'action': 'BUY', 'type': 'LMT',
+        'price': price, 'status': 'SUBMITTED'
+    })
+    parts = [submitted]
+    for mask, status, date in [(cancelled, 'CANCELLED', event_date),
+                               (filled, 'FILLED', event_date),
+                               (live, 'LIVE', None)]:
+        part = submitted[mask].copy()
+        part['status'] = status
+        part['date'] = live_date.astype(object) if date is None \
+            else date[mask].astype(object)
+        parts.append(part)
+    market = submitted[cancelled].copy()
+    market['type'] = 'MKT'
+    market['date'] = event_date[cancelled].astype(object)
+    parts += [market, market.assign(status='FILLED')]
+    return pd.concat(parts).sort_values(['trade_id', 'date'])
+
+
+def timed(f, *args):
+    start_time = time.perf_counter()
+    result = f(*args)
+    return result, time.perf_counter() - start_time
+
+
+book, book_time = timed(with_book)
+frame, frame_time = timed(with_frames)
+assert len(book) == frame.shape[0]
+_, page_time = timed(book.records, 500_000, 500_025)
+_, to_frame_time = timed(book.to_frame)
+
+frame_bytes = frame.memory_usage(deep=True).sum()
+print('{:,} orders -> {:,} blotter rows'.format(N_ORDERS, len(book)))
+print('{:<22} {:>10} {:>12}'.format('', 'build (s)', 'memory (MB)'))
+print('{:<22} {:10.3f} {:12.1f}'.format(
+    'OrderBook', book_time, book.nbytes / 2**20
+))
+print('{:<22} {:10.3f} {:12.1f}'.format(
+    'DataFrames + concat', frame_time, frame_bytes / 2**20
+))
+print('one 25-row page: {:.4f} s; whole book to DataFrame: {:.3f} s'.format(
+    page_time, to_frame_time
+))
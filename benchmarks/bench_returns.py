@@ -0,0 +1,91 @@
+# bench_returns.py
+#  - returns_frame (shifted arrays + scatter to wide) against the apps' old
+#    groupby head/tail + pivot_table, up to 5,000 instruments x 20 years
+#  - the old way is only timed on the smaller universes; at full size it
+#    needs several times this machine's memory
+#  - run from the repo root:  PYTHONPATH=. python benchmarks/bench_returns.py
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from algo.returns import log_returns, returns_frame
+
+N_DAYS = 252 * 20
+
+
+def history(n_instruments, n_days, seed=0):
+    # closes only, with a categorical Instrument column so that 25M rows fit
+    # in memory; a dividend every ~quarter and the odd 2:1 split
+    rng = np.random.default_rng(seed)
+    shape = (n_instruments, n_days)
+    close = rng.uniform(20, 400, size=(n_instruments, 1)) * np.exp(
+        np.cumsum(rng.normal(0, 0.015, shape), axis=1)
+    )
+    div_amt = np.where(rng.random(shape) < 1 / 63, close * 0.005, 0.0)
+    split_rto = np.where(rng.random(shape) < 1 / 5000, 2.0, 1.0)
+    names = ['SYN{:05d}'.format(i) for i in range(n_instruments)]
+    return pd.DataFrame({
+        'Instrument': pd.Categorical.from_codes(
+            np.repeat(np.arange(n_instruments), n_days), names
+        ),
+        'Date': np.tile(
+            pd.bdate_range('2004-01-02', periods=n_days).to_numpy(),
+            n_instruments
+        ),
+        'close': close.ravel(),
+        'div_amt': div_amt.ravel(),
+        'split_rto': split_rto.ravel()
+    })
+
+
+def groupby_pivot(df):
+    # calculate_returns as it was in W3/app.py & W3/app_prof.py
+    df = df.sort_values(['Instrument', 'Date']).groupby('Instrument',
+                                                        observed=True)
+    numerator = df[['Date', 'Instrument', 'close', 'div_amt']].tail(-1)
+    denominator = df[['close', 'split_rto']].head(-1)
+    return pd.DataFrame({
+        'Date': numerator['Date'].reset_index(drop=True),
+        'Instrument': numerator['Instrument'].astype(str).reset_index(drop=True),
+        'rtn': np.log(
+            (numerator['close'] + numerator['div_amt']).reset_index(drop=True) / (
+                denominator['close'] * denominator['split_rto']
+            ).reset_index(drop=True)
+        )
+    }).pivot_table(values='rtn', index='Date', columns='Instrument')
+
+
+def timed(f, *args, **kwargs):
+    start_time = time.perf_counter()
+    result = f(*args, **kwargs)
+    return result, time.perf_counter() - start_time
+
+
+print("{:>11} {:>10} {:>10} {:>10} {:>10} {:>14}".format(
+    'instruments', 'rows', 'arrays (s)', 'long (s)', 'wide (s)',
+    'groupby+pivot'
+))
+for n_instruments in [100, 1000, 5000]:
+    df = history(n_instruments, N_DAYS)
+
+    _, array_time = timed(
+        log_returns, df['Instrument'].cat.codes.to_numpy(),
+        df['close'].to_numpy(), df['div_amt'].to_numpy(),
+        df['split_rto'].to_numpy()
+    )
+    _, long_time = timed(returns_frame, df, wide=False)
+    wide, wide_time = timed(returns_frame, df)
+
+    if n_instruments <= 1000:
+        old, old_time = timed(groupby_pivot, df)
+        assert np.allclose(old.to_numpy(), wide.to_numpy(), equal_nan=True)
+        old_time = '{:14.3f}'.format(old_time)
+    else:
+        old_time = '{:>14}'.format('-')
+
+    print("{:11d} {:10d} {:10.3f} {:10.3f} {:10.3f} {}".format(
+        n_instruments, df.shape[0], array_time, long_time, wide_time, old_time
+    ))
+    del df, wide
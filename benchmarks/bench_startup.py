@@ -0,0 +1,123 @@
+# bench_startup.py
+#  - cold-start time of each Dash app entry point, in a fresh interpreter
+#    per run, under each APP_WARMUP mode (see algo/warmup.py):
+#      process   python starting, importing the app & exiting
+#      import    running the app module (what a worker pays before it can
+#                answer /_health)
+#      ready     until its warm-up tasks are done (/_ready returns 200)
+#      loaded    until every task is loaded, using them if nothing else has
+#  - eager is the old behaviour: everything loads during import
+#  - runs against the offline Refinitiv stand-in unless --online is given
+#
+# Run from the repo root:
+#   PYTHONPATH=. python benchmarks/bench_startup.py
+#   PYTHONPATH=. python benchmarks/bench_startup.py --imports   # + slowest
+#                                                               #   imports
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ENTRY_POINTS = ['W3/app.py', 'W3/app_prof.py', 'W4/HW2/app_refactor_v1.py']
+MODES = ['eager', 'background', 'lazy']
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, runpy, sys, time
+start_time = time.perf_counter()
+try:
+    ns = runpy.run_path(sys.argv[1], run_name='startup_bench')
+except Exception as error:
+    print(json.dumps({'error': '{}: {}'.format(type(error).__name__, error)}))
+    sys.exit()
+out = {'import': time.perf_counter() - start_time}
+warmup = ns.get('warmup')
+if warmup is not None:
+    warmup.wait()
+out['ready'] = time.perf_counter() - start_time
+if warmup is not None:
+    for task in warmup.tasks.values():
+        task.get()
+out['loaded'] = time.perf_counter() - start_time
+print(json.dumps(out))
+'''
+
+
+def run_once(entry_point, mode, env):
+    env = dict(env, APP_WARMUP=mode)
+    start_time = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-c', CHILD, entry_point], cwd=REPO_ROOT, env=env,
+        capture_output=True, text=True
+    )
+    seconds = time.perf_counter() - start_time
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode or not lines:
+        return {'error': ''.join(proc.stderr.strip().splitlines()[-1:])}
+    out = json.loads(lines[-1])
+    out['process'] = seconds
+    return out
+
+
+def slowest_imports(entry_point, env, top=10):
+    # cumulative self+children microseconds per top-level import
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD, entry_point],
+        cwd=REPO_ROOT, env=dict(env, APP_WARMUP='eager'),
+        capture_output=True, text=True
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name[1:].startswith(' '):  # top level only
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='median of this many runs')
+    parser.add_argument('--online', action='store_true',
+                        help='use the real eikon / refinitiv.data SDKs')
+    parser.add_argument('--imports', action='store_true',
+                        help='also list the slowest imports of each app')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [REPO_ROOT] + [p for p in [env.get('PYTHONPATH')] if p]
+    )
+    if not args.online:
+        env.setdefault('REFINITIV_OFFLINE', 'csv')
+
+    print('{:<28} {:<11} {:>8} {:>8} {:>8} {:>8}'.format(
+        'entry point', 'mode', 'process', 'import', 'ready', 'loaded'
+    ))
+    for entry_point in ENTRY_POINTS:
+        failed = False
+        for mode in MODES:
+            runs = [run_once(entry_point, mode, env)
+                    for _ in range(args.repeat)]
+            if any('error' in run for run in runs):
+                error = next(run['error'] for run in runs if 'error' in run)
+                print('{:<28} {:<11} failed: {}'.format(
+                    entry_point, mode, error
+                ))
+                failed = True
+                break
+            print('{:<28} {:<11} {:8.3f} {:8.3f} {:8.3f} {:8.3f}'.format(
+                entry_point, mode,
+                *[np.median([run[key] for run in runs])
+                  for key in ['process', 'import', 'ready', 'loaded']]
+            ))
+        if args.imports and not failed:
+            for cumulative, name in slowest_imports(entry_point, env):
+                print('    {:8.3f}s  {}'.format(cumulative / 1e6, name))
@@ -0,0 +1,145 @@
+# bench_timeseries_dump.py
+#  - peak memory & time of turning a get_timeseries() dump (two-row
+#    instrument x field header, one column per instrument & field) into the
+#    long Instrument / Date format:
+#      whole    pd.read_csv(header=[0, 1]) of the whole file, then stack()
+#      chunked  algo/timeseries_dump.iter_long, CHUNK_CELLS values at a time
+#  - dumps are written from seeded synthetic histories (algo/synthetic.py);
+#    each measurement runs in a fresh interpreter, peak memory is its max
+#    RSS above what importing pandas costs (Unix only: resource module)
+#
+# Run from the repo root:
+#   PYTHONPATH=. python benchmarks/bench_timeseries_dump.py
+#   PYTHONPATH=. python benchmarks/bench_timeseries_dump.py --sizes 10x2500
+
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from algo.synthetic import synthetic_history
+
+# instruments x days
+SIZES = ['10x2500', '200x5000', '200x20000', '1000x5000']
+FIELDS = ['HIGH', 'CLOSE', 'LOW', 'OPEN', 'COUNT', 'VOLUME']
+WRITE_ROWS = 500
+
+CHILD = r'''
+import json, resource, sys, time
+import numpy as np
+import pandas as pd
+from algo.timeseries_dump import iter_long, LONG_COLUMNS
+
+def max_rss_mb():
+    # kilobytes on Linux, bytes on macOS
+    scale = 2**20 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+baseline = max_rss_mb()
+start_time = time.perf_counter()
+rows = 0
+if sys.argv[2] == 'whole':
+    wide = pd.read_csv(sys.argv[1], header=[0, 1], index_col=0,
+                       parse_dates=True)
+    wide.index.name = 'Date'
+    long = wide.stack(level=0, future_stack=True)
+    long.index.names = ['Date', 'Instrument']
+    long = long.reset_index().rename(columns=str.lower)
+    long = long.rename(columns={'date': 'Date', 'instrument': 'Instrument'})
+    long = long.dropna(subset=['open', 'high', 'low', 'close'], how='all')
+    rows = long[LONG_COLUMNS].shape[0]
+else:
+    for chunk in iter_long(sys.argv[1], int(sys.argv[3]) or None):
+        rows += chunk.shape[0]
+print(json.dumps({'seconds': time.perf_counter() - start_time,
+                  'peak_mb': max_rss_mb() - baseline, 'rows': rows}))
+'''
+
+
+def write_dump(path, n_instruments, n_days):
+    # the layout ek.get_timeseries(...).to_csv() produces, written a block
+    # of dates at a time
+    history = synthetic_history(n_instruments, n_days)
+    rics = history['Instrument'].unique()
+    shape = (n_instruments, n_days)
+    columns = {
+        'HIGH': history['high'], 'CLOSE': history['close'],
+        'LOW': history['low'], 'OPEN': history['open']
+    }
+    rng = np.random.default_rng(0)
+    # (days, instruments, fields)
+    values = np.stack(
+        [columns[f].to_numpy().reshape(shape) if f in columns
+         else rng.integers(1_000, 10_000_000, shape).astype(float)
+         for f in FIELDS], axis=-1
+    ).transpose(1, 0, 2).reshape(n_days, -1)
+    dates = np.datetime_as_string(
+        history['Date'].to_numpy()[:n_days].astype('datetime64[D]')
+    )
+    with open(path, 'w') as f:
+        f.write(',' + ','.join(r for r in rics for _ in FIELDS) + '\n')
+        f.write(',' + ','.join(FIELDS * n_instruments) + '\n')
+        f.write('Date' + ',' * (n_instruments * len(FIELDS)) + '\n')
+        for lo in range(0, n_days, WRITE_ROWS):
+            block = values[lo:lo + WRITE_ROWS]
+            f.write(''.join(
+                day + ',' + ','.join(map(repr, row.tolist())) + '\n'
+                for day, row in zip(dates[lo:lo + WRITE_ROWS], block)
+            ))
+
+
+def measure(path, how, chunk_rows, env):
+    proc = subprocess.run(
+        [sys.executable, '-c', CHILD, path, how, str(chunk_rows)],
+        env=env, capture_output=True, text=True
+    )
+    if proc.returncode:
+        return {'error': ''.join(proc.stderr.strip().splitlines()[-1:])}
+    return json.loads(proc.stdout)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', nargs='+', default=SIZES,
+                        help='instruments x days, e.g. 200x5000')
+    parser.add_argument('--chunk-rows', type=int, default=0,
+                        help='dates per chunk for the chunked reader '
+                             '(default: as many as fit CHUNK_CELLS)')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+        + [p for p in [env.get('PYTHONPATH')] if p]
+    )
+    print('{:>10} {:>9} {:>10} {:>8} {:>10} {:>12}'.format(
+        'size', 'file (MB)', 'long rows', 'reader', 'seconds', 'peak (MB)'
+    ))
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            n_instruments, n_days = map(int, size.split('x'))
+            path = os.path.join(tmp, 'get_timeseries_output.csv')
+            # in its own process: a child's max RSS starts at its
+            # parent's, which shouldn't include the synthetic history
+            writer = multiprocessing.get_context('spawn').Process(
+                target=write_dump, args=(path, n_instruments, n_days)
+            )
+            writer.start()
+            writer.join()
+            file_mb = os.path.getsize(path) / 2**20
+            for how in ['whole', 'chunked']:
+                out = measure(path, how, args.chunk_rows, env)
+                if 'error' in out:
+                    print('{:>10} {:9.1f} {:>10} {:>8} failed: {}'.format(
+                        size, file_mb, '', how, out['error']
+                    ))
+                    continue
+                print('{:>10} {:9.1f} {:10d} {:>8} {:10.2f} {:12.1f}'.format(
+                    size, file_mb, out['rows'], how, out['seconds'],
+                    out['peak_mb']
+                ))
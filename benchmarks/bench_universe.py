@@ -0,0 +1,47 @@
+# bench_universe.py
+#  - how build_universe_blotter's runtime grows with the number of tickers,
+#    against running the single-asset entry/exit tables once per ticker
+#  - run from the repo root:  PYTHONPATH=. python benchmarks/bench_universe.py
+
+import time
+
+from algo.batch import build_universe_blotter
+from algo.fills import build_entry_orders, build_exit_orders
+from algo.synthetic import synthetic_history
+from algo.trading_calendar import TradingCalendar
+
+N_DAYS = 1500  # ~6 years of daily bars, like unadjusted_price_history.csv
+alpha1, n1, alpha2, n2 = -0.01, 3, 0.01, 5
+usa_calendar = TradingCalendar()
+
+
+def per_ticker(history):
+    for asset, prices in history.groupby('Instrument'):
+        prices = prices.rename(columns={
+            'low': 'Low Price', 'high': 'High Price', 'close': 'Close Price'
+        }).reset_index(drop=True)
+        nbd = usa_calendar.next_business_day(prices['Date'].iloc[-1]).item()
+        entry = build_entry_orders(prices, asset, alpha1, n1, nbd)
+        build_exit_orders(prices, entry, asset, alpha2, n2, nbd)
+
+
+print("{:>8} {:>10} {:>12} {:>14}".format(
+    'tickers', 'rows', 'batch (s)', 'per-ticker (s)'
+))
+for n_tickers in [1, 10, 100, 500, 1000]:
+    history = synthetic_history(n_tickers, N_DAYS)
+
+    start_time = time.perf_counter()
+    build_universe_blotter(history, alpha1, n1, alpha2, n2)
+    batch_time = time.perf_counter() - start_time
+
+    if n_tickers <= 100:
+        start_time = time.perf_counter()
+        per_ticker(history)
+        loop_time = '{:14.3f}'.format(time.perf_counter() - start_time)
+    else:
+        loop_time = '{:>14}'.format('-')
+
+    print("{:8d} {:10d} {:12.3f} {}".format(
+        n_tickers, history.shape[0], batch_time, loop_time
+    ))
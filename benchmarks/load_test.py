@@ -0,0 +1,287 @@
+# load_test.py
+#  - local load test of an app's main callbacks: each one is sent the
+#    request the Dash front end sends for it (POST /_dash-update-component)
+#    by --concurrency client threads for --seconds, and its requests/s,
+#    p50 / p99 latency and errors are reported
+#  - the callbacks are tested in the order the page chains them; the tokens
+#    a callback needs come from running the callbacks before it once, just
+#    before its turn (the load on those may have evicted older tokens from
+#    the app's DataStore)
+#  - starts the app under algo/serve.py (offline Refinitiv data unless
+#    --online) and waits for /_ready, or tests a running server at --url
+#  - W3/app.py ships whole tables through the browser instead of tokens;
+#    load-test its token-based version, W3/app_prof.py
+#
+# Run from the repo root:
+#   PYTHONPATH=. python benchmarks/load_test.py
+#   PYTHONPATH=. python benchmarks/load_test.py W3/app_prof.py --workers 4
+#   PYTHONPATH=. python benchmarks/load_test.py --url http://127.0.0.1:8050
+
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASSETS = ['AAPL.O', 'MSFT.O', 'GLD', 'SHY.O', 'TSLA.O']
+START_DATE, END_DATE = '2020-01-02', '2023-12-29'
+PAGE_SIZE = 25
+
+
+def dash_request(outputs, inputs, state=(), changed=None):
+    """Body of a /_dash-update-component request. outputs are (id, prop),
+    inputs & state (id, prop, value) in the callback's order; `changed` is
+    the "id.prop" that triggered it (default: the first input)."""
+    def spec(id_, prop):
+        return {'id': id_, 'property': prop}
+
+    if len(outputs) == 1:
+        output = '{}.{}'.format(*outputs[0])
+        output_specs = spec(*outputs[0])
+    else:
+        output = '..' + '...'.join('{}.{}'.format(*o) for o in outputs) + '..'
+        output_specs = [spec(*o) for o in outputs]
+    return {
+        'output': output,
+        'outputs': output_specs,
+        'inputs': [dict(spec(i, p), value=v) for i, p, v in inputs],
+        'state': [dict(spec(i, p), value=v) for i, p, v in state],
+        'changedPropIds': [changed or '{}.{}'.format(*inputs[0][:2])]
+    }
+
+
+# per app: [(callback, request(ctx, i), what to keep of its response)];
+# ctx holds the tokens kept so far, i counts the requests
+SCENARIOS = {
+    'W4/HW2/app_refactor_v1.py': [
+        ('query_refinitiv', lambda ctx, i: dash_request(
+            [('history-token', 'data')],
+            [('run-query', 'n_clicks', i + 1)],
+            [('asset', 'value', ASSETS[i % len(ASSETS)]),
+             ('refinitiv-date-range', 'start_date', START_DATE),
+             ('refinitiv-date-range', 'end_date', END_DATE)]
+         ), {'history': ('history-token', 'data')}),
+        ('get_entry_tbl', lambda ctx, i: dash_request(
+            [('entry-token', 'data')],
+            [('run-query', 'n_clicks', 1),
+             ('history-token', 'data', ctx['history']),
+             ('n1', 'value', 3), ('alpha1', 'value', -0.01)],
+            [('asset', 'value', ASSETS[0])], 'history-token.data'
+         ), {'entry': ('entry-token', 'data')}),
+        ('get_exit_tbl', lambda ctx, i: dash_request(
+            [('exit-token', 'data')],
+            [('run-query', 'n_clicks', 1),
+             ('entry-token', 'data', ctx['entry']),
+             ('history-token', 'data', ctx['history']),
+             ('n2', 'value', 5), ('alpha2', 'value', 0.01)],
+            [('asset', 'value', ASSETS[0])], 'entry-token.data'
+         ), {'exit': ('exit-token', 'data')}),
+        ('get_blotter', lambda ctx, i: dash_request(
+            [('blotter-token', 'data')],
+            [('run-query', 'n_clicks', 1),
+             ('entry-token', 'data', ctx['entry']),
+             ('exit-token', 'data', ctx['exit'])],
+            changed='exit-token.data'
+         ), {'blotter': ('blotter-token', 'data')}),
+        ('render_blotter', lambda ctx, i: dash_request(
+            [('blotter', 'data'), ('blotter', 'columns'),
+             ('blotter', 'page_count')],
+            [('blotter-token', 'data', ctx['blotter']),
+             ('blotter', 'page_current', i % 4),
+             ('blotter', 'page_size', PAGE_SIZE)]
+         ), {}),
+    ],
+    'W3/app_prof.py': [
+        ('query_refinitiv', lambda ctx, i: dash_request(
+            [('history-token', 'data')],
+            [('run-query', 'n_clicks', i + 1)],
+            [('benchmark-id', 'value', 'IVV'),
+             ('asset-id', 'value', ASSETS[i % len(ASSETS)]),
+             ('refinitiv-date-range', 'start_date', START_DATE),
+             ('refinitiv-date-range', 'end_date', END_DATE)]
+         ), {'history': ('history-token', 'data')}),
+        ('calculate_returns', lambda ctx, i: dash_request(
+            [('returns-token', 'data'), ('returns-tbl', 'columns'),
+             ('ab-range-slider', 'min'), ('ab-range-slider', 'max'),
+             ('ab-range-slider', 'value')],
+            [('history-token', 'data', ctx['history'])]
+         ), {'returns': ('returns-token', 'data'),
+             'slider': ('ab-range-slider', 'value')}),
+        ('render_returns_tbl', lambda ctx, i: dash_request(
+            [('returns-tbl', 'data'), ('returns-tbl', 'page_count')],
+            [('returns-token', 'data', ctx['returns']),
+             ('returns-tbl', 'page_current', i % 4),
+             ('returns-tbl', 'page_size', PAGE_SIZE)]
+         ), {}),
+        ('render_ab_plot', lambda ctx, i: dash_request(
+            [('ab-plot', 'figure')],
+            [('returns-token', 'data', ctx['returns']),
+             ('ab-range-slider', 'value', ctx['slider'])],
+            [('benchmark-id', 'value', 'IVV'),
+             ('asset-id', 'value', ASSETS[0])]
+         ), {}),
+    ],
+}
+
+
+class Client:
+    """One keep-alive HTTP connection posting Dash callback requests."""
+
+    def __init__(self, url):
+        parts = urllib.parse.urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.conn = None
+
+    def post(self, body):
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(
+                self.host, self.port, timeout=60
+            )
+        try:
+            self.conn.request(
+                'POST', '/_dash-update-component', json.dumps(body),
+                {'Content-Type': 'application/json'}
+            )
+            response = self.conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            raise
+        if response.status != 200:
+            raise RuntimeError('HTTP {}: {}'.format(
+                response.status, data[:200].decode(errors='replace')
+            ))
+        return json.loads(data)
+
+
+def run_chain(url, steps):
+    # one request per callback, keeping the tokens the next ones need
+    ctx = {}
+    client = Client(url)
+    for name, request, keep in steps:
+        response = client.post(request(ctx, 0))['response']
+        for key, (id_, prop) in keep.items():
+            ctx[key] = response[id_][prop]
+    return ctx
+
+
+def load(url, request, ctx, concurrency, seconds):
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    deadline = time.perf_counter() + seconds
+
+    def client_thread(k):
+        client = Client(url)
+        i = k
+        while time.perf_counter() < deadline:
+            start_time = time.perf_counter()
+            try:
+                client.post(request(ctx, i))
+                latencies[k].append(time.perf_counter() - start_time)
+            except Exception:
+                errors[k] += 1
+            i += concurrency
+
+    start_time = time.perf_counter()
+    threads = [threading.Thread(target=client_thread, args=(k,))
+               for k in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+    latencies = np.concatenate([np.array(lat) for lat in latencies])
+    return latencies, sum(errors), elapsed
+
+
+def spawn_server(app, port, workers, threads, online):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [REPO_ROOT] + [p for p in [env.get('PYTHONPATH')] if p]
+    )
+    if not online:
+        env.setdefault('REFINITIV_OFFLINE', 'csv')
+    cmd = [sys.executable, '-m', 'algo.serve', app, '--host', '127.0.0.1',
+           '--port', str(port)]
+    if workers:
+        cmd += ['--workers', str(workers)]
+    if threads:
+        cmd += ['--threads', str(threads)]
+    return subprocess.Popen(cmd, cwd=REPO_ROOT, env=env)
+
+
+def wait_ready(url, server, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise SystemExit('the server exited')
+        try:
+            with urllib.request.urlopen(url + '/_ready', timeout=5):
+                return
+        except OSError:
+            time.sleep(0.25)
+    raise SystemExit('the server was not ready after {}s'.format(timeout))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('app', nargs='?', default='W4/HW2/app_refactor_v1.py',
+                        choices=sorted(SCENARIOS))
+    parser.add_argument('--url',
+                        help='test this running server instead of starting '
+                             'the app with algo/serve.py')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--workers', type=int,
+                        help='algo/serve.py workers (default: one per CPU)')
+    parser.add_argument('--threads', type=int,
+                        help='algo/serve.py threads per worker')
+    parser.add_argument('--concurrency', type=int, default=16,
+                        help='client threads')
+    parser.add_argument('--seconds', type=float, default=10,
+                        help='per callback')
+    parser.add_argument('--online', action='store_true',
+                        help='let the server use the real Refinitiv SDKs')
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        url = 'http://127.0.0.1:{}'.format(args.port)
+        server = spawn_server(args.app, args.port, args.workers, args.threads,
+                              args.online)
+    try:
+        wait_ready(url, server)
+        steps = SCENARIOS[args.app]
+        print('{} at {}, {} clients, {:g}s per callback'.format(
+            args.app, url, args.concurrency, args.seconds
+        ))
+        print('{:<20} {:>8} {:>10} {:>9} {:>9} {:>9} {:>7}'.format(
+            'callback', 'requests', 'requests/s', 'p50 (ms)', 'p99 (ms)',
+            'max (ms)', 'errors'
+        ))
+        for k, (name, request, _) in enumerate(steps):
+            ctx = run_chain(url, steps[:k])
+            latencies, errors, elapsed = load(
+                url, request, ctx, args.concurrency, args.seconds
+            )
+            if not latencies.size:
+                print('{:<20} failed: {} errors'.format(name, errors))
+                continue
+            print('{:<20} {:8d} {:10.1f} {:9.1f} {:9.1f} {:9.1f} {:7d}'.format(
+                name, latencies.size, latencies.size / elapsed,
+                *[1e3 * q for q in np.percentile(latencies, [50, 99])],
+                1e3 * latencies.max(), errors
+            ))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
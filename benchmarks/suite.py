@@ -0,0 +1,169 @@
+# suite.py
+#  - offline benchmark of the strategy & analytics code on seeded synthetic
+#    histories (algo/synthetic.py) of 1K, 100K and 10M daily bars:
+#      entry_exit  limit entry / exit fills & blotter (build_universe_blotter)
+#      returns     split- & dividend-adjusted log returns, wide table
+#      alpha_beta  every instrument vs. the first: one full-window fit
+#                  (universe_alpha_beta) plus 252-day rolling alpha & beta
+#  - every run is compared with the last recorded run of the same size on
+#    this machine; with --record it is appended to benchmarks/results.csv,
+#    with the commit it ran on (the file is tracked: record the runs worth
+#    keeping, not every one)
+#
+# Run from the repo root:
+#   PYTHONPATH=. python benchmarks/suite.py               # all sizes
+#   PYTHONPATH=. python benchmarks/suite.py --sizes 1k 100k --repeat 5
+#   PYTHONPATH=. python benchmarks/suite.py --record
+
+import argparse
+import csv
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from algo.alphabeta import AlphaBeta, universe_alpha_beta
+from algo.batch import build_universe_blotter
+from algo.returns import returns_frame
+from algo.synthetic import synthetic_history
+
+# bars -> (instruments, days); histories end in 2024 so the trading
+# calendar covers them
+SIZES = {
+    '1k': (1, 1_000),
+    '100k': (40, 2_500),
+    '10m': (2_000, 5_000)
+}
+END_DATE = '2024-12-31'
+alpha1, n1, alpha2, n2 = -0.01, 3, 0.01, 5
+# instruments per build_universe_blotter call; bounds memory at 10M bars
+CHUNK_ROWS = 1_000_000
+
+RESULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       'results.csv')
+FIELDS = [
+    'run_at', 'commit', 'machine', 'python', 'numpy', 'pandas', 'size',
+    'bars', 'stage', 'seconds'
+]
+
+
+def entry_exit(history):
+    # synthetic histories are instrument-contiguous, so chunks are row ranges
+    instrument = history['Instrument'].to_numpy()
+    first = np.flatnonzero(np.r_[True, instrument[1:] != instrument[:-1]])
+    per_chunk = max(1, CHUNK_ROWS * len(first) // history.shape[0])
+    bounds = np.r_[first[::per_chunk], history.shape[0]]
+    n_orders = 0
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        n_orders += build_universe_blotter(
+            history.iloc[lo:hi], alpha1, n1, alpha2, n2
+        ).shape[0]
+    return n_orders
+
+
+def alpha_beta(returns):
+    benchmark = returns.columns[0]
+    universe_alpha_beta(returns, benchmark)
+    if returns.shape[1] > 1:
+        AlphaBeta(
+            returns[benchmark].to_numpy(),
+            returns[returns.columns[1:]].to_numpy()
+        ).rolling(252)
+
+
+def best_of(repeat, f, *args):
+    seconds = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = f(*args)
+        seconds.append(time.perf_counter() - start_time)
+    return result, min(seconds)
+
+
+def run(size, repeat):
+    n_instruments, n_days = SIZES[size]
+    start = pd.bdate_range(end=END_DATE, periods=n_days)[0]
+    history = synthetic_history(n_instruments, n_days, start=start, seed=533)
+
+    timings = {}
+    _, timings['entry_exit'] = best_of(repeat, entry_exit, history)
+    returns, timings['returns'] = best_of(repeat, returns_frame, history)
+    _, timings['alpha_beta'] = best_of(repeat, alpha_beta, returns)
+    return history.shape[0], timings
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def previous_runs(machine):
+    # last recorded seconds for each (size, stage) on this machine
+    last = {}
+    if os.path.exists(RESULTS):
+        with open(RESULTS, newline='') as f:
+            for row in csv.DictReader(f):
+                if row['machine'] == machine:
+                    last[row['size'], row['stage']] = row
+    return last
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', nargs='+', default=list(SIZES),
+                        choices=list(SIZES))
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='best of this many runs (10m runs once)')
+    parser.add_argument('--record', action='store_true',
+                        help='append this run to results.csv')
+    args = parser.parse_args()
+
+    machine = '{} {} ({} cpus)'.format(
+        platform.system(), platform.machine(), os.cpu_count()
+    )
+    previous = previous_runs(machine)
+    common = {
+        'run_at': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'machine': machine,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__
+    }
+
+    rows = []
+    print('{:>5} {:>11} {:<11} {:>10} {:>10} {:>8}'.format(
+        'size', 'bars', 'stage', 'seconds', 'previous', 'change'
+    ))
+    for size in args.sizes:
+        bars, timings = run(size, 1 if size == '10m' else args.repeat)
+        for stage, seconds in timings.items():
+            before = previous.get((size, stage))
+            if before:
+                was = float(before['seconds'])
+                change = '{:+7.1%}'.format(seconds / was - 1)
+                was = '{:10.4f}'.format(was)
+            else:
+                was, change = '{:>10}'.format('-'), '{:>8}'.format('-')
+            print('{:>5} {:11,d} {:<11} {:10.4f} {} {}'.format(
+                size, bars, stage, seconds, was, change
+            ))
+            rows.append(dict(common, size=size, bars=bars, stage=stage,
+                             seconds='{:.6f}'.format(seconds)))
+
+    if args.record:
+        new_file = not os.path.exists(RESULTS)
+        with open(RESULTS, 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS, lineterminator='\n')
+            if new_file:
+                writer.writeheader()
+            writer.writerows(rows)
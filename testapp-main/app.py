@@ -1,12 +1,22 @@
 from dash import *
 from testapp import *
+import os
 
 app = Dash(__name__)
 server = app.server
-app.layout = html.Div([
-    github_info_header(),
-    html.Img(src="assets/burb.jpeg")
-])
+
+# set WATCH_GIT_HEAD=<seconds> to pick up a git pull without restarting
+if os.getenv('WATCH_GIT_HEAD'):
+    build_info.watch(float(os.getenv('WATCH_GIT_HEAD')))
+
+# a function, so each page load shows the current build info (from memory)
+def serve_layout():
+    return html.Div([
+        github_info_header(),
+        html.Img(src="assets/burb.jpeg")
+    ])
+
+app.layout = serve_layout
 
 if __name__ == '__main__':
     app.run_server(debug=True)
@@ -2,6 +2,7 @@
 #   https://towardsdatascience.com/deep-dive-create-and-publish-your-first-python-library-f7f618719e14
 # Always prefer setuptools over distutils
 from setuptools import setup, find_packages
+from setuptools.command.build_py import build_py
 
 # To use a consistent encoding
 from codecs import open
@@ -14,6 +15,22 @@ HERE = path.abspath(path.dirname(__file__))
 with open(path.join(HERE, 'README.md'), encoding='utf-8') as f:
     long_description = f.read()
 
+
+# Record the commit being packaged in testapp/build_info.json, for installs
+# that have no git checkout to read it from
+class build_py_with_info(build_py):
+    def run(self):
+        super().run()
+        from runpy import run_path
+        write_build_info = run_path(
+            path.join(HERE, 'testapp', 'build_info.py')
+        )['write_build_info']
+        target = path.join(self.build_lib, 'testapp', 'build_info.json')
+        try:
+            write_build_info(target, HERE)
+        except Exception as error:
+            print('warning: no build info written ({0})'.format(error))
+
 # This call to setup() does all the work
 setup(
     name="testapp",
@@ -35,5 +52,6 @@ setup(
     ],
     packages=["testapp"],
     include_package_data=True,
+    cmdclass={'build_py': build_py_with_info},
     install_requires=["numpy", "pandas", "dash", "waitress"]
 )
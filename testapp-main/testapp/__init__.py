@@ -1,2 +1,3 @@
 # App modules
+from testapp.build_info import build_info
 from testapp.github_info_header import github_info_header
@@ -0,0 +1,113 @@
+# Build info for the app's header: the checked-out branch & commit, read
+# from git once and then served from memory. Installs without a git
+# checkout use build_info.json, written next to this file when the
+# package is built (see setup.py) or by running:
+#   python -m testapp.build_info
+import json
+import os
+import threading
+import time
+
+BUILD_INFO_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'build_info.json'
+)
+
+
+def read_git_info(path=None):
+    # returns (info, the repo's .git directory)
+    from git import Repo
+    repo = Repo(path or os.getcwd(), search_parent_directories=True)
+    commit = repo.head.commit
+    try:
+        ref = repo.head.ref.path
+    except TypeError:  # detached HEAD
+        ref = 'HEAD'
+    info = {
+        'ref': ref,
+        'sha': commit.hexsha,
+        'message': commit.message,
+        'author': commit.author.name,
+        'committed_date': commit.committed_date
+    }
+    return info, repo.git_dir
+
+
+def write_build_info(file=BUILD_INFO_FILE, path=None):
+    info, _ = read_git_info(path)
+    with open(file, 'w') as f:
+        json.dump(info, f, indent=2)
+    return info
+
+
+class BuildInfo:
+    """Commit info, from git if there is a repo, else from `file`."""
+
+    def __init__(self, path=None, file=BUILD_INFO_FILE):
+        self.path = path
+        self.file = file
+        self.info = None
+        self.git_dir = None
+        self._head = None
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    def get(self):
+        if self.info is None:
+            with self._lock:
+                if self.info is None:
+                    self.refresh()
+        return self.info
+
+    def refresh(self):
+        try:
+            info, self.git_dir = read_git_info(self.path)
+            self._head = self._head_state()
+        except Exception:
+            # gitpython missing or no repo: the file written at build time
+            with open(self.file) as f:
+                info = json.load(f)
+        self.info = info
+        return info
+
+    def watch(self, interval=2.0):
+        """Re-read the info whenever HEAD moves (checkout, commit, pull),
+        checking every `interval` seconds on a background thread."""
+        self.get()
+        if self.git_dir is None or self._watcher is not None:
+            return
+        self._watcher = threading.Thread(
+            target=self._watch, args=(interval,), daemon=True
+        )
+        self._watcher.start()
+
+    def _watch(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                if self._head_state() != self._head:
+                    self.refresh()
+            except Exception:
+                pass
+
+    def _head_state(self):
+        # HEAD itself, plus the file of the branch it points to; a few
+        # stat calls, instead of opening the repo
+        with open(os.path.join(self.git_dir, 'HEAD')) as f:
+            head = f.read().strip()
+        files = ['packed-refs']
+        if head.startswith('ref: '):
+            files.append(head[len('ref: '):])
+        stats = []
+        for name in files:
+            try:
+                st = os.stat(os.path.join(self.git_dir, name))
+                stats.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stats.append(None)
+        return head, stats
+
+
+build_info = BuildInfo()
+
+if __name__ == '__main__':
+    print(json.dumps(write_build_info(), indent=2))
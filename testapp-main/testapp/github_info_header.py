@@ -1,19 +1,20 @@
-from git import Repo
 from datetime import datetime
 from os import getcwd
 from dash import html
+from testapp.build_info import build_info
 
 def github_info_header():
-    repo = Repo(search_parent_directories=True)
+    # read from git once, then from memory (see build_info.py)
+    info = build_info.get()
 
     return html.Div([
         html.P("Current working directory: {0}".format(getcwd())),
-        html.P(repo.head.ref.path),
-        html.P(repo.head.object.hexsha),
-        html.P(repo.head.commit.message),
-        html.P(repo.head.commit.author.name),
+        html.P(info['ref']),
+        html.P(info['sha']),
+        html.P(info['message']),
+        html.P(info['author']),
         html.P(
-            datetime.fromtimestamp(repo.head.commit.committed_date).strftime(
+            datetime.fromtimestamp(info['committed_date']).strftime(
                 "%A, %d %b %Y at %H:%M:%S"
             )
         )
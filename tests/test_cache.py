@@ -0,0 +1,103 @@
+# test_cache.py
+#  - algo/cache.PriceCache against a fake ek.get_data, offline
+#  - run from the repo root:  python -m pytest tests
+
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from algo.cache import PriceCache
+
+FIELDS = ['TR.OPENPRICE(Adjusted=0)', 'TR.CLOSEPRICE(Adjusted=0)',
+          'TR.CLOSEPRICE(Adjusted=0).date']
+
+
+class FakeEikon:
+    """One row per calendar day per RIC; RICs in `bad` return an error."""
+
+    def __init__(self, bad=()):
+        self.bad = set(bad)
+        self.calls = []
+
+    def get_data(self, instruments, fields, parameters=None):
+        lo = pd.Timestamp(parameters['SDate'])
+        hi = pd.Timestamp(parameters['EDate'])
+        self.calls.append((list(instruments), lo.date(), hi.date()))
+        days = pd.date_range(lo, hi, freq='D')
+        good = [ric for ric in instruments if ric not in self.bad]
+        rows = pd.DataFrame({
+            'Instrument': [ric for ric in good for _ in days],
+            'Open Price': 1.0,
+            'Close Price': 2.0,
+            'Date': [day.strftime('%Y-%m-%dT00:00:00Z')
+                     for _ in good for day in days]
+        })
+        err = [{'code': 412, 'col': 0, 'message': 'Unable to resolve',
+                'row': 0, 'instrument': ric}
+               for ric in instruments if ric in self.bad]
+        return rows, (err or None)
+
+
+def query(cache, rics, lo, hi):
+    return cache.get_data(rics, FIELDS, {
+        'SDate': lo.isoformat(), 'EDate': hi.isoformat(), 'Curn': 'USD'
+    })
+
+
+@pytest.fixture
+def fake():
+    return FakeEikon(bad=['BAD.X'])
+
+
+@pytest.fixture
+def cache(fake, tmp_path):
+    return PriceCache(fake.get_data, cache_dir=str(tmp_path))
+
+
+def test_hit_makes_no_upstream_call(fake, cache):
+    lo, hi = date(2020, 1, 1), date(2020, 1, 31)
+    first, err = query(cache, ['IVV', 'AAPL.O'], lo, hi)
+    second, err2 = query(cache, ['IVV', 'AAPL.O'], lo, hi)
+
+    assert len(fake.calls) == 1
+    assert err is None and err2 is None
+    assert first.shape[0] == second.shape[0] == 2 * 31
+    pd.testing.assert_frame_equal(first, second)
+    assert cache.stats()['hits'] == 2
+    assert cache.stats()['misses'] == 2
+
+
+def test_partial_range_fetches_only_missing_dates(fake, cache):
+    query(cache, ['IVV'], date(2020, 1, 10), date(2020, 1, 20))
+    result, _ = query(cache, ['IVV'], date(2020, 1, 1), date(2020, 1, 31))
+
+    assert fake.calls[1:] == [
+        (['IVV'], date(2020, 1, 1), date(2020, 1, 9)),
+        (['IVV'], date(2020, 1, 21), date(2020, 1, 31)),
+    ]
+    days = pd.to_datetime(result['Date']).dt.date
+    assert days.tolist() == [date(2020, 1, 1) + timedelta(days=k)
+                             for k in range(31)]
+
+
+def test_today_is_fetched_again_yesterday_is_not(fake, cache):
+    today = date.today()
+    yesterday = today - timedelta(days=1)
+    query(cache, ['IVV'], today - timedelta(days=10), today)
+    query(cache, ['IVV'], today - timedelta(days=10), today)
+    query(cache, ['IVV'], today - timedelta(days=10), yesterday)
+
+    assert fake.calls[1:] == [(['IVV'], today, today)]
+
+
+def test_failed_ric_is_not_cached(fake, cache):
+    lo, hi = date(2020, 1, 1), date(2020, 1, 31)
+    first, err = query(cache, ['IVV', 'BAD.X'], lo, hi)
+    second, err2 = query(cache, ['IVV', 'BAD.X'], lo, hi)
+
+    assert len(fake.calls) == 2
+    assert err is not None and err2 is not None
+    assert err2[0][0]['instrument'] == 'BAD.X'
+    assert set(second['Instrument']) == {'IVV'}
+    assert second.shape[0] == 31
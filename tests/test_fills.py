@@ -0,0 +1,135 @@
+# test_fills.py
+#  - algo/fills' entry & exit order tables against the per-trade loop that
+#    get_entry_tbl / get_exit_tbl in W4/HW2/app_refactor_v1.py used to run,
+#    on seeded synthetic OHLC histories with missing (NaN) bars
+#  - run from the repo root:  python -m pytest tests
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from algo.fills import build_entry_orders, build_exit_orders
+from algo.synthetic import synthetic_history
+
+ASSET = 'SYN00000'
+NEXT_BUSINESS_DAY = date(2030, 1, 2)
+COLUMNS = ['trade_id', 'date', 'asset', 'trip', 'action', 'type', 'price',
+           'status']
+
+
+def history(n_days, seed):
+    prices = synthetic_history(1, n_days, seed=seed).rename(columns={
+        'open': 'Open Price', 'high': 'High Price', 'low': 'Low Price',
+        'close': 'Close Price'
+    })
+    prices['Date'] = prices['Date'].dt.date
+    # a gap in the data: a bar with no low, another with no high
+    prices.loc[n_days // 3, 'Low Price'] = np.nan
+    prices.loc[n_days // 2, 'High Price'] = np.nan
+    return prices
+
+
+def order(trade_id, day, trip, action, type_, price, status):
+    return dict(zip(COLUMNS, [trade_id, day, ASSET, trip, action, type_,
+                              price, status]))
+
+
+def loop_entry_orders(prices, alpha1, n1):
+    # one order per bar, worked over the next n1 lows; a missing low never
+    # trades
+    dates = prices['Date'].tolist()
+    close = prices['Close Price'].tolist()
+    low = prices['Low Price'].tolist()
+    submitted, cancelled, filled, live = [], [], [], []
+    for i in range(1, len(dates)):
+        price = close[i - 1] * (1 + alpha1)
+        submitted.append(order(i, dates[i], 'ENTER', 'BUY', 'LMT', price,
+                               'SUBMITTED'))
+        window = low[i:i + n1]
+        hits = [k for k, x in enumerate(window) if x <= price]
+        if hits:
+            filled.append(order(i, dates[i + hits[0]], 'ENTER', 'BUY', 'LMT',
+                                price, 'FILLED'))
+        elif len(window) == n1:
+            cancelled.append(order(i, dates[i + n1 - 1], 'ENTER', 'BUY',
+                                   'LMT', price, 'CANCELLED'))
+        else:
+            live.append(order(i, NEXT_BUSINESS_DAY, 'ENTER', 'BUY', 'LMT',
+                              price, 'LIVE'))
+    live.insert(0, order(len(dates), NEXT_BUSINESS_DAY, 'ENTER', 'BUY', 'LMT',
+                         close[-1] * (1 + alpha1), 'LIVE'))
+    return _table(submitted + cancelled + filled + live)
+
+
+def loop_exit_orders(prices, entry_orders, alpha2, n2):
+    # an exit works the fill day's close, then the next n2 - 1 highs; a
+    # limit exit that expires is closed at that day's close
+    dates = prices['Date'].tolist()
+    close = prices['Close Price'].tolist()
+    high = prices['High Price'].tolist()
+    entries = entry_orders[entry_orders['status'] == 'FILLED'].sort_values(
+        ['date', 'trade_id']
+    )
+    submitted, cancelled, filled, live, market = [], [], [], [], []
+    for trade_id, day, entry_price in zip(
+            entries['trade_id'], entries['date'], entries['price']):
+        price = entry_price * (1 + alpha2)
+        submitted.append(order(trade_id, day, 'EXIT', 'SELL', 'LMT', price,
+                               'SUBMITTED'))
+        row = dates.index(day)
+        window = [close[row]] + high[row + 1:row + n2]
+        hits = [k for k, x in enumerate(window) if x >= price]
+        if hits:
+            filled.append(order(trade_id, dates[row + hits[0]], 'EXIT', 'SELL',
+                                'LMT', price, 'FILLED'))
+        elif len(window) == n2:
+            end = row + n2 - 1
+            cancelled.append(order(trade_id, dates[end], 'EXIT', 'SELL',
+                                   'LMT', price, 'CANCELLED'))
+            for status in ['SUBMITTED', 'FILLED']:
+                market.append(order(trade_id, dates[end], 'EXIT', 'SELL',
+                                    'MKT', close[end], status))
+        else:
+            live.append(order(trade_id, NEXT_BUSINESS_DAY, 'EXIT', 'SELL',
+                              'LMT', price, 'LIVE'))
+    market.sort(key=lambda o: o['status'] != 'SUBMITTED')
+    return _table(submitted + cancelled + filled + live + market)
+
+
+def _table(orders):
+    return pd.DataFrame(orders, columns=COLUMNS).sort_values(
+        ['date', 'trade_id'], kind='stable'
+    ).reset_index(drop=True)
+
+
+def assert_same_orders(result, expected):
+    # the same rows, up to the order of rows sharing a date & trade_id
+    key = ['date', 'trade_id', 'type', 'status']
+    result = result[COLUMNS].sort_values(key).reset_index(drop=True)
+    expected = expected.sort_values(key).reset_index(drop=True)
+    assert result.shape == expected.shape
+    for col in COLUMNS:
+        if col == 'price':
+            np.testing.assert_allclose(result[col], expected[col])
+        else:
+            assert result[col].tolist() == expected[col].tolist(), col
+
+
+@pytest.mark.parametrize('n1, n2', [(2, 2), (3, 5), (5, 3)])
+@pytest.mark.parametrize('seed', range(3))
+def test_books_match_the_per_trade_loop(n1, n2, seed):
+    prices = history(120, seed)
+    alpha1, alpha2 = -0.005, 0.008
+
+    entry = build_entry_orders(prices, ASSET, alpha1, n1, NEXT_BUSINESS_DAY)
+    expected_entry = loop_entry_orders(prices, alpha1, n1)
+    assert_same_orders(entry, expected_entry)
+    assert set(entry['status']) >= {'FILLED', 'CANCELLED', 'LIVE'}
+
+    exits = build_exit_orders(prices, entry, ASSET, alpha2, n2,
+                              NEXT_BUSINESS_DAY)
+    assert_same_orders(
+        exits, loop_exit_orders(prices, expected_entry, alpha2, n2)
+    )
@@ -0,0 +1,56 @@
+# test_rangeindex.py
+#  - algo/rangeindex.RangeMinMax, through algo/fills.resolve_fills, against
+#    the sliding-window simulate_fills, on series with missing (NaN) bars
+#  - run from the repo root:  python -m pytest tests
+
+import numpy as np
+import pytest
+
+from algo.fills import fill_windows, resolve_fills, simulate_fills
+from algo.rangeindex import RangeMinMax
+
+
+def series(n_bars, seed, nan_share=0.1):
+    rng = np.random.default_rng(seed)
+    values = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n_bars)))
+    values[rng.random(n_bars) < nan_share] = np.nan
+    return values
+
+
+@pytest.mark.parametrize('side', ['BUY', 'SELL'])
+@pytest.mark.parametrize('n', [1, 2, 3, 5, 8])
+@pytest.mark.parametrize('seed', range(5))
+def test_matches_simulate_fills_with_nan_bars(side, n, seed):
+    values = series(200, seed)
+    rng = np.random.default_rng(seed + 100)
+    start = np.arange(1, values.shape[0])
+    limit = np.nan_to_num(values[start - 1], nan=100) * (
+        1 + rng.normal(0, 0.02, start.shape[0])
+    )
+
+    windows, n_avail = fill_windows(values, start, n)
+    expected = simulate_fills(windows, limit, side, n_avail)
+    status, offset = resolve_fills(RangeMinMax(values), start, n, limit,
+                                   side)
+
+    np.testing.assert_array_equal(status, expected[0])
+    np.testing.assert_array_equal(offset, expected[1])
+
+
+def test_nan_low_is_not_a_fill():
+    lows = np.full(30, 100.0)
+    lows[10] = np.nan
+    lows[12] = 90.0
+    start = np.arange(8, 11)
+    status, offset = resolve_fills(RangeMinMax(lows), start, 5, 95.0, 'BUY')
+
+    np.testing.assert_array_equal(status, ['FILLED'] * 3)
+    np.testing.assert_array_equal(start + offset, [12, 12, 12])
+
+
+def test_all_missing_window():
+    index = RangeMinMax([np.nan, np.nan, 1.0])
+    assert index.min([0], [2])[0] == np.inf
+    assert index.max([0], [2])[0] == -np.inf
+    assert index.first_at_most([0], [2], [5.0])[0] == -1
+    assert index.first_at_least([0], [2], [-5.0])[0] == -1
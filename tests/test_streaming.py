@@ -0,0 +1,65 @@
+# test_streaming.py
+#  - algo/streaming.StreamingBlotter, replayed bar by bar over a seeded
+#    synthetic universe, against algo/batch.build_universe_blotter
+#  - run from the repo root:  python -m pytest tests
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from algo.batch import build_universe_blotter
+from algo.orderbook import BLOTTER_COLUMNS
+from algo.streaming import replay
+from algo.synthetic import synthetic_history
+
+NEXT_BUSINESS_DAY = date(2030, 1, 2)
+# rows sharing a trade_id & date, in one fixed order
+KEY = ['trade_id', 'date', 'trip', 'type', 'status']
+
+
+def universe(seed):
+    history = synthetic_history(3, 150, seed=seed)
+    # a missing low & high, which never trade
+    history.loc[40, 'low'] = np.nan
+    history.loc[200, 'high'] = np.nan
+    return history
+
+
+def replayed(history, instrument, alpha1, n1, alpha2, n2):
+    prices = history[history['Instrument'] == instrument].rename(columns={
+        'low': 'Low Price', 'high': 'High Price', 'close': 'Close Price'
+    })
+    blotter = replay(prices, instrument, alpha1, n1, alpha2, n2)
+    orders = pd.concat([
+        blotter.entry_orders(pd.Timestamp(NEXT_BUSINESS_DAY)),
+        blotter.exit_orders(pd.Timestamp(NEXT_BUSINESS_DAY))
+    ])
+    return orders.assign(date=pd.to_datetime(orders['date']))
+
+
+def canonical(orders):
+    orders = orders[BLOTTER_COLUMNS].sort_values(KEY, kind='stable')
+    return orders.reset_index(drop=True)
+
+
+@pytest.mark.parametrize('n1, n2', [(1, 1), (2, 3), (5, 2)])
+@pytest.mark.parametrize('seed', range(3))
+def test_replay_matches_batch(n1, n2, seed):
+    history = universe(seed)
+    alpha1, alpha2 = -0.005, 0.008
+    batch = build_universe_blotter(history, alpha1, n1, alpha2, n2,
+                                   next_business_day=NEXT_BUSINESS_DAY)
+
+    for instrument in history['Instrument'].unique():
+        expected = canonical(batch[batch['asset'] == instrument])
+        result = canonical(
+            replayed(history, instrument, alpha1, n1, alpha2, n2)
+        )
+        assert result.shape == expected.shape
+        for col in BLOTTER_COLUMNS:
+            if col == 'price':
+                np.testing.assert_allclose(result[col], expected[col])
+            else:
+                assert result[col].tolist() == expected[col].tolist(), col